@@ -1,46 +1,35 @@
 from flask import Flask, render_template, redirect, url_for, session
 from config import Config
 from database import db, init_db
-from models import User, Kid, Attendance
+from models import User, Kid, Attendance, AGE_GROUPS, OTHER_AGE_GROUP
 from blueprints.auth import auth_bp, login_required
 from blueprints.kids import kids_bp
-from blueprints.attendance import attendance_bp
+from blueprints.attendance import attendance_bp, get_visible_sites
 from blueprints.reports import reports_bp
 from blueprints.users import users_bp
 from blueprints.lessons import lessons_bp
-from datetime import datetime
-import os
+from services.archive_service import init_archive
+from services.cache_service import init_cache
+from services.scan_events import init_scan_events
+from services.sync_service import init_sync
+from services.stats_service import init_stats
+from services.lesson_bitmap_service import init_lesson_bitmaps
+from services.asset_service import init_assets
+from services.image_service import init_images
+from services.metrics_service import init_metrics
+from services.age_group_service import init_age_groups
+from services.reports_db_service import init_reports_db
+from services import clock
+from services.clock import init_clock
+from services.scan_queries import high_water_marks
 import json
 
-def get_current_date():
-    """Get current date in Philippines timezone"""
-    return datetime.now(Config.TIMEZONE).date()
-
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Ensure instance folder exists
-os.makedirs(os.path.join(app.root_path, 'instance'), exist_ok=True)
-
-# Initialize database
-init_db(app)
-
-# Register blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(kids_bp)
-app.register_blueprint(attendance_bp)
-app.register_blueprint(reports_bp)
-app.register_blueprint(users_bp)
-app.register_blueprint(lessons_bp)
-
-@app.route('/')
 def index():
     """Redirect to login or dashboard"""
     if 'user_id' in session:
         return redirect(url_for('dashboard'))
     return redirect(url_for('auth.login'))
 
-@app.route('/dashboard')
 @login_required
 def dashboard():
     """Main dashboard"""
@@ -48,7 +37,7 @@ def dashboard():
     user = User.query.get(session['user_id'])
     
     # Get statistics (using Philippines time)
-    today = get_current_date()
+    today = clock.today()
     
     # Filter by assigned sites for staff
     if user.role == 'staff' and user.assigned_sites:
@@ -64,8 +53,10 @@ def dashboard():
         sites = db.session.query(Kid.site).filter(Kid.site.in_(staff_sites)).distinct().all()
         active_sites = len(sites)
         
-        # Age group counts (calculate in Python since age is a property)
-        active_kids = Kid.query.filter_by(status='active').filter(Kid.site.in_(staff_sites)).all()
+        # Age group counts
+        age_group_counts = dict(db.session.query(Kid.age_group, db.func.count(Kid.id)).filter(
+            Kid.status == 'active', Kid.site.in_(staff_sites)
+        ).group_by(Kid.age_group).all())
         
         # Recent attendance (only from staff's sites)
         recent_attendance = db.session.query(Attendance, Kid).join(Kid).filter(
@@ -81,18 +72,22 @@ def dashboard():
         sites = db.session.query(Kid.site).distinct().all()
         active_sites = len(sites)
         
-        # Age group counts (calculate in Python since age is a property)
-        active_kids = Kid.query.filter_by(status='active').all()
+        # Age group counts
+        age_group_counts = dict(db.session.query(Kid.age_group, db.func.count(Kid.id)).filter(
+            Kid.status == 'active'
+        ).group_by(Kid.age_group).all())
         
         # Recent attendance
         recent_attendance = db.session.query(Attendance, Kid).join(Kid).filter(
             Attendance.scan_date == today
         ).order_by(Attendance.scan_time.desc()).limit(10).all()
     
-    kids_count = sum(1 for k in active_kids if 3 <= k.age <= 8)
-    risers_count = sum(1 for k in active_kids if 9 <= k.age <= 11)
-    teens_count = sum(1 for k in active_kids if 12 <= k.age <= 14)
-    other_count = sum(1 for k in active_kids if k.age < 3 or k.age > 14)
+    labels = {key: label for key, label, _, _ in AGE_GROUPS}
+    kids_count = age_group_counts.get(labels['kids'], 0)
+    risers_count = age_group_counts.get(labels['risers'], 0)
+    teens_count = age_group_counts.get(labels['teens'], 0)
+    # The dashboard's last card covers youth and everyone outside the groups
+    other_count = age_group_counts.get(labels['youth'], 0) + age_group_counts.get(OTHER_AGE_GROUP, 0)
     
     stats = {
         'total_kids': total_kids,
@@ -104,9 +99,11 @@ def dashboard():
         'other_count': other_count
     }
     
-    return render_template('dashboard.html', stats=stats, recent_attendance=recent_attendance)
+    # Where the live-update poll of today's feed starts
+    last_id = max((max_id for _, max_id in high_water_marks(today, get_visible_sites(user))), default=0)
+    
+    return render_template('dashboard.html', stats=stats, recent_attendance=recent_attendance, last_id=last_id)
 
-@app.context_processor
 def inject_user():
     """Make user info available in all templates"""
     return dict(
@@ -114,5 +111,49 @@ def inject_user():
         current_user_role=session.get('user_role')
     )
 
+def create_app(config=Config):
+    """
+    Build the Flask app from a config object (a class like Config or a module)
+
+    Everything an app needs is set up here, so tests and scripts can build
+    one with their own settings. Building an app has no side effects: it
+    creates no files, tables or threads and opens no connections.
+    gunicorn.conf.py preloads the module-level `app` below in the master and
+    forks workers from it.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+    
+    # Initialize database and services (the schema is created by `flask init-db`)
+    init_clock(app)
+    init_db(app)
+    init_archive(app)
+    init_cache(app)
+    init_scan_events(app)
+    init_sync(app)
+    init_stats(app)
+    init_lesson_bitmaps(app)
+    init_assets(app)
+    init_images(app)
+    init_metrics(app)
+    init_age_groups(app)
+    init_reports_db(app)
+    
+    # Register blueprints
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(kids_bp)
+    app.register_blueprint(attendance_bp)
+    app.register_blueprint(reports_bp)
+    app.register_blueprint(users_bp)
+    app.register_blueprint(lessons_bp)
+    
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/dashboard', view_func=dashboard)
+    app.context_processor(inject_user)
+    return app
+
+# Used by `flask --app app`, seed.py, the migrations and wsgi.py
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,5 @@
+"""
+Benchmarks and load tests for the JT KIDZ attendance system
+
+Run individual benchmarks as modules, e.g. python -m benchmarks.scan_load
+"""
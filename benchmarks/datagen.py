@@ -0,0 +1,165 @@
+"""
+Synthetic data generator for benchmarks
+
+Bulk-loads sites, kids and attendance with Core inserts (no ORM objects), so
+hundreds of thousands of rows load in seconds. Attendance follows the real
+pattern: most scans fall on Sundays between 8 and 11 AM, a small share on
+midweek activities, each week is one lesson of the 6-lesson cycle, and
+some kids come nearly every week while others come now and then.
+
+Usage:
+    python -m benchmarks.datagen --database sqlite:////tmp/bench.db
+    python -m benchmarks.datagen --database sqlite:////tmp/bench.db --sites 10 --kids 5000 --attendance 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import time as clock_time, timedelta
+from itertools import accumulate
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine, insert
+from werkzeug.security import generate_password_hash
+
+from database import db
+from services import clock
+from models import Attendance, Kid, SiteLessonSettings, User
+from services.archive_service import ensure_history_schema
+from services.stats_service import rebuild_attendance_stats
+from services.lesson_bitmap_service import rebuild_lesson_bitmaps
+
+ADMIN_EMAIL = 'bench-admin@jtkidz.com'
+ADMIN_PASSWORD = 'bench'  # also every staff account's password
+SUNDAY_SHARE = 0.85
+CHUNK = 10000
+
+FIRST_NAMES = ['Juan', 'Maria', 'Jose', 'Ana', 'Pedro', 'Rosa', 'Miguel', 'Sofia', 'Carlos', 'Elena',
+               'Diego', 'Isabel', 'Luis', 'Carmen', 'Rafael', 'Lucia', 'Gabriel', 'Teresa', 'Daniel', 'Patricia']
+LAST_NAMES = ['Santos', 'Reyes', 'Cruz', 'Bautista', 'Garcia', 'Mendoza', 'Lopez', 'Gonzales', 'Rodriguez', 'Flores']
+
+
+def site_name(i):
+    return f'Site {i + 1:02d}'
+
+
+def _chunks(rows):
+    for start in range(0, len(rows), CHUNK):
+        yield rows[start:start + CHUNK]
+
+
+def generate(engine, sites=5, kids=2000, attendance=50000, weeks=52, end_date=None, seed=42):
+    """
+    Fill an empty database and return a summary of what was created
+
+    Args:
+        engine: SQLAlchemy engine; tables are created if missing
+        sites: Number of sites
+        kids: Number of kids, spread unevenly over the sites
+        attendance: Target number of attendance rows (capped at one per kid per week)
+        weeks: How many weeks of history to generate, ending at end_date
+        end_date: Last Sunday of the history (default: the most recent Sunday)
+        seed: Random seed, so runs are repeatable
+    """
+    rng = random.Random(seed)
+    today = clock.today()
+    end_date = end_date or today - timedelta(days=(today.weekday() + 1) % 7)
+    sundays = [end_date - timedelta(weeks=w) for w in range(weeks - 1, -1, -1)]
+    site_names = [site_name(i) for i in range(sites)]
+
+    db.metadata.create_all(engine)
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        ensure_history_schema(conn)
+        # Hashing is slow; every generated account shares one hash
+        password = generate_password_hash(ADMIN_PASSWORD)
+        users = [{'name': 'Bench Admin', 'email': ADMIN_EMAIL, 'password': password, 'role': 'admin'}]
+        users += [{'name': f'Staff {name}', 'email': f'staff{i + 1}@bench.jtkidz.com', 'password': password,
+                   'role': 'staff', 'assigned_sites': f'["{name}"]'} for i, name in enumerate(site_names)]
+        conn.execute(insert(User), users)
+
+        # Bigger sites first: site weights fall off like a real congregation list
+        site_weights = [1 / (i + 1) ** 0.5 for i in range(sites)]
+        kid_rows = []
+        for i in range(kids):
+            kid_rows.append({
+                'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i + 1}',
+                'birthday': today - timedelta(days=rng.randint(3 * 365, 17 * 365)),
+                'gender': rng.choice(('Male', 'Female')),
+                'site': rng.choices(site_names, site_weights)[0],
+                'barcode': f'JT{i + 1:06d}',
+                'status': 'active' if rng.random() < 0.95 else 'inactive'
+            })
+        for chunk in _chunks(kid_rows):
+            conn.execute(insert(Kid), chunk)
+
+        conn.execute(insert(SiteLessonSettings), [
+            {'site': name, 'current_lesson': weeks % 6 + 1, 'lesson_start_date': end_date} for name in site_names
+        ])
+
+        # Each kid's chance of showing up in a given week: a few regulars, many occasional
+        loyalty = list(accumulate(rng.betavariate(2, 3) for _ in range(kids)))
+        target = min(attendance, kids * weeks)
+        seen = set()
+        scan_rows = []
+        while len(scan_rows) < target:
+            for kid_index in rng.choices(range(kids), cum_weights=loyalty, k=target - len(scan_rows)):
+                week = rng.randrange(weeks)
+                scan_date = sundays[week]
+                if rng.random() > SUNDAY_SHARE:
+                    scan_date -= timedelta(days=rng.randint(1, 6))
+                if (kid_index, scan_date) in seen:
+                    continue
+                seen.add((kid_index, scan_date))
+                kid_site = kid_rows[kid_index]['site']
+                # Sunday service check-in, centred on 9:30 AM
+                minutes = min(max(int(rng.gauss(9.5 * 60, 40)), 7 * 60), 12 * 60 - 1)
+                scan_rows.append({
+                    'kid_id': kid_index + 1,
+                    'site': kid_site,
+                    'lesson': week % 6 + 1,
+                    'scan_date': scan_date,
+                    'scan_time': clock_time(minutes // 60, minutes % 60, rng.randrange(60)),
+                    'scanned_by': 2 + site_names.index(kid_site)
+                })
+        scan_rows.sort(key=lambda row: (row['scan_date'], row['scan_time']))
+        for chunk in _chunks(scan_rows):
+            conn.execute(insert(Attendance), chunk)
+        rebuild_attendance_stats(conn)
+        rebuild_lesson_bitmaps(conn)
+
+    return {
+        'sites': sites,
+        'kids': kids,
+        'attendance': len(scan_rows),
+        'weeks': weeks,
+        'first_date': sundays[0].isoformat(),
+        'last_date': end_date.isoformat(),
+        'seed': seed,
+        'seconds': round(time.perf_counter() - started, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-load synthetic sites, kids and attendance')
+    parser.add_argument('--database', required=True, help='SQLAlchemy URL of an empty database')
+    parser.add_argument('--sites', type=int, default=5)
+    parser.add_argument('--kids', type=int, default=2000)
+    parser.add_argument('--attendance', type=int, default=50000)
+    parser.add_argument('--weeks', type=int, default=52)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database)
+    summary = generate(engine, args.sites, args.kids, args.attendance, args.weeks, seed=args.seed)
+    engine.dispose()
+    print(f"✅ {summary['kids']} kids, {summary['attendance']} scans over {summary['weeks']} weeks "
+          f"at {summary['sites']} sites in {summary['seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
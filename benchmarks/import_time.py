@@ -0,0 +1,133 @@
+"""
+Import-time benchmark: what a gunicorn worker pays to load the app
+
+Runs `python -X importtime -c "import app"` in fresh interpreters, after
+one untimed run that writes the .pyc files, and reports the cumulative
+import time of `app` and the slowest modules under it. It fails
+(exit status 1) when a module that only some routes need is imported at
+boot, or when the median goes over --budget-ms, so it can guard worker boot
+time in CI.
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 10 --budget-ms 800 --json results/import.json
+    python -m benchmarks.import_time --compare results/import.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported inside the routes and services that use them, never at boot
+LAZY_MODULES = ('pandas', 'openpyxl', 'reportlab', 'barcode', 'PIL')
+
+
+def parse_importtime(stderr):
+    """module -> (self us, cumulative us) from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def import_once(env):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'import app failed:\n{result.stderr[-2000:]}')
+    return parse_importtime(result.stderr)
+
+
+def run(runs, top):
+    workdir = tempfile.mkdtemp(prefix='jtkidz_import_')
+    env = dict(os.environ,
+               DATABASE_URL='sqlite:///' + os.path.join(workdir, 'import.db'),
+               METRICS_ENABLED='0',
+               AGE_GROUP_REFRESH_ENABLED='0')
+    try:
+        import_once(env)  # Write .pyc files so every timed run starts alike
+        samples = [import_once(env) for _ in range(runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    totals = sorted(modules['app'][1] / 1000 for modules in samples)
+    last = samples[-1]
+    slowest = sorted(((cumulative, name) for name, (_, cumulative) in last.items() if name != 'app'),
+                     reverse=True)[:top]
+    return {
+        'runs': runs,
+        'app_ms': {
+            'p50_ms': round(totals[len(totals) // 2], 1),
+            'min_ms': round(totals[0], 1),
+            'max_ms': round(totals[-1], 1),
+            'mean_ms': round(statistics.mean(totals), 1)
+        },
+        'modules': len(last),
+        'slowest': [{'module': name, 'cumulative_ms': round(cumulative / 1000, 1)} for cumulative, name in slowest],
+        'lazy_imported': sorted({name.split('.')[0] for name in last} & set(LAZY_MODULES))
+    }
+
+
+def compare(result, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before, after = baseline['results']['app_ms']['p50_ms'], result['app_ms']['p50_ms']
+    change = (after - before) / before * 100 if before else 0
+    print(f"\nvs {baseline.get('commit')} ({baseline_path})")
+    print(f"  import app p50 {before} ms -> {after} ms ({change:+.1f}%)")
+    print(f"  modules {baseline['results']['modules']} -> {result['modules']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how long importing the app takes')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time')
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+    parser.add_argument('--budget-ms', type=float, help='Fail when the median import takes longer')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    result = run(args.runs, args.top)
+
+    app_ms = result['app_ms']
+    print(f"  import app     p50 {app_ms['p50_ms']:>8} ms   min {app_ms['min_ms']:>8} ms   ({result['modules']} modules)")
+    for row in result['slowest']:
+        print(f"    {row['module']:<40}{row['cumulative_ms']:>8} ms")
+
+    if args.json:
+        from benchmarks.suite import git_commit
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'results': result
+            }, f, indent=2)
+    if args.compare:
+        compare(result, args.compare)
+
+    failed = False
+    if result['lazy_imported']:
+        print(f"❌ Imported at boot but only needed by some routes: {', '.join(result['lazy_imported'])}")
+        failed = True
+    if args.budget_ms is not None and app_ms['p50_ms'] > args.budget_ms:
+        print(f"❌ import app took {app_ms['p50_ms']} ms, over the {args.budget_ms} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+Load test for the scan endpoint
+
+Starts gunicorn in each serving mode against a fresh copy of a seeded SQLite
+database, then simulates concurrent scanner phones posting barcodes to
+/attendance/record. Each phone logs in, then loops: send the request headers,
+trickle the body after --slow-ms (a slow mobile uplink), wait for the reply,
+pause --think seconds (the server's anti-fraud cooldown is 2 seconds).
+
+The slow body only costs a sync worker its --slow-ms when the worker is
+idle: while it is busy the kernel buffers the other phones' bodies, so under
+load sync and gevent throughput end up close. What sync workers cannot absorb
+are requests held open for long, such as the scan stream.
+
+Usage:
+    python -m benchmarks.scan_load
+    python -m benchmarks.scan_load --modes sync,gevent --scanners 200 --duration 30
+    python -m benchmarks.scan_load --json results/scan_load.json
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_EMAIL = 'loadtest@jtkidz.com'
+ADMIN_PASSWORD = 'loadtest'
+
+
+def prepare_database(db_path, scanners, kids_per_scanner):
+    """Create a database with one admin and a private set of kids per scanner"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    sys.path.insert(0, PROJECT_ROOT)
+    from app import app
+    from database import db, create_schema
+    from models import User, Kid
+
+    with app.app_context():
+        create_schema()
+        admin = User(name='Load Test', email=ADMIN_EMAIL, role='admin')
+        admin.set_password(ADMIN_PASSWORD)
+        db.session.add(admin)
+
+        rows = []
+        for i in range(scanners * kids_per_scanner):
+            rows.append({
+                'full_name': f'Load Kid {i + 1}',
+                'birthday': date(2016, 1, 1),
+                'gender': 'Male' if i % 2 else 'Female',
+                'site': f'Site {i % 5 + 1}',
+                'barcode': f'LT{i + 1:06d}',
+                'status': 'active'
+            })
+        db.session.execute(db.insert(Kid), rows)
+        db.session.commit()
+        db.engine.dispose()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def wait_for_server(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/login')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server did not start on port {port}')
+
+
+def login(port):
+    """Log in and return the session cookie"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    body = f'email={ADMIN_EMAIL}&password={ADMIN_PASSWORD}'
+    conn.request('POST', '/login', body=body, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie', '').split(';', 1)[0]
+    conn.close()
+    if not cookie:
+        raise RuntimeError('Login failed')
+    return cookie
+
+
+def run_scanner(port, cookie, barcodes, args, deadline, results, lock):
+    """One phone: scan its own kids across lessons until the deadline"""
+    scans = [(barcode, lesson) for lesson in range(1, 7) for barcode in barcodes]
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    latencies, statuses = [], []
+
+    for barcode, lesson in scans:
+        if time.monotonic() >= deadline:
+            break
+        body = json.dumps({'barcode': barcode, 'lesson': lesson}).encode('utf-8')
+        start = time.perf_counter()
+        try:
+            conn.putrequest('POST', '/attendance/record')
+            conn.putheader('Content-Type', 'application/json')
+            conn.putheader('Content-Length', str(len(body)))
+            conn.putheader('Cookie', cookie)
+            conn.endheaders()
+            if args.slow_ms:
+                time.sleep(args.slow_ms / 1000)
+            conn.send(body)
+            response = conn.getresponse()
+            response.read()
+            statuses.append(response.status)
+        except (OSError, http.client.HTTPException):
+            statuses.append(0)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(args.think)
+
+    conn.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['statuses'].extend(statuses)
+
+
+def run_mode(mode, template_db, args):
+    workdir = tempfile.mkdtemp(prefix=f'scan_load_{mode}_')
+    db_path = os.path.join(workdir, 'load.db')
+    shutil.copy(template_db, db_path)
+
+    env = dict(os.environ,
+               DATABASE_URL='sqlite:///' + db_path,
+               PORT=str(args.port),
+               GUNICORN_WORKER_CLASS=mode,
+               WEB_CONCURRENCY=str(args.workers))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_server(args.port)
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            cookies = list(pool.map(lambda _: login(args.port), range(args.scanners)))
+
+        results = {'latencies': [], 'statuses': []}
+        lock = threading.Lock()
+        deadline = time.monotonic() + args.duration
+        threads = []
+        started = time.perf_counter()
+        for i, cookie in enumerate(cookies):
+            first = i * args.kids_per_scanner
+            barcodes = [f'LT{n + 1:06d}' for n in range(first, first + args.kids_per_scanner)]
+            thread = threading.Thread(target=run_scanner,
+                                      args=(args.port, cookie, barcodes, args, deadline, results, lock))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = results['latencies']
+    statuses = results['statuses']
+    return {
+        'mode': mode,
+        'workers': args.workers,
+        'scanners': args.scanners,
+        'requests': len(statuses),
+        'ok': sum(1 for s in statuses if s == 200),
+        'errors': sum(1 for s in statuses if s != 200),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'throughput_rps': round(len(statuses) / elapsed, 1) if elapsed else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test /attendance/record in each gunicorn serving mode')
+    parser.add_argument('--modes', default='sync,gthread,gevent', help='Comma-separated worker classes')
+    parser.add_argument('--scanners', type=int, default=200, help='Concurrent scanner phones')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of scanning per mode')
+    parser.add_argument('--think', type=float, default=2.1, help='Seconds between scans on one phone')
+    parser.add_argument('--slow-ms', type=float, default=200, help='Delay between request headers and body')
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn worker processes')
+    parser.add_argument('--kids-per-scanner', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    template_dir = tempfile.mkdtemp(prefix='scan_load_')
+    template_db = os.path.join(template_dir, 'template.db')
+    print(f'Seeding {args.scanners * args.kids_per_scanner} kids...')
+    prepare_database(template_db, args.scanners, args.kids_per_scanner)
+
+    all_results = []
+    try:
+        for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+            print(f'Running {mode} with {args.scanners} scanners for {args.duration:.0f}s...')
+            result = run_mode(mode, template_db, args)
+            all_results.append(result)
+            print(f"  {result['requests']} requests, {result['errors']} errors, "
+                  f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, {result['throughput_rps']} req/s")
+    finally:
+        shutil.rmtree(template_dir, ignore_errors=True)
+
+    print()
+    print(f"{'mode':<10}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for r in all_results:
+        print(f"{r['mode']:<10}{r['requests']:>10}{r['errors']:>8}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['throughput_rps']:>10}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(all_results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Micro-benchmark: Python-side cost of recording one scan
+
+Posts --scans barcodes to /attendance/record through the Flask test client
+(request parsing, session, lookups, duplicate check, insert, stats and bitmap
+upserts, commit, live-event publish) against a scratch SQLite database, one
+new kid per scan so every request takes the success path. Time spent inside
+the DBAPI cursor is measured separately and commits skip fsync, so what
+remains is the Python overhead of Flask, SQLAlchemy statement
+building/compiling and the app.
+
+Usage:
+    python -m benchmarks.scan_overhead
+    python -m benchmarks.scan_overhead --scans 5000 --json results/scan_overhead.json
+    python -m benchmarks.scan_overhead --compare results/scan_overhead.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_EMAIL = 'overhead@jtkidz.com'
+ADMIN_PASSWORD = 'overhead'
+
+
+def summarise(samples):
+    samples = sorted(samples)
+    return {
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3)
+    }
+
+
+def run(scans, warmup):
+    os.environ['METRICS_ENABLED'] = '0'
+    sys.path.insert(0, PROJECT_ROOT)
+    from sqlalchemy import event
+
+    from app import app
+    from database import db, create_schema
+    from models import Kid, User
+
+    total = scans + warmup
+    with app.app_context():
+        create_schema()
+        admin = User(name='Overhead', email=ADMIN_EMAIL, role='admin')
+        admin.set_password(ADMIN_PASSWORD)
+        db.session.add(admin)
+        db.session.execute(db.insert(Kid), [{
+            'full_name': f'Overhead Kid {i + 1}',
+            'birthday': date(2016, 1, 1),
+            'gender': 'Male',
+            'site': f'Site {i % 5 + 1}',
+            'barcode': f'OH{i + 1:06d}',
+            'status': 'active'
+        } for i in range(total)])
+        db.session.commit()
+        engine = db.engine
+
+    # No fsync at commit, so the time outside the cursor is Python, not the disk
+    @event.listens_for(engine, 'connect')
+    def no_sync(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA synchronous=OFF')
+    engine.dispose()
+
+    cursor = {'seconds': 0.0, 'statements': 0}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before(conn, cur, statement, parameters, context, executemany):
+        context._bench_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after(conn, cur, statement, parameters, context, executemany):
+        cursor['seconds'] += time.perf_counter() - context._bench_started
+        cursor['statements'] += 1
+
+    client = app.test_client()
+    response = client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    if response.status_code >= 400:
+        raise RuntimeError(f'login returned HTTP {response.status_code}')
+
+    totals, sql, python, statements = [], [], [], []
+    for i in range(total):
+        # A phone scans a few kids every 2 seconds; keep the anti-fraud list that short
+        with client.session_transaction() as session:
+            session.pop('last_scan_times', None)
+        cursor['seconds'], cursor['statements'] = 0.0, 0
+        started = time.perf_counter()
+        response = client.post('/attendance/record', json={'barcode': f'OH{i + 1:06d}', 'lesson': i % 6 + 1})
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f'scan {i + 1} returned HTTP {response.status_code}: {response.get_json()}')
+        if i < warmup:
+            continue
+        totals.append(elapsed * 1000)
+        sql.append(cursor['seconds'] * 1000)
+        python.append((elapsed - cursor['seconds']) * 1000)
+        statements.append(cursor['statements'])
+
+    return {
+        'scans': scans,
+        'total': summarise(totals),
+        'sql': summarise(sql),
+        'python': summarise(python),
+        'statements_per_scan': round(statistics.mean(statements), 2)
+    }
+
+
+def compare(result, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline.get('commit')} ({baseline_path})")
+    print(f"{'per scan':<12}{'before p50':>12}{'after p50':>12}{'change':>10}")
+    for part in ('total', 'sql', 'python'):
+        before, after = baseline['results'][part]['p50_ms'], result[part]['p50_ms']
+        change = (after - before) / before * 100 if before else 0
+        print(f"{part:<12}{before:>12}{after:>12}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the Python overhead of recording a scan')
+    parser.add_argument('--scans', type=int, default=2000, help='Timed scans')
+    parser.add_argument('--warmup', type=int, default=200, help='Untimed scans first (compile caches, imports)')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='jtkidz_overhead_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'overhead.db')
+    try:
+        result = run(args.scans, args.warmup)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for part in ('total', 'python', 'sql'):
+        print(f"  {part:<8}p50 {result[part]['p50_ms']:>8} ms   p95 {result[part]['p95_ms']:>8} ms")
+    print(f"  {result['statements_per_scan']} SQL statements per scan")
+
+    if args.json:
+        from benchmarks.suite import git_commit
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'results': result
+            }, f, indent=2)
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == '__main__':
+    main()
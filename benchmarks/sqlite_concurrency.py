@@ -0,0 +1,190 @@
+"""
+SQLite concurrency benchmark for the scan write path
+
+Runs the same workload twice on a fresh SQLite file, once with the stock
+engine (rollback journal, synchronous=FULL) and once with the engine options
+and pragmas init_db applies (WAL, synchronous=NORMAL, busy timeout, mmap).
+Writer processes play gunicorn workers recording scans (barcode lookup,
+duplicate check, insert, commit) from several threads each, while reader
+processes run a report-style aggregate in a loop.
+
+Usage:
+    python -m benchmarks.sqlite_concurrency
+    python -m benchmarks.sqlite_concurrency --processes 4 --threads 8 --duration 15
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from config import Config
+from database import apply_sqlite_pragmas, db, get_engine_options
+from models import Attendance, Kid, User
+
+KIDS = 5000
+
+
+def make_engine(db_path, tuned):
+    url = 'sqlite:///' + db_path
+    if not tuned:
+        engine = create_engine(url)
+        apply_sqlite_pragmas(engine, {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL',
+                                      'SQLITE_BUSY_TIMEOUT_MS': 5000, 'SQLITE_MMAP_SIZE': 0})
+        return engine
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    config['SQLALCHEMY_DATABASE_URI'] = url
+    engine = create_engine(url, **get_engine_options(config))
+    apply_sqlite_pragmas(engine, config)
+    return engine
+
+
+def prepare(db_path):
+    engine = create_engine('sqlite:///' + db_path)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{'name': 'Bench', 'email': 'bench@jtkidz.com', 'password': 'x', 'role': 'admin'}])
+        conn.execute(insert(Kid), [{
+            'full_name': f'Bench Kid {i}', 'birthday': date(2015, 1, 1), 'gender': 'Male',
+            'site': f'Site {i % 5 + 1}', 'barcode': f'BK{i:06d}', 'status': 'active'
+        } for i in range(KIDS)])
+    engine.dispose()
+
+
+def record_scan(engine, barcode, lesson):
+    """The database work of record_attendance"""
+    with Session(engine) as session:
+        kid = session.execute(select(Kid).filter_by(barcode=barcode)).scalar_one()
+        today = date.today()
+        existing = session.execute(select(Attendance.id).filter_by(
+            kid_id=kid.id, lesson=lesson, scan_date=today)).first()
+        if existing:
+            return
+        now = datetime.now()
+        session.add(Attendance(kid_id=kid.id, site=kid.site, lesson=lesson,
+                               scan_date=today, scan_time=now.time(), scanned_by=1))
+        session.commit()
+
+
+def writer_process(db_path, tuned, worker_id, threads, duration, queue):
+    engine = make_engine(db_path, tuned)
+    deadline = time.monotonic() + duration
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def run(thread_id):
+        n = 0
+        local_latencies, local_errors = [], 0
+        while time.monotonic() < deadline:
+            # Each thread walks its own slice of kids so every scan is a new row
+            kid_number = (worker_id * threads + thread_id + n * 997) % KIDS
+            lesson = n // KIDS % 6 + 1
+            n += 1
+            start = time.perf_counter()
+            try:
+                record_scan(engine, f'BK{kid_number:06d}', lesson)
+                local_latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    queue.put(('writer', latencies, sum(errors)))
+
+
+def reader_process(db_path, tuned, duration, queue):
+    engine = make_engine(db_path, tuned)
+    deadline = time.monotonic() + duration
+    reads, errors = 0, 0
+    while time.monotonic() < deadline:
+        try:
+            with Session(engine) as session:
+                session.execute(select(Kid.site, func.count(Attendance.id)).join(
+                    Attendance, Kid.id == Attendance.kid_id).group_by(Kid.site)).all()
+            reads += 1
+        except OperationalError:
+            errors += 1
+    queue.put(('reader', reads, errors))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run(label, tuned, args):
+    workdir = tempfile.mkdtemp(prefix=f'sqlite_bench_{label}_')
+    db_path = os.path.join(workdir, 'bench.db')
+    try:
+        prepare(db_path)
+        queue = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=writer_process,
+                                         args=(db_path, tuned, i, args.threads, args.duration, queue))
+                 for i in range(args.processes)]
+        procs += [multiprocessing.Process(target=reader_process, args=(db_path, tuned, args.duration, queue))
+                  for _ in range(args.readers)]
+        for proc in procs:
+            proc.start()
+        results = [queue.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = [l for kind, values, _ in results if kind == 'writer' for l in values]
+    return {
+        'engine': label,
+        'scans': len(latencies),
+        'scans_per_s': round(len(latencies) / args.duration, 1),
+        'locked_errors': sum(errors for kind, _, errors in results if kind == 'writer'),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'report_reads': sum(values for kind, values, _ in results if kind == 'reader'),
+        'reader_errors': sum(errors for kind, _, errors in results if kind == 'reader')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare scan throughput with stock vs tuned SQLite settings')
+    parser.add_argument('--processes', type=int, default=4, help='Writer processes (gunicorn workers)')
+    parser.add_argument('--threads', type=int, default=8, help='Writer threads per process')
+    parser.add_argument('--readers', type=int, default=1, help='Processes running report queries')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per run')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    results = [run('stock', False, args), run('tuned', True, args)]
+
+    print(f"{'engine':<8}{'scans/s':>10}{'locked':>8}{'p50 ms':>10}{'p99 ms':>10}{'reads':>8}{'rd err':>8}")
+    for r in results:
+        print(f"{r['engine']:<8}{r['scans_per_s']:>10}{r['locked_errors']:>8}{r['p50_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['report_reads']:>8}{r['reader_errors']:>8}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+End-to-end benchmark suite on a synthetic dataset
+
+Generates a database with benchmarks.datagen, then times each case through the
+Flask test client (app + database, no network): recording scans, the
+dashboard, every reports.* page, every export in services/export_service.py,
+bulk import and the barcode PDF. The report page cache is off unless --cache
+is given, so report timings measure the queries.
+
+Results are written as JSON together with the git commit and dataset size;
+pass an earlier file to --compare to see the change per case.
+
+Usage:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --kids 5000 --attendance 200000 --json results/bench.json
+    python -m benchmarks.suite --only reports --compare results/bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as clock_time, timedelta
+from io import BytesIO
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(fn, repeat, warmup=1):
+    """Run fn warmup + repeat times and summarise the timed runs in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'runs': repeat,
+        'mean_ms': round(statistics.mean(timings), 2),
+        'p50_ms': round(timings[len(timings) // 2], 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        'min_ms': round(timings[0], 2),
+        'max_ms': round(timings[-1], 2)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def check(response, name):
+    if response.status_code >= 400:
+        raise RuntimeError(f'{name} returned HTTP {response.status_code}')
+    return response
+
+
+def build_cases(app, client, dataset, args):
+    """Benchmark name -> zero-argument callable"""
+    from database import db
+    from models import Kid
+    from services import clock, export_service
+    from services.clock import FakeClock, set_clock
+
+    with app.app_context():
+        busiest_site = db.session.query(Kid.site).group_by(Kid.site).order_by(db.func.count().desc()).first()[0]
+        active_barcodes = [b for b, in db.session.query(Kid.barcode).filter_by(status='active').order_by(Kid.id)]
+
+    last = date.fromisoformat(dataset['last_date'])
+    first = date.fromisoformat(dataset['first_date'])
+    cases = {}
+
+    # Each scan is a different kid on a fresh lesson, so every one inserts a row
+    scans = iter(active_barcodes)
+
+    def scan():
+        check(client.post('/attendance/record', json={'barcode': next(scans), 'lesson': 6}), 'scan')
+    cases['scan'] = scan
+
+    # Fifty kids scanned once a week, the next lesson each week: a FakeClock
+    # moves on a week after every round, so streaks keep growing week on week
+    weekly = FakeClock(datetime.combine(last + timedelta(weeks=1), clock_time(9, 30), clock.get_clock().tz))
+    weekly_barcodes = active_barcodes[-50:]
+    weekly_scans = iter(range(10 ** 9))
+
+    def scan_weekly():
+        n = next(weekly_scans)
+        previous = set_clock(weekly)
+        try:
+            check(client.post('/attendance/record', json={
+                'barcode': weekly_barcodes[n % len(weekly_barcodes)], 'lesson': n // len(weekly_barcodes) % 6 + 1
+            }), 'weekly scan')
+        finally:
+            set_clock(previous)
+        if n % len(weekly_barcodes) == len(weekly_barcodes) - 1:
+            weekly.advance(weeks=1)
+    cases['scan.weekly'] = scan_weekly
+
+    cases['dashboard'] = lambda: check(client.get('/dashboard'), 'dashboard')
+
+    report_args = {
+        'reports.attendance_summary': {'date': last.isoformat()},
+        'reports.site_report': {'site': busiest_site, 'start_date': first.isoformat(), 'end_date': last.isoformat()},
+        'reports.monthly_report': {'month': last.month, 'year': last.year},
+        'reports.lesson_report': {},
+        'reports.lesson_detail': {'site': busiest_site, 'lesson': 1},
+        'reports.worker_audit': {'start_date': first.isoformat(), 'end_date': last.isoformat()},
+    }
+    with app.test_request_context():
+        from flask import url_for
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.endpoint):
+            if not rule.endpoint.startswith('reports.') or rule.endpoint == 'reports.export_report' \
+                    or 'GET' not in rule.methods:
+                continue
+            url = url_for(rule.endpoint, **report_args.get(rule.endpoint, {}))
+            cases[rule.endpoint] = lambda url=url, name=rule.endpoint: check(client.get(url), name)
+
+    def export(fn, *fn_args):
+        def run():
+            with app.app_context():
+                os.remove(fn(*fn_args))
+        return run
+    cases['export.site'] = export(export_service.export_site_report, busiest_site,
+                                  first.isoformat(), last.isoformat())
+    cases['export.monthly'] = export(export_service.export_monthly_report, busiest_site,
+                                     str(last.month), str(last.year))
+    cases['export.lesson'] = export(export_service.export_lesson_report, busiest_site, '1')
+
+    import pandas as pd
+    workbook = BytesIO()
+    pd.DataFrame([{'full_name': f'Import Kid {i}', 'birthday': '2016-05-01', 'gender': 'Female',
+                   'site': busiest_site} for i in range(args.import_rows)]).to_excel(workbook, index=False)
+
+    def bulk_import():
+        data = {'excel_file': (BytesIO(workbook.getvalue()), 'kids.xlsx')}
+        check(client.post('/kids/bulk-import', data=data, content_type='multipart/form-data'), 'bulk import')
+    cases['kids.bulk_import'] = bulk_import
+
+    cases['kids.barcode_pdf'] = lambda: check(
+        client.get('/kids/barcodes/export-pdf', query_string={'site': busiest_site}), 'barcode pdf')
+
+    return cases, busiest_site
+
+
+def generate_site_barcodes(app, site):
+    """Barcode images the PDF embeds; returns the files created so they can be removed"""
+    from config import Config
+    from models import Kid
+    from services.barcode_service import generate_barcode
+
+    os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+    before = set(os.listdir(Config.UPLOAD_FOLDER))
+    with app.app_context():
+        for kid in Kid.query.filter_by(site=site, status='active'):
+            generate_barcode(kid.barcode, kid.full_name)
+    return [os.path.join(Config.UPLOAD_FOLDER, f) for f in set(os.listdir(Config.UPLOAD_FOLDER)) - before]
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline.get('commit')} ({baseline_path})")
+    print(f"{'case':<32}{'before p50':>12}{'after p50':>12}{'change':>10}")
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+        print(f"{name:<32}{before['p50_ms']:>12}{result['p50_ms']:>12}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scans, pages, exports and imports on synthetic data')
+    parser.add_argument('--sites', type=int, default=5)
+    parser.add_argument('--kids', type=int, default=2000)
+    parser.add_argument('--attendance', type=int, default=50000)
+    parser.add_argument('--weeks', type=int, default=52)
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs per case')
+    parser.add_argument('--import-rows', type=int, default=100, help='Kids per bulk import run')
+    parser.add_argument('--only', help='Run only cases whose name contains this text')
+    parser.add_argument('--cache', action='store_true', help='Leave the report page cache on')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='jtkidz_bench_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    if not args.cache:
+        os.environ['REPORT_CACHE_ENABLED'] = '0'
+    sys.path.insert(0, PROJECT_ROOT)
+
+    from app import app
+    from config import Config
+    from database import db
+    from benchmarks.datagen import ADMIN_EMAIL, ADMIN_PASSWORD, generate
+
+    # Barcodes from bulk import go to the scratch directory, not static/
+    barcode_folder = Config.UPLOAD_FOLDER
+    Config.UPLOAD_FOLDER = os.path.join(workdir, 'barcodes')
+    created_files = []
+
+    try:
+        print(f'Generating {args.kids} kids and {args.attendance} scans...')
+        with app.app_context():
+            dataset = generate(db.engine, args.sites, args.kids, args.attendance, args.weeks)
+
+        client = app.test_client()
+        check(client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD}), 'login')
+        cases, busiest_site = build_cases(app, client, dataset, args)
+        if args.only:
+            cases = {name: fn for name, fn in cases.items() if args.only in name}
+
+        if 'kids.barcode_pdf' in cases:
+            # The PDF reads barcode images from static/img/barcodes
+            Config.UPLOAD_FOLDER = barcode_folder
+            created_files = generate_site_barcodes(app, busiest_site)
+            Config.UPLOAD_FOLDER = os.path.join(workdir, 'barcodes')
+
+        results = {}
+        for name, fn in cases.items():
+            results[name] = measure(fn, args.repeat)
+            print(f"  {name:<32}p50 {results[name]['p50_ms']:>9} ms   p95 {results[name]['p95_ms']:>9} ms")
+    finally:
+        Config.UPLOAD_FOLDER = barcode_folder
+        for path in created_files:
+            os.remove(path)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'report_cache': args.cache,
+        'dataset': dataset,
+        'results': results
+    }
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,69 @@
-from flask import Blueprint, render_template, request, jsonify, session, current_app
-from models import Kid, Attendance, User, SiteLessonSettings
+from flask import Blueprint, render_template, request, jsonify, session, current_app, url_for
+from models import Kid, Attendance, AttendanceHistory, User, SiteLessonSettings
 from database import db
 from blueprints.auth import login_required
-from datetime import datetime, date
+from services.asset_service import asset_url
+from services.scan_events import serialize_scan
+from services.cache_service import ResponseCache, get_data_version
+from services.archive_service import history_model
+from services import clock
+from services.scan_queries import existing_scan_time, find_kid, get_user, high_water_marks, today_counts
+from datetime import datetime, date, timedelta
+import hashlib
+import json
+import os
+import queue
 import time
 
 attendance_bp = Blueprint('attendance', __name__, url_prefix='/attendance')
 
-def get_current_datetime():
-    """Get current datetime in Philippines timezone"""
-    from config import Config
-    return datetime.now(Config.TIMEZONE)
+# Minimum seconds between two scans of the same barcode from one session
+SCAN_THROTTLE_SECONDS = 2
 
-def get_current_date():
-    """Get current date in Philippines timezone"""
-    return get_current_datetime().date()
+# Scans queued on a phone while offline are accepted for this long
+OFFLINE_SCAN_MAX_AGE = timedelta(hours=12)
+
+# Today's scan counters, shared by every user of this worker
+today_counts_cache = ResponseCache(max_entries=4)
+
+def get_visible_sites(user):
+    """Sites whose attendance the user may see, or None for all sites (admin)"""
+    if user.role == 'admin':
+        return None
+    return user.get_assigned_sites()
+
+def today_high_water_mark(view_date, sites):
+    """
+    ETag for a day's attendance: the highest attendance id per site
+    
+    Served from the (scan_date, site) index without touching kids or users,
+    so unchanged polls cost a single small aggregate.
+    """
+    marks = sorted(high_water_marks(view_date, sites))
+    fingerprint = f'{view_date.isoformat()}|' + ';'.join(f'{site}={max_id}' for site, max_id in marks)
+    return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+def get_today_counts(today):
+    """
+    Scan counts for a day as (site, lesson, scanned_by, count) rows
+    
+    One grouped COUNT over the (scan_date, site) index, cached for up to
+    TODAY_COUNTS_TTL seconds and never past the next attendance commit in any
+    worker (the shared data version).
+    """
+    key = (today, get_data_version())
+    counts = today_counts_cache.get(key)
+    if counts is None:
+        counts = today_counts(today)
+        today_counts_cache.set(key, counts, current_app.config.get('TODAY_COUNTS_TTL', 10))
+    return counts
 
 @attendance_bp.route('/scan')
 @login_required
 def scan_page():
     """Mobile barcode scanning page"""
     # Get current user's sites
-    current_user = User.query.get(session['user_id'])
+    current_user = get_user(session['user_id'])
     
     if current_user.role == 'admin':
         # Admin can see all sites
@@ -51,9 +93,9 @@ def scan_page():
     
     if current_user.role == 'staff':
         # Check what lessons this staff member has scanned for
-        scanned_lessons = db.session.query(Attendance.lesson).filter(
-            Attendance.scanned_by == current_user.id
-        ).distinct().order_by(Attendance.lesson).all()
+        scanned_lessons = db.session.query(AttendanceHistory.lesson).filter(
+            AttendanceHistory.scanned_by == current_user.id
+        ).distinct().order_by(AttendanceHistory.lesson).all()
         
         if scanned_lessons:
             max_scanned = max([l[0] for l in scanned_lessons])
@@ -81,15 +123,18 @@ def record_attendance():
     if not barcode:
         return jsonify({'success': False, 'message': 'No barcode provided'}), 400
     
-    # Anti-fraud: Prevent rapid scanning (2 seconds minimum between scans)
-    current_time = time.time()
-    last_scan_time = session.get('last_scan_time', 0)
-    time_diff = current_time - last_scan_time
+    # Anti-fraud: Prevent rapid re-scans of the same barcode (2 seconds minimum)
+    current_time = clock.timestamp()
+    last_scan_times = {
+        code: scanned_at for code, scanned_at in session.get('last_scan_times', {}).items()
+        if current_time - scanned_at < SCAN_THROTTLE_SECONDS
+    }
+    time_diff = current_time - last_scan_times.get(barcode, 0)
     
-    if time_diff < 2:  # Less than 2 seconds since last scan
+    if time_diff < SCAN_THROTTLE_SECONDS:
         return jsonify({
             'success': False,
-            'message': f'⚠️ Please wait {int(2 - time_diff)} more seconds before next scan.',
+            'message': f'⚠️ Please wait {int(SCAN_THROTTLE_SECONDS - time_diff) + 1} more seconds before scanning {barcode} again.',
             'too_fast': True
         }), 429
     
@@ -98,7 +143,7 @@ def record_attendance():
         return jsonify({'success': False, 'message': 'Invalid lesson number'}), 400
     
     # Find kid by barcode
-    kid = Kid.query.filter_by(barcode=barcode).first()
+    kid = find_kid(barcode)
     
     if not kid:
         return jsonify({'success': False, 'message': 'Invalid barcode. Kid not found.'}), 404
@@ -107,7 +152,7 @@ def record_attendance():
         return jsonify({'success': False, 'message': f'{kid.full_name} is inactive.'}), 400
     
     # Check if staff user can access this site
-    current_user = User.query.get(session['user_id'])
+    current_user = get_user(session['user_id'])
     if not current_user.can_access_site(kid.site):
         return jsonify({
             'success': False,
@@ -115,23 +160,34 @@ def record_attendance():
             'wrong_site': True
         }), 403
     
+    # Scans queued on the phone while offline carry the time they were made
+    now = clock.now()
+    scanned_at = data.get('scanned_at')
+    if scanned_at:
+        try:
+            queued_at = datetime.fromtimestamp(float(scanned_at) / 1000, now.tzinfo)
+        except (TypeError, ValueError, OverflowError, OSError):
+            return jsonify({'success': False, 'message': 'Invalid scan time'}), 400
+        if queued_at < now - OFFLINE_SCAN_MAX_AGE or queued_at > now + timedelta(minutes=1):
+            return jsonify({
+                'success': False,
+                'message': f'{kid.full_name}: offline scan is too old to record.',
+                'expired': True
+            }), 400
+        now = min(queued_at, now)
+    
     # Check if already scanned today for this lesson (using Philippines time)
-    today = get_current_date()
-    existing = Attendance.query.filter_by(
-        kid_id=kid.id,
-        lesson=selected_lesson,
-        scan_date=today
-    ).first()
+    today = now.date()
+    existing_time = existing_scan_time(kid.id, selected_lesson, today)
     
-    if existing:
+    if existing_time:
         return jsonify({
             'success': False,
-            'message': f'{kid.full_name} already scanned for Lesson {selected_lesson} today at {existing.scan_time.strftime("%I:%M %p")}',
+            'message': f'{kid.full_name} already scanned for Lesson {selected_lesson} today at {existing_time.strftime("%I:%M %p")}',
             'already_scanned': True
         }), 400
     
     # Record attendance (using Philippines time)
-    now = get_current_datetime()
     attendance = Attendance(
         kid_id=kid.id,
         site=kid.site,
@@ -142,17 +198,24 @@ def record_attendance():
     )
     
     db.session.add(attendance)
+    db.session.flush()
+    # Read everything the event and reply need before commit expires the objects
+    event = serialize_scan(attendance, kid, current_user)
     db.session.commit()
     
-    # Update last scan time to prevent rapid scanning
-    session['last_scan_time'] = time.time()
+    # Push the scan to live dashboards and today-views
+    current_app.extensions['scan_broker'].publish(event)
+    
+    # Update this barcode's last scan time to prevent rapid re-scans
+    last_scan_times[barcode] = clock.timestamp()
+    session['last_scan_times'] = last_scan_times
     
     return jsonify({
         'success': True,
-        'message': f'✅ {kid.full_name} - Lesson {selected_lesson} recorded!',
-        'kid_name': kid.full_name,
-        'kid_age': kid.age,
-        'site': kid.site,
+        'message': f'✅ {event["kid_name"]} - Lesson {selected_lesson} recorded!',
+        'kid_name': event['kid_name'],
+        'kid_age': event['kid_age'],
+        'site': event['site'],
         'lesson': selected_lesson,
         'time': now.strftime('%I:%M %p')
     }), 200
@@ -167,23 +230,25 @@ def today_attendance():
         try:
             view_date = datetime.strptime(selected_date, '%Y-%m-%d').date()
         except:
-            view_date = get_current_date()
+            view_date = clock.today()
     else:
-        view_date = get_current_date()
+        view_date = clock.today()
     
     # Get lesson filter
     selected_lesson = request.args.get('lesson', '')
     
     # Get current user and filter by assigned sites for workers
-    current_user = User.query.get(session['user_id'])
+    current_user = get_user(session['user_id'])
     
-    query = db.session.query(Attendance, Kid, User).join(Kid).join(User, Attendance.scanned_by == User.id).filter(
-        Attendance.scan_date == view_date
+    # Past quarters may have been archived
+    source = history_model(view_date)
+    query = db.session.query(source, Kid, User).join(Kid).join(User, source.scanned_by == User.id).filter(
+        source.scan_date == view_date
     )
     
     # Filter by lesson if selected
     if selected_lesson:
-        query = query.filter(Attendance.lesson == int(selected_lesson))
+        query = query.filter(source.lesson == int(selected_lesson))
     
     # Filter by staff's assigned sites
     if current_user.role == 'staff':
@@ -194,6 +259,174 @@ def today_attendance():
             # Staff with no sites sees nothing
             query = query.filter(Kid.id == -1)
     
-    records = query.order_by(Attendance.scan_time.desc()).all()
+    records = query.order_by(source.scan_time.desc()).all()
+    
+    # The page polls the live feed only while showing today
+    is_today = view_date == clock.today()
+    last_id = max((attendance.id for attendance, kid, user in records), default=0)
+    
+    return render_template('attendance_today.html', records=records, date=view_date, selected_date=selected_date, selected_lesson=selected_lesson,
+                          is_today=is_today, last_id=last_id)
+
+@attendance_bp.route('/stats/today')
+@login_required
+def today_stats():
+    """Compact JSON counts of today's scans for the scanner page"""
+    current_user = get_user(session['user_id'])
+    sites = get_visible_sites(current_user)
+    today = clock.today()
+    
+    total = mine = 0
+    by_site = {}
+    by_lesson = {}
+    for site, lesson, scanned_by, count in get_today_counts(today):
+        if sites is not None and site not in sites:
+            continue
+        total += count
+        if scanned_by == current_user.id:
+            mine += count
+        by_site[site] = by_site.get(site, 0) + count
+        by_lesson[str(lesson)] = by_lesson.get(str(lesson), 0) + count
+    
+    response = jsonify({
+        'date': today.isoformat(),
+        'total': total,
+        'mine': mine,
+        'by_site': by_site,
+        'by_lesson': by_lesson
+    })
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@attendance_bp.route('/sw.js')
+def service_worker():
+    """Service worker for the scanner PWA, served under /attendance/ to get that scope"""
+    static_files = ['img/logo.png', 'manifest.webmanifest']
+    precache_urls = [url_for('static', filename=f) for f in static_files]
+    # Built assets carry their content hash in the URL; CDN fallbacks are not precached
+    for name in ('app.css', 'html5-qrcode.min.js', 'js/scanner.js'):
+        url = asset_url(name)
+        if url and url.startswith('/'):
+            precache_urls.append(url)
+    
+    # Cache name changes whenever a precached file changes
+    fingerprint = hashlib.sha1()
+    for url in precache_urls:
+        fingerprint.update(url.encode('utf-8'))
+    for filename in static_files + ['js/scanner.js']:
+        fingerprint.update(str(os.path.getmtime(os.path.join(current_app.static_folder, filename))).encode('utf-8'))
     
-    return render_template('attendance_today.html', records=records, date=view_date, selected_date=selected_date, selected_lesson=selected_lesson)
+    scan_url = url_for('attendance.scan_page')
+    body = render_template('sw.js',
+                           version=fingerprint.hexdigest()[:12],
+                           scan_url=scan_url,
+                           precache_urls=precache_urls)
+    response = current_app.response_class(body, mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@attendance_bp.route('/today/feed')
+@login_required
+def today_feed():
+    """JSON delta feed of today's attendance rows with id greater than ?since="""
+    since = request.args.get('since', 0, type=int)
+    selected_lesson = request.args.get('lesson', '', type=str)
+    
+    current_user = get_user(session['user_id'])
+    sites = get_visible_sites(current_user)
+    today = clock.today()
+    
+    etag = today_high_water_mark(today, sites)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    
+    rows = []
+    if sites is None or sites:
+        query = db.session.query(Attendance, Kid, User).join(Kid).join(User, Attendance.scanned_by == User.id).filter(
+            Attendance.scan_date == today,
+            Attendance.id > since
+        )
+        if selected_lesson:
+            query = query.filter(Attendance.lesson == int(selected_lesson))
+        if sites is not None:
+            query = query.filter(Attendance.site.in_(sites))
+        
+        for attendance, kid, user in query.order_by(Attendance.id).all():
+            rows.append(serialize_scan(attendance, kid, user))
+    
+    response = jsonify({
+        'date': today.isoformat(),
+        'last_id': rows[-1]['id'] if rows else since,
+        'records': rows
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def format_sse(event):
+    """Encode a scan as a Server-Sent Events message"""
+    return f"id: {event['id']}\nevent: scan\ndata: {json.dumps(event)}\n\n"
+
+@login_required
+def scan_stream():
+    """Server-Sent Events stream of scans at the viewer's sites"""
+    config = current_app.config
+    current_user = get_user(session['user_id'])
+    sites = get_visible_sites(current_user)
+    
+    broker = current_app.extensions['scan_broker']
+    subscriber = broker.subscribe()
+    
+    # Replay anything missed since the client's last event (EventSource sends
+    # Last-Event-ID automatically when it reconnects)
+    backlog = []
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is not None and (sites is None or sites):
+        query = db.session.query(Attendance, Kid, User).join(Kid).join(User, Attendance.scanned_by == User.id).filter(
+            Attendance.scan_date == clock.today(),
+            Attendance.id > last_event_id
+        )
+        if sites is not None:
+            query = query.filter(Attendance.site.in_(sites))
+        backlog = [serialize_scan(*row) for row in query.order_by(Attendance.id).all()]
+    
+    timeout = config.get('SSE_STREAM_TIMEOUT', 55)
+    heartbeat = config.get('SSE_HEARTBEAT_INTERVAL', 15)
+    
+    def generate():
+        sent_id = last_event_id or 0
+        yield 'retry: 3000\n\n'
+        for event in backlog:
+            sent_id = event['id']
+            yield format_sse(event)
+        
+        # Streams are closed after a while so sync workers are not held
+        # forever; the browser reconnects and resumes from Last-Event-ID
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                event = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            if event['id'] <= sent_id:
+                continue
+            if sites is not None and event['site'] not in sites:
+                continue
+            sent_id = event['id']
+            yield format_sse(event)
+    
+    response = current_app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: broker.unsubscribe(subscriber))
+    return response
+
+@attendance_bp.record
+def register_scan_stream(state):
+    """Serve /attendance/stream only on gevent workers, where an open stream does not pin a worker"""
+    if state.app.config.get('SCAN_STREAM_ENABLED'):
+        state.add_url_rule('/stream', view_func=scan_stream)
@@ -23,7 +23,7 @@ def admin_required(f):
             flash('Please log in to access this page.', 'warning')
             return redirect(url_for('auth.login'))
         
-        user = User.query.get(session['user_id'])
+        user = db.session.get(User, session['user_id'])
         if not user or user.role != 'admin':
             flash('Admin access required.', 'danger')
             return redirect(url_for('dashboard'))
@@ -1,24 +1,21 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, send_file
-from models import Kid, User
+from models import Kid, User, AGE_GROUP_LABELS
 from database import db
+from config import Config
 from blueprints.auth import login_required, admin_required
-from services.barcode_service import generate_barcode
+from services.barcode_service import barcode_files, generate_barcode
+from services.image_service import save_profile_picture, delete_profile_picture
+from services import clock
+from services.sync_service import get_roster_changes
 from datetime import datetime
-from werkzeug.utils import secure_filename
 import os
-import pandas as pd
 import tempfile
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
 from io import BytesIO
 
 kids_bp = Blueprint('kids', __name__, url_prefix='/kids')
 
 # Configuration for file uploads
-UPLOAD_FOLDER = 'static/img/profiles'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 ALLOWED_EXCEL_EXTENSIONS = {'xlsx', 'xls'}
 
 def allowed_file(filename):
@@ -27,6 +24,25 @@ def allowed_file(filename):
 def allowed_excel_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXCEL_EXTENSIONS
 
+# ?sort= options for the kids list and barcode pages; unknown values sort by name
+KID_SORTS = {
+    'name': lambda k: k.full_name,
+    'barcode': lambda k: k.barcode,
+    'gender': lambda k: (k.gender or 'ZZZ', k.full_name),  # Gender then name
+    'age': lambda k: (k.age, k.full_name),
+}
+
+# Only the kids list loads attendance stats, so only it sorts by them
+KIDS_LIST_SORTS = dict(KID_SORTS,
+    attendance=lambda k: (-(k.attendance_stats.total_scans if k.attendance_stats else 0), k.full_name),
+    last_seen=lambda k: -(k.attendance_stats.last_scan_date.toordinal()
+                          if k.attendance_stats and k.attendance_stats.last_scan_date else 0)
+)
+
+def sort_kids(kids, sort_by, sorts=KID_SORTS):
+    """Kids ordered by the sort key named sort_by"""
+    return sorted(kids, key=sorts.get(sort_by, sorts['name']))
+
 @kids_bp.route('/')
 @login_required
 def list_kids():
@@ -55,28 +71,11 @@ def list_kids():
     if status_filter:
         query = query.filter_by(status=status_filter)
     
-    # Get all kids first (can't filter by age property in SQL)
-    kids = query.all()
-    
-    # Filter by age group in Python
-    if age_group_filter == 'kids':
-        kids = [k for k in kids if 3 <= k.age <= 8]
-    elif age_group_filter == 'risers':
-        kids = [k for k in kids if 9 <= k.age <= 11]
-    elif age_group_filter == 'teens':
-        kids = [k for k in kids if 12 <= k.age <= 13]
-    elif age_group_filter == 'youth':
-        kids = [k for k in kids if k.age >= 14]
-    elif age_group_filter == 'other':
-        kids = [k for k in kids if k.age < 3]
-    
-    # Sort kids based on parameter
-    if sort_by == 'barcode':
-        kids = sorted(kids, key=lambda k: k.barcode)
-    elif sort_by == 'gender':
-        kids = sorted(kids, key=lambda k: (k.gender or 'ZZZ', k.full_name))  # Gender then name
-    else:  # default: sort by name
-        kids = sorted(kids, key=lambda k: k.full_name)
+    if age_group_filter in AGE_GROUP_LABELS:
+        query = query.filter(Kid.age_group == AGE_GROUP_LABELS[age_group_filter])
+    
+    # Attendance stats come in the same query (one row per kid, see services/stats_service.py)
+    kids = sort_kids(query.options(db.joinedload(Kid.attendance_stats)).all(), sort_by, KIDS_LIST_SORTS)
     
     # Get sites based on user role
     if current_user.role == 'admin':
@@ -90,7 +89,31 @@ def list_kids():
     
     return render_template('kids_list.html', kids=kids, sites=sites, 
                           current_site=site_filter, current_status=status_filter,
-                          current_age_group=age_group_filter, current_sort=sort_by)
+                          current_age_group=age_group_filter, current_sort=sort_by,
+                          today=clock.today())
+
+@kids_bp.route('/sync')
+@login_required
+def sync():
+    """
+    Roster changes after change-log seq ?since= for the caller's sites (0 = full roster)
+    
+    ?user= is the user the client's cursor was issued to; a cursor from
+    another user gets a full roster, since their sites differ.
+    """
+    from blueprints.attendance import get_visible_sites
+    
+    since = request.args.get('since', 0, type=int)
+    current_user = User.query.get(session['user_id'])
+    if request.args.get('user', current_user.id, type=int) != current_user.id:
+        since = 0
+    changes = get_roster_changes(since, get_visible_sites(current_user), clock.today(), current_user.id)
+    changes['date'] = clock.today().isoformat()
+    changes['user'] = current_user.id
+    
+    response = jsonify(changes)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @kids_bp.route('/add', methods=['GET', 'POST'])
 @admin_required
@@ -121,18 +144,11 @@ def add_kid():
         if 'profile_pic' in request.files:
             file = request.files['profile_pic']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                # Create unique filename
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                name_part = secure_filename(full_name.replace(' ', '_'))
-                ext = filename.rsplit('.', 1)[1].lower()
-                unique_filename = f"{name_part}_{timestamp}.{ext}"
-                
-                # Ensure upload folder exists
-                os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-                
-                file.save(os.path.join(UPLOAD_FOLDER, unique_filename))
-                profile_pic = unique_filename
+                try:
+                    profile_pic = save_profile_picture(file.stream)
+                except ValueError:
+                    flash('Profile picture could not be read as an image', 'danger')
+                    return render_template('kid_form.html', kid=None)
         
         # Generate unique barcode
         last_kid = Kid.query.order_by(Kid.id.desc()).first()
@@ -191,21 +207,18 @@ def edit_kid(kid_id):
         if 'profile_pic' in request.files:
             file = request.files['profile_pic']
             if file and file.filename and allowed_file(file.filename):
-                # Delete old picture if exists
-                if kid.profile_pic:
-                    old_pic_path = os.path.join(UPLOAD_FOLDER, kid.profile_pic)
-                    if os.path.exists(old_pic_path):
-                        os.remove(old_pic_path)
-                
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                name_part = secure_filename(kid.full_name.replace(' ', '_'))
-                ext = filename.rsplit('.', 1)[1].lower()
-                unique_filename = f"{name_part}_{timestamp}.{ext}"
+                try:
+                    profile_pic = save_profile_picture(file.stream)
+                except ValueError:
+                    flash('Profile picture could not be read as an image', 'danger')
+                    return render_template('kid_form.html', kid=kid)
                 
-                os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-                file.save(os.path.join(UPLOAD_FOLDER, unique_filename))
-                kid.profile_pic = unique_filename
+                # Delete old picture unless another kid has the same photo
+                old_pic = kid.profile_pic
+                if old_pic and old_pic != profile_pic and not Kid.query.filter(
+                        Kid.profile_pic == old_pic, Kid.id != kid.id).first():
+                    delete_profile_picture(old_pic)
+                kid.profile_pic = profile_pic
         
         db.session.commit()
         flash(f'Kid {kid.full_name} updated successfully!', 'success')
@@ -253,17 +266,7 @@ def bulk_barcodes():
     if site_filter:
         query = query.filter_by(site=site_filter)
     
-    kids = query.all()
-    
-    # Sort kids based on parameter
-    if sort_by == 'barcode':
-        kids = sorted(kids, key=lambda k: k.barcode)
-    elif sort_by == 'gender':
-        kids = sorted(kids, key=lambda k: (k.gender or 'ZZZ', k.full_name))
-    elif sort_by == 'age':
-        kids = sorted(kids, key=lambda k: (k.age, k.full_name))
-    else:  # default: name
-        kids = sorted(kids, key=lambda k: k.full_name)
+    kids = sort_kids(query.all(), sort_by)
     
     # Get all sites for filter dropdown
     sites = db.session.query(Kid.site).distinct().order_by(Kid.site).all()
@@ -277,6 +280,10 @@ def bulk_barcodes():
 def export_barcodes_pdf():
     """Export barcodes to PDF based on current sorting/filtering"""
     from flask import current_app
+    # reportlab is only needed here; importing it lazily keeps worker boot fast
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.pdfgen import canvas
     
     sort_by = request.args.get('sort', 'site')
     site_filter = request.args.get('site', '')
@@ -287,17 +294,10 @@ def export_barcodes_pdf():
     if site_filter:
         query = query.filter_by(site=site_filter)
     
-    kids = query.all()
+    kids = sort_kids(query.all(), sort_by)
     
-    # Sort kids based on parameter
-    if sort_by == 'barcode':
-        kids = sorted(kids, key=lambda k: k.barcode)
-    elif sort_by == 'gender':
-        kids = sorted(kids, key=lambda k: (k.gender or 'ZZZ', k.full_name))
-    elif sort_by == 'age':
-        kids = sorted(kids, key=lambda k: (k.age, k.full_name))
-    else:  # default: name
-        kids = sorted(kids, key=lambda k: k.full_name)
+    # One folder listing for every card instead of a stat per kid
+    barcodes = barcode_files()
     
     # Create PDF in memory
     buffer = BytesIO()
@@ -354,10 +354,10 @@ def export_barcodes_pdf():
         pdf.drawString(x + (card_width - text_width)/2, y + card_height - 1.15*inch, info_text)
         
         # Draw barcode image if exists - use absolute path
-        barcode_filename = f"{kid.barcode}_{kid.full_name.replace(' ', '_')}.png"
-        barcode_path = os.path.join(current_app.root_path, 'static', 'img', 'barcodes', barcode_filename)
+        barcode_filename = barcodes.get(kid.barcode)
+        barcode_path = os.path.join(Config.UPLOAD_FOLDER, barcode_filename) if barcode_filename else None
         
-        if os.path.exists(barcode_path):
+        if barcode_path:
             try:
                 pdf.drawImage(barcode_path, x + 0.25*inch, y + 0.8*inch,
                             width=2*inch, height=1*inch, preserveAspectRatio=True, mask='auto')
@@ -390,9 +390,9 @@ def export_barcodes_pdf():
     buffer.seek(0)
     
     # Generate filename
-    filename = f"JT_KIDZ_Barcodes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    filename = f"JT_KIDZ_Barcodes_{clock.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     if site_filter:
-        filename = f"JT_KIDZ_Barcodes_{site_filter}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        filename = f"JT_KIDZ_Barcodes_{site_filter}_{clock.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     
     return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name=filename)
 
@@ -415,6 +415,8 @@ def bulk_import():
             return redirect(request.url)
         
         try:
+            import pandas as pd
+            
             # Read Excel file
             df = pd.read_excel(file)
             
@@ -493,6 +495,8 @@ def bulk_import():
 @admin_required
 def download_template():
     """Download Excel template for bulk import"""
+    import pandas as pd
+    
     # Create sample Excel file
     data = {
         'full_name': ['Juan Dela Cruz', 'Maria Santos'],
@@ -1,8 +1,9 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, session
-from models import SiteLessonSettings, Kid, Attendance
+from models import SiteLessonSettings, Kid, AttendanceHistory
 from database import db
 from blueprints.auth import login_required, admin_required
 from datetime import datetime, date
+from services import clock
 from sqlalchemy import func
 
 lessons_bp = Blueprint('lessons', __name__, url_prefix='/lessons')
@@ -16,7 +17,7 @@ def manage_lessons():
     
     # Get selected quarter from query params (default to current quarter)
     selected_quarter = request.args.get('quarter', '')
-    current_month = datetime.now().month
+    current_month = clock.today().month
     
     if not selected_quarter:
         # Determine current quarter
@@ -57,10 +58,10 @@ def manage_lessons():
         # Get all lesson start dates by looking at first attendance for each lesson
         lesson_dates = {}
         for lesson_num in range(1, 7):
-            first_attendance = Attendance.query.filter_by(
+            first_attendance = AttendanceHistory.query.filter_by(
                 site=site,
                 lesson=lesson_num
-            ).order_by(Attendance.scan_date).first()
+            ).order_by(AttendanceHistory.scan_date).first()
             
             if first_attendance:
                 lesson_dates[lesson_num] = first_attendance.scan_date
@@ -116,7 +117,7 @@ def advance_lesson(site):
     
     # Advance to next lesson
     setting.current_lesson += 1
-    setting.lesson_start_date = date.today()
+    setting.lesson_start_date = clock.today()
     setting.updated_at = datetime.utcnow()
     
     db.session.commit()
@@ -149,7 +150,7 @@ def set_lesson(site):
         except:
             flash('Invalid date format', 'warning')
     else:
-        setting.lesson_start_date = date.today()
+        setting.lesson_start_date = clock.today()
     
     setting.updated_at = datetime.utcnow()
     db.session.commit()
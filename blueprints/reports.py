@@ -1,16 +1,52 @@
-from flask import Blueprint, render_template, request, send_file, session
-from models import Kid, Attendance, User, SiteLessonSettings
-from database import db
+from flask import Blueprint, Response, current_app, flash, redirect, render_template, request, send_file, session, stream_with_context, url_for
+from models import Kid, User, SiteLessonSettings, AGE_GROUP_LABELS
+from database import db, uses_reports_database
 from blueprints.auth import login_required, admin_required
 from services.export_service import export_to_excel
+from services import clock
+from services.cache_service import cached_report
+from services.archive_service import history_model
+from services.absentee_service import absentees_csv, find_absentees
+from services.lesson_bitmap_service import LESSONS, LessonBitmaps, bitset, kid_ids, load_lesson_bitmaps
+from services.report_query_service import LESSON_ATTENDANCE, MONTHLY_ATTENDANCE, SITE_ATTENDANCE
 from datetime import datetime, date, timedelta
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from collections import defaultdict
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/reports')
 
+# Stored age group label -> attendance summary bucket (youth and anyone else fall under 'other')
+SUMMARY_AGE_GROUPS = {AGE_GROUP_LABELS[key]: key for key in ('kids', 'risers', 'teens')}
+
+def _before_today(date_str):
+    """True if date_str (YYYY-MM-DD) parses to a date before today"""
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d').date() < clock.today()
+    except (TypeError, ValueError):
+        return False
+
+def _page(query, params):
+    """The page of query requested by ?page=, REPORT_PAGE_SIZE rows long"""
+    return query.page(params, request.args.get('page', 1, type=int), current_app.config['REPORT_PAGE_SIZE'])
+
+def summary_is_historical(args):
+    return _before_today(args.get('date', ''))
+
+def site_is_historical(args):
+    return _before_today(args.get('end_date', ''))
+
+def monthly_is_historical(args):
+    try:
+        month, year = int(args.get('month', '')), int(args.get('year', ''))
+    except ValueError:
+        return False
+    today = clock.today()
+    return (year, month) < (today.year, today.month)
+
 @reports_bp.route('/attendance-summary')
 @admin_required
+@cached_report(summary_is_historical)
+@uses_reports_database
 def attendance_summary():
     """Admin attendance summary grouped by site with age breakdown"""
     # Get date from query params or use today
@@ -19,16 +55,15 @@ def attendance_summary():
         try:
             view_date = datetime.strptime(selected_date, '%Y-%m-%d').date()
         except:
-            from blueprints.attendance import get_current_date
-            view_date = get_current_date()
+            view_date = clock.today()
     else:
-        from blueprints.attendance import get_current_date
-        view_date = get_current_date()
+        view_date = clock.today()
     
     # Get all attendance for selected date
-    records = db.session.query(Attendance, Kid, User).join(Kid).join(User, Attendance.scanned_by == User.id).filter(
-        Attendance.scan_date == view_date
-    ).order_by(Kid.site, Attendance.scan_time).all()
+    source = history_model(view_date)
+    records = db.session.query(source, Kid, User).join(Kid).join(User, source.scanned_by == User.id).filter(
+        source.scan_date == view_date
+    ).order_by(Kid.site, source.scan_time).all()
     
     # Group by site
     sites_data = defaultdict(lambda: {
@@ -58,19 +93,10 @@ def attendance_summary():
         sites_data[site]['all'].append(record_data)
         sites_data[site]['total'] += 1
         
-        # Group by age
-        if 3 <= kid.age <= 8:
-            sites_data[site]['kids'].append(record_data)
-            sites_data[site]['kids_count'] += 1
-        elif 9 <= kid.age <= 11:
-            sites_data[site]['risers'].append(record_data)
-            sites_data[site]['risers_count'] += 1
-        elif 12 <= kid.age <= 14:
-            sites_data[site]['teens'].append(record_data)
-            sites_data[site]['teens_count'] += 1
-        else:
-            sites_data[site]['other'].append(record_data)
-            sites_data[site]['other_count'] += 1
+        # Group by the stored age group; youth count as other here
+        group = SUMMARY_AGE_GROUPS.get(kid.age_group, 'other')
+        sites_data[site][group].append(record_data)
+        sites_data[site][f'{group}_count'] += 1
     
     # Calculate overall totals
     overall = {
@@ -92,6 +118,8 @@ def attendance_summary():
 
 @reports_bp.route('/site')
 @admin_required
+@cached_report(site_is_historical)
+@uses_reports_database
 def site_report():
     """Report filtered by site and date range"""
     site = request.args.get('site', '')
@@ -106,25 +134,23 @@ def site_report():
     stats = {}
     
     if site or (start_date and end_date):
-        query = db.session.query(Attendance, Kid).join(Kid)
-        
-        if site:
-            query = query.filter(Kid.site == site)
-        if start_date:
-            query = query.filter(Attendance.scan_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
-        if end_date:
-            query = query.filter(Attendance.scan_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
-        
-        records = query.order_by(Attendance.scan_date.desc(), Attendance.scan_time.desc()).all()
+        params = {
+            'site': site,
+            'start': datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None,
+            'end': datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        }
+        records = _page(SITE_ATTENDANCE, params)
+        counts = SITE_ATTENDANCE.aggregate(params,
+                                           total_attendance=lambda rows: func.count(),
+                                           unique_kids=lambda rows: func.count(rows.kid_id.distinct()))
         
         # Calculate stats
         total_kids = Kid.query.filter_by(site=site, status='active').count() if site else Kid.query.filter_by(status='active').count()
-        total_attendance = len(records)
-        unique_kids = len(set([r[0].kid_id for r in records]))
+        unique_kids = counts['unique_kids']
         
         stats = {
             'total_kids': total_kids,
-            'total_attendance': total_attendance,
+            'total_attendance': counts['total_attendance'],
             'unique_kids': unique_kids,
             'attendance_rate': round((unique_kids / total_kids * 100) if total_kids > 0 else 0, 1)
         }
@@ -139,11 +165,13 @@ def site_report():
 
 @reports_bp.route('/monthly')
 @admin_required
+@cached_report(monthly_is_historical)
+@uses_reports_database
 def monthly_report():
     """Monthly attendance summary per child"""
     site = request.args.get('site', '')
     month = request.args.get('month', '')
-    year = request.args.get('year', str(date.today().year))
+    year = request.args.get('year', str(clock.today().year))
     
     # Get all sites
     sites = db.session.query(Kid.site).distinct().order_by(Kid.site).all()
@@ -152,21 +180,8 @@ def monthly_report():
     summary = []
     
     if month and year:
-        # Query kids and count their attendance for the month
-        query = db.session.query(
-            Kid,
-            func.count(Attendance.id).label('attendance_count')
-        ).outerjoin(Attendance, 
-            (Kid.id == Attendance.kid_id) & 
-            (extract('month', Attendance.scan_date) == int(month)) &
-            (extract('year', Attendance.scan_date) == int(year))
-        )
-        
-        if site:
-            query = query.filter(Kid.site == site)
-        
-        query = query.filter(Kid.status == 'active')
-        summary = query.group_by(Kid.id).order_by(Kid.site, Kid.full_name).all()
+        # Active kids and their attendance count for the month
+        summary = _page(MONTHLY_ATTENDANCE, {'site': site, 'month': int(month), 'year': int(year)})
     
     return render_template('reports_monthly.html',
                           summary=summary,
@@ -177,6 +192,8 @@ def monthly_report():
 
 @reports_bp.route('/lessons')
 @admin_required
+@cached_report()
+@uses_reports_database
 def lesson_report():
     """Lesson-based attendance report with charts"""
     lesson_filter = request.args.get('lesson', '', type=str)
@@ -186,10 +203,17 @@ def lesson_report():
     sites = db.session.query(Kid.site).distinct().order_by(Kid.site).all()
     sites = [s[0] for s in sites]
     
+    # Active kids, lesson settings and attendance bitmaps for every site up front
+    active_kids = dict(db.session.query(Kid.site, func.count(Kid.id)).filter(
+        Kid.status == 'active'
+    ).group_by(Kid.site).all())
+    settings = {s.site: s for s in SiteLessonSettings.query.all()}
+    bitmaps = load_lesson_bitmaps()
+    
     # Build lesson data for all sites and all lessons
     lesson_data = []
     
-    for lesson_num in range(1, 7):
+    for lesson_num in LESSONS:
         lesson_stats = {
             'lesson': lesson_num,
             'sites': []
@@ -202,17 +226,10 @@ def lesson_report():
             if lesson_filter and str(lesson_num) != lesson_filter:
                 continue
             
-            # Get total active kids in site
-            total_kids = Kid.query.filter_by(site=site, status='active').count()
-            
-            # Get attendance count for this lesson
-            attendance_count = db.session.query(Attendance.kid_id).filter(
-                Attendance.site == site,
-                Attendance.lesson == lesson_num
-            ).distinct().count()
+            total_kids = active_kids.get(site, 0)
+            attendance_count = bitmaps[site].count(lesson_num)
             
-            # Get lesson setting for this site
-            setting = SiteLessonSettings.query.filter_by(site=site).first()
+            setting = settings.get(site)
             is_current = setting and setting.current_lesson == lesson_num
             is_completed = setting and setting.current_lesson > lesson_num
             
@@ -231,13 +248,14 @@ def lesson_report():
         if lesson_stats['sites']:  # Only add if has data
             lesson_data.append(lesson_stats)
     
-    # Calculate overall statistics per lesson
+    # Calculate overall statistics per lesson (a kid counts once even if scanned at two sites)
+    total_kids_all = sum(active_kids.get(s, 0) for s in sites)
+    all_sites = LessonBitmaps()
+    for site_bitmaps in bitmaps.values():
+        all_sites = all_sites | site_bitmaps
     overall_by_lesson = []
-    for lesson_num in range(1, 7):
-        total_kids_all = sum(Kid.query.filter_by(site=s, status='active').count() for s in sites)
-        total_attendance = db.session.query(Attendance.kid_id).filter(
-            Attendance.lesson == lesson_num
-        ).distinct().count()
+    for lesson_num in LESSONS:
+        total_attendance = all_sites.count(lesson_num)
         
         overall_by_lesson.append({
             'lesson': lesson_num,
@@ -245,16 +263,19 @@ def lesson_report():
             'attendance': total_attendance,
             'rate': round((total_attendance / total_kids_all * 100) if total_kids_all > 0 else 0, 1)
         })
+    completed_all = all_sites.attended(LESSONS).bit_count()
     
     return render_template('reports_lesson.html',
                           lesson_data=lesson_data,
                           overall_by_lesson=overall_by_lesson,
+                          completed_all=completed_all,
                           sites=sites,
                           current_site=site_filter,
                           current_lesson=lesson_filter)
 
 @reports_bp.route('/lessons/detail')
 @admin_required
+@uses_reports_database
 def lesson_detail():
     """Detailed attendance for a specific site and lesson"""
     site = request.args.get('site', '')
@@ -264,17 +285,19 @@ def lesson_detail():
         flash('Site and lesson parameters are required', 'danger')
         return redirect(url_for('reports.lesson_report'))
     
-    # Get all kids who attended this lesson at this site
-    attendance_records = db.session.query(Attendance, Kid).join(Kid).filter(
-        Attendance.site == site,
-        Attendance.lesson == lesson
-    ).order_by(Attendance.scan_date, Attendance.scan_time).all()
+    # Scans of this lesson at this site
+    params = {'site': site, 'lesson': lesson}
+    attendance_records = _page(LESSON_ATTENDANCE, params)
     
     # Get total active kids in site
-    total_kids = Kid.query.filter_by(site=site, status='active').count()
+    active_ids = [kid_id for kid_id, in db.session.query(Kid.id).filter_by(site=site, status='active')]
+    total_kids = len(active_ids)
     
-    # Get unique kids count
-    unique_kids = len(set([a.kid_id for a, k in attendance_records]))
+    bitmaps = load_lesson_bitmaps(site)[site]
+    unique_kids = bitmaps.count(lesson)
+    # Active kids who came to every earlier lesson (or any lesson, for lesson 1) but not this one
+    missing = bitmaps.attended(range(1, lesson), missed=[lesson]) & bitset(active_ids)
+    missing_kids = Kid.query.filter(Kid.id.in_(kid_ids(missing))).order_by(Kid.full_name).all() if missing else []
     
     stats = {
         'site': site,
@@ -282,26 +305,27 @@ def lesson_detail():
         'total_kids': total_kids,
         'attended': unique_kids,
         'completion_rate': round((unique_kids / total_kids * 100) if total_kids > 0 else 0, 1),
-        'total_scans': len(attendance_records)
+        'total_scans': attendance_records.total,
+        'completed_all': bitmaps.attended(LESSONS).bit_count()
     }
     
     return render_template('reports_lesson_detail.html',
                           attendance_records=attendance_records,
+                          missing_kids=missing_kids,
                           stats=stats)
 
 @reports_bp.route('/worker-audit')
 @admin_required
+@uses_reports_database
 def worker_audit():
     """Admin audit report showing worker scanning patterns"""
-    from blueprints.attendance import get_current_date
-    
     # Get date range from query params
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     
     if not start_date or not end_date:
         # Default to last 7 days
-        today = get_current_date()
+        today = clock.today()
         end_date = today.strftime('%Y-%m-%d')
         start_date = (today - timedelta(days=7)).strftime('%Y-%m-%d')
     
@@ -309,14 +333,18 @@ def worker_audit():
     workers = User.query.filter_by(role='staff').all()
     
     # Build report data per worker
+    try:
+        source = history_model(datetime.strptime(start_date, '%Y-%m-%d').date())
+    except ValueError:
+        source = history_model()
     worker_stats = []
     for worker in workers:
         # Get attendance scanned by this worker in date range
-        scans = db.session.query(Attendance, Kid).join(Kid).filter(
-            Attendance.scanned_by == worker.id,
-            Attendance.scan_date >= start_date,
-            Attendance.scan_date <= end_date
-        ).order_by(Attendance.scan_date.desc(), Attendance.scan_time.desc()).all()
+        scans = db.session.query(source, Kid).join(Kid).filter(
+            source.scanned_by == worker.id,
+            source.scan_date >= start_date,
+            source.scan_date <= end_date
+        ).order_by(source.scan_date.desc(), source.scan_time.desc()).all()
         
         # Detect suspicious patterns
         scan_times = []
@@ -350,8 +378,43 @@ def worker_audit():
                           start_date=start_date,
                           end_date=end_date)
 
+def _absentee_filters():
+    """(site, missed lessons) from the query string; 1-12 missed lessons, default 3"""
+    site = request.args.get('site', '')
+    missed = min(max(request.args.get('missed', 3, type=int) or 3, 1), 12)
+    return site, missed
+
+@reports_bp.route('/absentees')
+@admin_required
+@cached_report()
+@uses_reports_database
+def absentees():
+    """Active kids who stopped coming, missed the current lesson, or are coming less"""
+    site, missed = _absentee_filters()
+    sites = [s[0] for s in db.session.query(Kid.site).distinct().order_by(Kid.site).all()]
+    rows = find_absentees(clock.today(), site=site, missed_lessons=missed)
+    
+    return render_template('reports_absentees.html',
+                          absentees=rows,
+                          sites=sites,
+                          current_site=site,
+                          missed_lessons=missed)
+
+@reports_bp.route('/absentees/export')
+@admin_required
+@uses_reports_database
+def export_absentees():
+    """Download the absentee list as CSV"""
+    site, missed = _absentee_filters()
+    rows = find_absentees(clock.today(), site=site, missed_lessons=missed)
+    
+    response = Response(stream_with_context(absentees_csv(rows)), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename=jtkidz_absentees_{clock.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return response
+
 @reports_bp.route('/export')
 @admin_required
+@uses_reports_database
 def export_report():
     """Export attendance to Excel"""
     report_type = request.args.get('type', 'site')
@@ -364,4 +427,4 @@ def export_report():
     
     filepath = export_to_excel(report_type, site, start_date, end_date, month, year, lesson)
     
-    return send_file(filepath, as_attachment=True, download_name=f'jtkidz_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
+    return send_file(filepath, as_attachment=True, download_name=f'jtkidz_report_{clock.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
@@ -8,7 +8,20 @@ pip install -r requirements.txt
 # Create instance directory if it doesn't exist
 mkdir -p instance
 
+# Build fingerprinted CSS/JS into static/dist (no CDN or in-browser Tailwind)
+python build_assets.py
+
+# Create missing tables and the attendance history view (importing the app no longer does)
+flask --app app init-db
+
 # Run migrations
 python migrate_add_lessons.py || true
+python migrate_add_attendance_indexes.py || true
+python migrate_add_sync_columns.py || true
+python migrate_add_age_group.py || true
+python migrate_profile_pictures.py || true
+python migrate_attendance_archive.py || true
+python migrate_add_attendance_stats.py || true
+python migrate_add_lesson_bitmaps.py || true
 
 echo "Build completed successfully!"
@@ -0,0 +1,108 @@
+"""
+Build the static asset bundle in static/dist
+Run during the build (and after editing templates or static/js) so pages load
+no in-browser Tailwind compiler and no CDN scripts:
+
+- app.css: Tailwind compiled from static/src/app.css, purged against the
+  templates and scripts listed in tailwind.config.js, minified
+- html5-qrcode.min.js: downloaded from its pinned upstream URL
+- js/scanner.js: copied from static/js
+
+Every file is written under a content-hash name with .gz (and .br when the
+brotli package is installed) siblings, and static/dist/manifest.json maps
+logical names to hashed names for asset_url().
+
+The Tailwind CLI is taken from TAILWINDCSS_BIN, else `tailwindcss` on PATH
+(the pytailwindcss package provides one that fetches the standalone binary,
+pinned by TAILWINDCSS_VERSION).
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import urllib.request
+
+from services.asset_service import DIST_FOLDER, LOCAL_ASSETS, MANIFEST_PATH, STATIC_FOLDER, VENDOR_ASSETS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TAILWIND_CONFIG = os.path.join(BASE_DIR, 'tailwind.config.js')
+TAILWIND_INPUT = os.path.join(STATIC_FOLDER, 'src', 'app.css')
+TAILWIND_VERSION = 'v3.4.17'
+
+# Only text assets are worth precompressing
+COMPRESSIBLE = ('.css', '.js', '.json', '.svg')
+
+def fingerprint(name, content):
+    """js/scanner.js -> scanner.<hash>.js"""
+    base, ext = os.path.splitext(os.path.basename(name))
+    if base.endswith('.min'):
+        base, ext = base[:-4], '.min' + ext
+    return f"{base}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+def write_asset(name, content, manifest):
+    hashed = fingerprint(name, content)
+    path = os.path.join(DIST_FOLDER, hashed)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if hashed.endswith(COMPRESSIBLE):
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=11))
+    manifest[name] = hashed
+    print(f"   ✓ {name} -> static/dist/{hashed} ({len(content) // 1024} KB)")
+
+def tailwind_command():
+    binary = os.environ.get('TAILWINDCSS_BIN') or shutil.which('tailwindcss')
+    if not binary:
+        sys.exit("❌ Tailwind CLI not found: pip install pytailwindcss or set TAILWINDCSS_BIN")
+    return [binary]
+
+def build_css():
+    output = os.path.join(tempfile.mkdtemp(), 'app.css')
+    env = dict(os.environ)
+    env.setdefault('TAILWINDCSS_VERSION', TAILWIND_VERSION)
+    print("Compiling Tailwind...")
+    subprocess.run(tailwind_command() + ['-c', TAILWIND_CONFIG, '-i', TAILWIND_INPUT, '-o', output, '--minify'],
+                   cwd=BASE_DIR, env=env, check=True)
+    with open(output, 'rb') as f:
+        return f.read()
+
+def download(url):
+    print(f"Downloading {url}...")
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return response.read()
+
+def build():
+    # Start clean so stale hashed files don't pile up
+    shutil.rmtree(DIST_FOLDER, ignore_errors=True)
+    os.makedirs(DIST_FOLDER)
+    manifest = {}
+
+    write_asset('app.css', build_css(), manifest)
+
+    for name, url in VENDOR_ASSETS.items():
+        write_asset(name, download(url), manifest)
+
+    for name in LOCAL_ASSETS:
+        with open(os.path.join(STATIC_FOLDER, name), 'rb') as f:
+            write_asset(name, f.read(), manifest)
+
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    if brotli is None:
+        print("⚠️  brotli not installed; wrote gzip variants only")
+    print("✅ Static assets built")
+
+if __name__ == '__main__':
+    build()
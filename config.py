@@ -1,6 +1,6 @@
 import os
 from datetime import timedelta
-import pytz
+from zoneinfo import ZoneInfo
 
 class Config:
     """Application configuration"""
@@ -11,11 +11,65 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'instance', 'jtkidz.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool - size it to the number of requests a worker serves at
+    # once (threads for gthread, concurrent greenlets for gevent)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds to wait for a free connection
+    DB_POOL_PRE_PING = True  # Postgres: test connections before handing them out
+    DB_POOL_RECYCLE = 1800  # Postgres: seconds before a pooled connection is replaced
+    
+    # SQLite tuning, applied to every connection (see database.apply_sqlite_pragmas)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024))  # bytes
+    
+    # Optional read-only database for reports and exports: a Postgres read replica,
+    # or a SQLite copy refreshed by `flask snapshot-reports-db`, e.g.
+    # sqlite:///file:/path/to/instance/reports.db?mode=ro&uri=true
+    REPORTS_DATABASE_URI = os.environ.get('REPORTS_DATABASE_URL')
+    REPORTS_STALE_AFTER = int(os.environ.get('REPORTS_STALE_AFTER', 3600))  # seconds before the report banner warns
+    
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'img', 'barcodes')
+    PROFILE_PIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'img', 'profiles')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
-    # Timezone - Philippines
-    TIMEZONE = pytz.timezone('Asia/Manila')
+    # Fingerprinted assets from build_assets.py (see services/asset_service.py)
+    ASSETS_USE_MANIFEST = os.environ.get('ASSETS_USE_MANIFEST', '1') == '1'
+    STATIC_ASSET_MAX_AGE = 365 * 24 * 60 * 60  # seconds; hashed names never change content
+    
+    # Timezone - Philippines (services/clock.py decides "today" in this zone)
+    TIMEZONE = ZoneInfo('Asia/Manila')
+    
+    # Recompute Kid.age_group at local midnight (see services/age_group_service.py)
+    AGE_GROUP_REFRESH_ENABLED = os.environ.get('AGE_GROUP_REFRESH_ENABLED', '1') == '1'
+    
+    # Report page cache (see services/cache_service.py)
+    REPORT_CACHE_ENABLED = os.environ.get('REPORT_CACHE_ENABLED', '1') == '1'
+    REPORT_CACHE_MAX_ENTRIES = int(os.environ.get('REPORT_CACHE_MAX_ENTRIES', 256))
+    REPORT_CACHE_TTL_TODAY = 60  # seconds; pages that include today's data
+    REPORT_CACHE_TTL_HISTORICAL = 24 * 60 * 60  # seconds; pages covering past dates only
+    REPORT_PAGE_SIZE = int(os.environ.get('REPORT_PAGE_SIZE', 100))  # rows per page on the site, monthly and lesson detail reports
+    
+    TODAY_COUNTS_TTL = 10  # seconds; scanner page counters
+    
+    # Live scan events (see services/scan_events.py)
+    # 'memory' for a single worker, 'database' to fan out across gunicorn workers
+    SCAN_EVENTS_BROKER = os.environ.get('SCAN_EVENTS_BROKER',
+                                        'database' if int(os.environ.get('WEB_CONCURRENCY', 2)) > 1 else 'memory')
+    # A stream holds its request open, so /attendance/stream is only served by
+    # gevent workers; with sync or gthread workers pages poll the today feed
+    SCAN_STREAM_ENABLED = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent') == 'gevent'
+    SCAN_EVENTS_POLL_INTERVAL = 1.0  # seconds between polls with the database broker
+    SSE_STREAM_TIMEOUT = 55  # seconds before a stream is closed and the browser reconnects
+    SSE_HEARTBEAT_INTERVAL = 15  # seconds between keep-alive comments
+    
+    # Request profiling (see services/metrics_service.py)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+    METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '0') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # bearer token for Prometheus scrapes of /metrics
+    METRICS_N_PLUS_ONE_THRESHOLD = 10  # same statement more often than this in one request is flagged
     
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
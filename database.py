@@ -1,9 +1,192 @@
+from contextlib import contextmanager
+from functools import wraps
+import os
+import sqlite3
+
+import click
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql.dml import UpdateBase
+
+# Bind key of the optional read-only reports database (Config.REPORTS_DATABASE_URI)
+REPORTS_BIND = 'reports'
+
+class RoutingSession(Session):
+    """
+    Session that sends reads made inside reports_database() to the reports bind
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary, so a
+    report that writes (or a scan in the same request) can never land on the
+    replica or snapshot.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not isinstance(clause, UpdateBase)
+                and has_app_context() and g.get('_reports_database')):
+            engine = self._db.engines.get(REPORTS_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def reports_database_ready():
+    """True when a reports database is configured and can be read"""
+    engine = db.engines.get(REPORTS_BIND)
+    if engine is None:
+        return False
+    # Until the first `flask snapshot-reports-db`, reports read the primary
+    return engine.dialect.name != 'sqlite' or os.path.exists(sqlite_file(engine.url))
+
+@contextmanager
+def reports_database():
+    """Run the enclosed read-only queries on the reports database, if one is configured"""
+    previous = g.get('_reports_database', False)
+    g._reports_database = reports_database_ready()
+    try:
+        yield
+    finally:
+        g._reports_database = previous
+
+def uses_reports_database(f):
+    """Decorator for report views; goes below the auth decorators so logins read the primary"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with reports_database():
+            return f(*args, **kwargs)
+    return decorated_function
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+def get_engine_options(config):
+    """Engine and connection pool options for the configured database"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+
+    if url.get_backend_name() == 'sqlite':
+        # In-memory SQLite uses a single shared connection and takes no pool settings
+        if url.database in (None, '', ':memory:'):
+            return {}
+        return {
+            'pool_size': config.get('DB_POOL_SIZE', 5),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+            # Seconds pysqlite waits on a locked database before raising
+            'connect_args': {'timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}
+        }
 
-db = SQLAlchemy()
+    # Server databases (Postgres): keep a warm pool, drop dead connections
+    # before use and recycle them before the server or a proxy times them out
+    return {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800)
+    }
+
+def apply_sqlite_pragmas(engine, config):
+    """
+    Run the SQLite tuning pragmas on every new connection
+
+    WAL lets scans write while reports read, and synchronous=NORMAL is safe
+    under WAL (a power cut can only lose the last transactions, never
+    corrupt the file).
+    """
+    pragmas = [
+        f"PRAGMA journal_mode={config.get('SQLITE_JOURNAL_MODE', 'WAL')}",
+        f"PRAGMA synchronous={config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        f"PRAGMA busy_timeout={int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+        f"PRAGMA mmap_size={int(config.get('SQLITE_MMAP_SIZE', 0))}"
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def get_reports_bind(config):
+    """SQLALCHEMY_BINDS entry for REPORTS_DATABASE_URI"""
+    uri = config['REPORTS_DATABASE_URI']
+    if is_sqlite(uri):
+        # A snapshot file is replaced wholesale by `flask snapshot-reports-db`;
+        # opening a fresh connection per checkout picks up the new file
+        return {'url': uri, 'poolclass': NullPool}
+    return {'url': uri, **get_engine_options(dict(config, SQLALCHEMY_DATABASE_URI=uri))}
+
+def sqlite_file(uri):
+    """Filesystem path of a SQLite URL, including sqlite:///file:...?uri=true forms"""
+    database = make_url(uri).database
+    return database[len('file:'):] if database.startswith('file:') else database
+
+def snapshot_sqlite(db_path, backup_path):
+    """
+    Copy a live SQLite database into backup_path
+
+    VACUUM INTO (SQLite's online backup API on older SQLite) copies a
+    consistent, compacted database even while the app is writing in WAL mode.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        if sqlite3.sqlite_version_info >= (3, 27, 0):
+            conn.execute('VACUUM INTO ?', (backup_path,))
+        else:
+            backup = sqlite3.connect(backup_path)
+            conn.backup(backup)
+            backup.close()
+    finally:
+        conn.close()
+
+# Schema db.create_all() cannot express (views, partitioned tables); services
+# add a hook(conn) with on_create_schema() and create_schema() runs them all
+_schema_hooks = []
+
+def on_create_schema(hook):
+    """Run hook(conn) in create_schema() after the tables exist"""
+    if hook not in _schema_hooks:
+        _schema_hooks.append(hook)
+    return hook
+
+def create_schema():
+    """Create every missing table, view and partition; safe on an existing database"""
+    url = db.engine.url
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+        # The SQLite file's folder (instance/ by default)
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+    db.create_all()
+    with db.engine.begin() as conn:
+        for hook in _schema_hooks:
+            hook(conn)
 
 def init_db(app):
-    """Initialize database with app context"""
+    """Configure the engines and register `flask init-db` (importing the app creates no tables)"""
+    engine_options = get_engine_options(app.config)
+    engine_options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+    if app.config.get('REPORTS_DATABASE_URI'):
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPORTS_BIND] = get_reports_bind(app.config)
+
     db.init_app(app)
+    # The reports database is read-only and has no models of its own; without a
+    # metadata entry db.create_all()/drop_all() leave it alone
+    db.metadatas.pop(REPORTS_BIND, None)
     with app.app_context():
-        db.create_all()
+        if is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+            apply_sqlite_pragmas(db.engine, app.config)
+        reports_engine = db.engines.get(REPORTS_BIND)
+        if reports_engine is not None and reports_engine.dialect.name == 'sqlite':
+            @event.listens_for(reports_engine, 'connect')
+            def set_query_only(dbapi_connection, connection_record):
+                dbapi_connection.execute('PRAGMA query_only=1')
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create the database schema: tables, indexes and the attendance history view"""
+        create_schema()
+        click.echo("✅ Database schema ready")
@@ -0,0 +1,67 @@
+"""
+Gunicorn configuration
+
+Serving mode is selected with GUNICORN_WORKER_CLASS:
+- gevent:  cooperative greenlets (the default), so a slow phone connection or
+           an open /attendance/stream only parks a greenlet instead of
+           pinning a whole worker. Required for live dashboard streams.
+- sync:    one request per worker process (gunicorn's own default); a request
+           longer than `timeout` gets the worker killed, so the scan stream
+           is not served and pages poll instead (Config.SCAN_STREAM_ENABLED)
+- gthread: WEB_CONCURRENCY processes x GUNICORN_THREADS threads each
+
+Compare the modes with: python -m benchmarks.scan_load
+
+Each of the WEB_CONCURRENCY workers is its own process with its own report
+page cache, today-counter cache and scan broker. With more than one worker
+scan events need SCAN_EVENTS_BROKER=database (the default then). The caches
+are keyed on a data version kept in the database, so a write in one worker
+invalidates every worker's cached pages (services/cache_service.py).
+
+With preload_app (on unless GUNICORN_PRELOAD=0) the master imports the app
+and warms its read-only caches once (services/preload_service.py); workers
+are forked from it, share that memory copy-on-write and start serving
+immediately. Each worker drops the inherited database pools after the fork.
+
+Background threads are started per worker once it has loaded the app
+(post_worker_init), never in the master or by create_app(): the master holds
+no connections and writes nothing, with or without preloading.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))  # gthread only
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))  # gevent only
+
+timeout = 30
+graceful_timeout = 30
+# Phones reuse the connection between scans
+keepalive = 5
+
+# Import the app once in the master and fork workers from it
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+if preload_app and worker_class == 'gevent':
+    # Patch before the master imports the app, so preloaded modules use gevent's sockets and locks
+    from gevent import monkey
+    monkey.patch_all()
+
+
+def when_ready(server):
+    if preload_app:
+        from services.preload_service import warm_app
+        warm_app(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from services.preload_service import reset_after_fork
+        reset_after_fork(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    from services.age_group_service import start_age_group_scheduler
+    start_age_group_scheduler(worker.wsgi)
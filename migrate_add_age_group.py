@@ -0,0 +1,29 @@
+"""
+Migration script for the stored age group
+- Adds an indexed age_group column to the kids table
+- Fills it for every kid (same UPDATE the midnight refresh runs)
+Run this once to update existing database
+"""
+from app import app
+from database import db
+from services.age_group_service import refresh_age_groups
+
+def migrate():
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        columns = [col['name'] for col in inspector.get_columns('kids')]
+        
+        with db.engine.connect() as conn:
+            if 'age_group' not in columns:
+                print("Adding age_group column to kids table...")
+                conn.execute(db.text("ALTER TABLE kids ADD COLUMN age_group VARCHAR(20) NOT NULL DEFAULT 'Other'"))
+            else:
+                print("✅ kids.age_group already exists. Skipping.")
+            conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_kids_age_group ON kids (age_group)'))
+            conn.commit()
+        
+        print(f"Computing age groups... {refresh_age_groups()} kids updated")
+        print("✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
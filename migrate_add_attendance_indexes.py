@@ -0,0 +1,28 @@
+"""
+Migration script to add indexes used by the live attendance feed
+Run this once to update existing database (new databases get them from create_all)
+"""
+from app import app
+from database import db
+
+INDEXES = {
+    'ix_attendance_scan_date_site': 'CREATE INDEX IF NOT EXISTS ix_attendance_scan_date_site ON attendance (scan_date, site)',
+}
+
+def migrate():
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        existing = [index['name'] for index in inspector.get_indexes('attendance')]
+        
+        with db.engine.connect() as conn:
+            for name, ddl in INDEXES.items():
+                if name in existing:
+                    print(f"✅ Index {name} already exists. Skipping.")
+                    continue
+                print(f"Creating index {name}...")
+                conn.execute(db.text(ddl))
+            conn.commit()
+        print("✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
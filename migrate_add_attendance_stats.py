@@ -0,0 +1,21 @@
+"""
+Migration script for per-kid attendance stats
+- Creates the kid_attendance_stats table
+- Fills it from all attendance history
+Run this once to update existing database
+"""
+from app import app
+from database import db
+from services.stats_service import rebuild_attendance_stats
+
+def migrate():
+    with app.app_context():
+        # kid_attendance_stats is a new table
+        db.create_all()
+        print("Computing attendance stats...")
+        kids = rebuild_attendance_stats(db.session.connection())
+        db.session.commit()
+        print(f"✅ Migration completed successfully! ({kids} kids)")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,21 @@
+"""
+Migration script for lesson completion bitmaps
+- Creates the lesson_bitmaps table
+- Fills it from all attendance history
+Run this once to update existing database
+"""
+from app import app
+from database import db
+from services.lesson_bitmap_service import rebuild_lesson_bitmaps
+
+def migrate():
+    with app.app_context():
+        # lesson_bitmaps is a new table
+        db.create_all()
+        print("Building lesson bitmaps...")
+        words = rebuild_lesson_bitmaps(db.session.connection())
+        db.session.commit()
+        print(f"✅ Migration completed successfully! ({words} words)")
+
+if __name__ == '__main__':
+    migrate()
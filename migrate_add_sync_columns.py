@@ -0,0 +1,30 @@
+"""
+Migration script for roster delta sync
+- Adds updated_at column to kids and users tables
+- Creates change_log table
+Run this once to update existing database
+"""
+from app import app
+from database import db
+
+def migrate():
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        
+        with db.engine.connect() as conn:
+            for table in ('kids', 'users'):
+                columns = [col['name'] for col in inspector.get_columns(table)]
+                if 'updated_at' not in columns:
+                    print(f"Adding updated_at column to {table} table...")
+                    conn.execute(db.text(f'ALTER TABLE {table} ADD COLUMN updated_at DATETIME'))
+                    conn.execute(db.text(f'UPDATE {table} SET updated_at = created_at'))
+                else:
+                    print(f"✅ {table}.updated_at already exists. Skipping.")
+            conn.commit()
+        
+        # change_log is a new table
+        db.create_all()
+        print("✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,43 @@
+"""
+Migration script for attendance archiving
+- Rebuilds the SQLite attendance table with AUTOINCREMENT, so ids are never
+  reused once old rows have moved to attendance_archive
+- Creates attendance_archive and the attendance_history view
+Run this once to update existing database
+"""
+from app import app
+from database import db
+from models import Attendance
+from services.archive_service import HISTORY_COLUMNS, ensure_history_schema
+
+def migrate():
+    with app.app_context():
+        with db.engine.begin() as conn:
+            if conn.dialect.name == 'sqlite':
+                table_sql = conn.execute(db.text(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'attendance'"
+                )).scalar()
+                if 'AUTOINCREMENT' in table_sql.upper():
+                    print("✅ attendance already uses AUTOINCREMENT. Skipping rebuild.")
+                else:
+                    print("Rebuilding attendance table with AUTOINCREMENT...")
+                    # The view would follow the rename, so recreate it afterwards
+                    conn.execute(db.text('DROP VIEW IF EXISTS attendance_history'))
+                    conn.execute(db.text('ALTER TABLE attendance RENAME TO attendance_old'))
+                    indexes = conn.execute(db.text(
+                        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'attendance_old' AND sql IS NOT NULL"
+                    )).scalars().all()
+                    for name in indexes:
+                        conn.execute(db.text(f'DROP INDEX {name}'))
+                    Attendance.__table__.create(conn)
+                    conn.execute(db.text(
+                        f'INSERT INTO attendance ({HISTORY_COLUMNS}) SELECT {HISTORY_COLUMNS} FROM attendance_old'
+                    ))
+                    conn.execute(db.text('DROP TABLE attendance_old'))
+            
+            print("Creating attendance_archive and attendance_history...")
+            ensure_history_schema(conn)
+        print("✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
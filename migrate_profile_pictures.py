@@ -0,0 +1,44 @@
+"""
+Migration script to convert uploaded profile pictures into resized renditions
+- Re-encodes each original (EXIF stripped) into thumb/card/full files
+- Points kids.profile_pic at the new files and deletes the original
+Run this once after upgrading; pictures already converted are skipped
+"""
+import os
+from app import app
+from config import Config
+from database import db
+from models import Kid
+from services.image_service import HASHED_NAME, save_profile_picture, delete_profile_picture
+
+def migrate():
+    with app.app_context():
+        # Only the columns used here, so this runs before later migrations add theirs
+        kids = db.session.query(Kid.id, Kid.full_name, Kid.profile_pic).filter(Kid.profile_pic.isnot(None)).all()
+        converted = {}
+        
+        for kid in kids:
+            original = kid.profile_pic
+            if HASHED_NAME.match(original):
+                continue
+            if original not in converted:
+                path = os.path.join(Config.PROFILE_PIC_FOLDER, original)
+                if not os.path.exists(path):
+                    print(f"⚠️  {kid.full_name}: {original} is missing. Skipping.")
+                    continue
+                try:
+                    with open(path, 'rb') as f:
+                        converted[original] = save_profile_picture(f)
+                except ValueError as e:
+                    print(f"⚠️  {kid.full_name}: {e}. Skipping.")
+                    continue
+                print(f"   ✓ {original} -> {converted[original]}")
+            db.session.execute(db.update(Kid).where(Kid.id == kid.id).values(profile_pic=converted[original]))
+        
+        db.session.commit()
+        for original in converted:
+            delete_profile_picture(original)
+        print(f"✅ Converted {len(converted)} profile pictures")
+
+if __name__ == '__main__':
+    migrate()
@@ -1,8 +1,45 @@
 from database import db
-from datetime import datetime
+from services import clock
+from datetime import date, datetime
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 import json
 
+def calculate_age(birthday, today=None):
+    """Age in whole years on today (default: clock.today()); 0 if birthday is unknown"""
+    if not birthday:
+        return 0
+    today = today or clock.today()
+    age = today.year - birthday.year
+    # Subtract 1 if birthday hasn't occurred yet this year
+    if (today.month, today.day) < (birthday.month, birthday.day):
+        age -= 1
+    return age
+
+
+# The one definition of the age groups: (filter key, label, youngest, oldest)
+AGE_GROUPS = [
+    ('kids', 'Kids (3-8)', 3, 8),
+    ('risers', 'Risers (9-11)', 9, 11),
+    ('teens', 'Teens (12-14)', 12, 14),
+    ('youth', 'Youth (15+)', 15, None),
+]
+OTHER_AGE_GROUP = 'Other'
+AGE_GROUP_LABELS = {key: label for key, label, _, _ in AGE_GROUPS}
+AGE_GROUP_LABELS['other'] = OTHER_AGE_GROUP
+
+def get_age_group(age):
+    """Age group label for an age in whole years"""
+    for _, label, youngest, oldest in AGE_GROUPS:
+        if age >= youngest and (oldest is None or age <= oldest):
+            return label
+    return OTHER_AGE_GROUP
+
+def _default_age_group(context):
+    # Core bulk inserts (seed, import) get the age group from the row's birthday
+    return get_age_group(calculate_age(context.get_current_parameters().get('birthday')))
+
+
 class User(db.Model):
     """User model for admin and staff"""
     __tablename__ = 'users'
@@ -14,6 +51,7 @@ class User(db.Model):
     role = db.Column(db.String(20), nullable=False, default='staff')  # 'admin' or 'staff'
     assigned_sites = db.Column(db.Text, nullable=True)  # JSON array of assigned sites for staff
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def set_password(self, password):
         """Hash and set password"""
@@ -64,7 +102,10 @@ class Kid(db.Model):
     site = db.Column(db.String(100), nullable=False)
     barcode = db.Column(db.String(50), unique=True, nullable=False)
     status = db.Column(db.String(20), nullable=False, default='active')  # 'active' or 'inactive'
+    # Stored so reports can filter and group in SQL; refreshed daily by services/age_group_service.py
+    age_group = db.Column(db.String(20), nullable=False, default=_default_age_group, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship to attendance
     attendance_records = db.relationship('Attendance', backref='kid', lazy=True)
@@ -72,30 +113,13 @@ class Kid(db.Model):
     @property
     def age(self):
         """Calculate age from birthday (automatically updates on birthday)"""
-        if not self.birthday:
-            return 0
-        from datetime import date
-        today = date.today()
-        age = today.year - self.birthday.year
-        # Subtract 1 if birthday hasn't occurred yet this year
-        if (today.month, today.day) < (self.birthday.month, self.birthday.day):
-            age -= 1
-        return age
+        return calculate_age(self.birthday)
     
-    @property
-    def age_group(self):
-        """Return age group category"""
-        current_age = self.age
-        if 3 <= current_age <= 8:
-            return 'Kids (3-8 yrs old)'
-        elif 9 <= current_age <= 11:
-            return 'Risers (9-11 yrs old)'
-        elif 12 <= current_age <= 14:
-            return 'Teens (12-14 yrs old)'
-        elif current_age >= 15:
-            return 'Youth (15+ years old)'
-        else:
-            return 'Other'
+    @validates('birthday')
+    def update_age_group(self, key, birthday):
+        """Keep age_group in step when a birthday is set or edited"""
+        self.age_group = get_age_group(calculate_age(birthday))
+        return birthday
     
     def __repr__(self):
         return f'<Kid {self.full_name} - {self.barcode}>'
@@ -104,6 +128,13 @@ class Kid(db.Model):
 class Attendance(db.Model):
     """Attendance model for tracking scans"""
     __tablename__ = 'attendance'
+    __table_args__ = (
+        # Today's views and the live feed filter on date and site
+        db.Index('ix_attendance_scan_date_site', 'scan_date', 'site'),
+        # Ids stay unique across attendance and attendance_archive even when
+        # archiving empties this table (services/archive_service.py)
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     kid_id = db.Column(db.Integer, db.ForeignKey('kids.id'), nullable=False)
@@ -121,6 +152,94 @@ class Attendance(db.Model):
         return f'<Attendance kid_id={self.kid_id} lesson={self.lesson} date={self.scan_date}>'
 
 
+def week_number(day):
+    """Monday-based week index: consecutive weeks differ by exactly one"""
+    return (day - date(1970, 1, 5)).days // 7  # 1970-01-05 was a Monday
+
+
+class KidAttendanceStats(db.Model):
+    """Per-kid attendance profile, kept current by services/stats_service.py"""
+    __tablename__ = 'kid_attendance_stats'
+    
+    kid_id = db.Column(db.Integer, db.ForeignKey('kids.id'), primary_key=True)
+    total_scans = db.Column(db.Integer, nullable=False, default=0)
+    lessons_mask = db.Column(db.Integer, nullable=False, default=0)  # bit n-1 set once lesson n was attended
+    first_scan_date = db.Column(db.Date, nullable=True)
+    last_scan_date = db.Column(db.Date, nullable=True)
+    last_scan_week = db.Column(db.Integer, nullable=True)  # week_number(last_scan_date)
+    streak_weeks = db.Column(db.Integer, nullable=False, default=0)  # Weeks in a row ending at last_scan_week
+    
+    kid = db.relationship('Kid', backref=db.backref('attendance_stats', uselist=False, lazy=True))
+    
+    @property
+    def lessons_completed(self):
+        return bin(self.lessons_mask).count('1')
+    
+    def current_streak(self, today):
+        """Weekly streak still running this week or last week; 0 once a whole week was missed"""
+        if self.last_scan_week is None or week_number(today) - self.last_scan_week > 1:
+            return 0
+        return self.streak_weeks
+    
+    def __repr__(self):
+        return f'<KidAttendanceStats kid_id={self.kid_id} scans={self.total_scans}>'
+
+
+class LessonBitmap(db.Model):
+    """
+    One word of the set of kids who attended a lesson at a site, kept current
+    by services/lesson_bitmap_service.py. Bit n of word w is kid id w * 63 + n.
+    """
+    __tablename__ = 'lesson_bitmaps'
+
+    site = db.Column(db.String(100), primary_key=True)
+    lesson = db.Column(db.Integer, primary_key=True)
+    word = db.Column(db.Integer, primary_key=True)
+    bits = db.Column(db.BigInteger, nullable=False, default=0)  # 63 bits so it stays a positive BIGINT
+
+    def __repr__(self):
+        return f'<LessonBitmap {self.site} lesson={self.lesson} word={self.word}>'
+
+
+# Cold attendance history. These tables are created by
+# services/archive_service.py with dialect-specific DDL, not db.create_all()
+history_metadata = db.MetaData()
+
+def _attendance_columns():
+    return [
+        db.Column('id', db.Integer, nullable=False),
+        db.Column('kid_id', db.Integer, db.ForeignKey(Kid.id), nullable=False),
+        db.Column('site', db.String(100), nullable=False),
+        db.Column('lesson', db.Integer, nullable=False),
+        db.Column('scan_date', db.Date, nullable=False),
+        db.Column('scan_time', db.Time, nullable=False),
+        db.Column('scanned_by', db.Integer, db.ForeignKey(User.id), nullable=False),
+        db.Column('created_at', db.DateTime)
+    ]
+
+# Closed quarters moved out of attendance; range-partitioned by quarter on Postgres
+attendance_archive = db.Table(
+    'attendance_archive', history_metadata,
+    *_attendance_columns(),
+    # Postgres requires the partition key in the primary key
+    db.PrimaryKeyConstraint('id', 'scan_date'),
+    db.Index('ix_attendance_archive_scan_date_site', 'scan_date', 'site'),
+    postgresql_partition_by='RANGE (scan_date)'
+)
+
+
+class AttendanceHistory(db.Model):
+    """Read-only view of every scan: attendance UNION ALL attendance_archive"""
+    __table__ = db.Table('attendance_history', history_metadata, *_attendance_columns(),
+                         db.PrimaryKeyConstraint('id'))
+    
+    kid = db.relationship(Kid, viewonly=True, lazy=True)
+    scanner = db.relationship(User, viewonly=True, lazy=True)
+    
+    def __repr__(self):
+        return f'<AttendanceHistory kid_id={self.kid_id} lesson={self.lesson} date={self.scan_date}>'
+
+
 class SiteLessonSettings(db.Model):
     """Track current lesson progress per site"""
     __tablename__ = 'site_lesson_settings'
@@ -133,3 +252,30 @@ class SiteLessonSettings(db.Model):
     
     def __repr__(self):
         return f'<SiteLessonSettings site={self.site} lesson={self.current_lesson}>'
+
+
+class DataVersion(db.Model):
+    """Single row counting commits that changed report data, shared by every worker"""
+    __tablename__ = 'data_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DataVersion {self.version}>'
+
+
+class ChangeLog(db.Model):
+    """Append-only log of kid and user site-assignment changes; seq is the sync cursor handed to clients"""
+    __tablename__ = 'change_log'
+    
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    row_key = db.Column(db.String(50), nullable=True)  # Natural key (kid barcode) so deletions can be synced; None for users
+    site = db.Column(db.String(100), nullable=True)  # Site the row belonged to after (or before, for 'remove') the change
+    op = db.Column(db.String(10), nullable=False)  # 'insert', 'update', 'remove' (moved away) or 'delete'
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ChangeLog {self.seq} {self.op} {self.table_name}:{self.row_id}>'
@@ -1,59 +1,125 @@
 """
 Reset database - Clear all data for fresh testing
+
+Snapshots are taken with VACUUM INTO (SQLite's online backup API on older
+SQLite), which copies a consistent, compacted database even while the app is
+running in WAL mode. Copying the .db file alone would miss writes still in
+the -wal file.
+
+    python reset_database.py                       # snapshot, then clear
+    python reset_database.py --snapshot backup.db  # snapshot only
+    python reset_database.py --restore backup.db   # put a snapshot back
 """
 
+import argparse
 import sqlite3
 import os
 from datetime import datetime
+from sqlalchemy.engine import make_url
+from config import Config
+from database import snapshot_sqlite
+
+def get_db_path():
+    url = make_url(Config.SQLALCHEMY_DATABASE_URI)
+    if url.get_backend_name() != 'sqlite':
+        raise SystemExit("❌ reset_database.py only works with SQLite databases")
+    return url.database
+
+def snapshot(db_path, backup_path):
+    """Copy a live database into backup_path"""
+    snapshot_sqlite(db_path, backup_path)
+
+def read_data_version(cursor):
+    """The report cache data version (services/cache_service.py), 0 if there is none"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'data_version'")
+    if not cursor.fetchone():
+        return 0
+    cursor.execute('SELECT version FROM data_version WHERE id = 1')
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def set_data_version(cursor, version):
+    """Move the data version past every version cached pages may be keyed on"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'data_version'")
+    if cursor.fetchone():
+        cursor.execute('UPDATE data_version SET version = ? WHERE id = 1', (version,))
+
+def restore(backup_path, db_path):
+    """Overwrite the live database with a snapshot, page by page under a lock"""
+    source = sqlite3.connect(backup_path)
+    target = sqlite3.connect(db_path)
+    try:
+        live_version = read_data_version(target.cursor())
+        source.backup(target)
+        # The snapshot's older version could match pages cached from newer data
+        cursor = target.cursor()
+        set_data_version(cursor, max(live_version, read_data_version(cursor)) + 1)
+        target.commit()
+    finally:
+        source.close()
+        target.close()
 
 def reset_database():
-    db_path = 'instance/jtkidz.db'
-    
+    db_path = get_db_path()
+
     # Create backup first
-    backup_path = f'instance/jtkidz_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db'
-    
+    backup_path = os.path.join(os.path.dirname(db_path), f'jtkidz_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db')
+
     if os.path.exists(db_path):
         print(f"Creating backup: {backup_path}")
-        import shutil
-        shutil.copy2(db_path, backup_path)
-    
+        snapshot(db_path, backup_path)
+
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    
+
     print("\nClearing database...")
-    
+
     try:
-        # Clear all tables (in order due to foreign keys)
+        # One transaction; DELETE without WHERE lets SQLite drop whole tables at once
         print("- Clearing attendance records...")
         cursor.execute('DELETE FROM attendance')
-        
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'attendance_archive'")
+        if cursor.fetchone():
+            cursor.execute('DELETE FROM attendance_archive')
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lesson_bitmaps'")
+        if cursor.fetchone():
+            cursor.execute('DELETE FROM lesson_bitmaps')
+
         print("- Clearing site lesson settings...")
         cursor.execute('DELETE FROM site_lesson_settings')
-        
+
         print("- Clearing kids...")
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'kid_attendance_stats'")
+        if cursor.fetchone():
+            cursor.execute('DELETE FROM kid_attendance_stats')
         cursor.execute('DELETE FROM kids')
-        
+        cursor.execute('DELETE FROM change_log')
+
         print("- Clearing users (keeping admin)...")
         # Keep admin user, delete others
         cursor.execute("DELETE FROM users WHERE email != 'admin@jtkidz.com'")
-        
+
         # Reset admin password to default
         from werkzeug.security import generate_password_hash
         admin_password = generate_password_hash('admin123')
         cursor.execute("UPDATE users SET password = ? WHERE email = 'admin@jtkidz.com'", (admin_password,))
-        
+
+        # Raw SQL skips the app's hooks: invalidate cached report pages here
+        set_data_version(cursor, read_data_version(cursor) + 1)
+
         conn.commit()
-        
+
         # Show remaining data
         cursor.execute('SELECT COUNT(*) FROM kids')
         kids_count = cursor.fetchone()[0]
-        
+
         cursor.execute('SELECT COUNT(*) FROM attendance')
         attendance_count = cursor.fetchone()[0]
-        
+
         cursor.execute('SELECT COUNT(*) FROM users')
         users_count = cursor.fetchone()[0]
-        
+
         print("\n✅ Database reset complete!")
         print(f"\nRemaining records:")
         print(f"  - Kids: {kids_count}")
@@ -63,7 +129,7 @@ def reset_database():
         print("\nAdmin login:")
         print("  Email: admin@jtkidz.com")
         print("  Password: admin123")
-        
+
     except sqlite3.Error as e:
         print(f"\n❌ Error: {e}")
         conn.rollback()
@@ -72,8 +138,24 @@ def reset_database():
         conn.close()
 
 if __name__ == '__main__':
-    confirm = input("⚠️  This will DELETE all kids, attendance, and staff data!\nType 'RESET' to confirm: ")
-    if confirm == 'RESET':
-        reset_database()
+    parser = argparse.ArgumentParser(description='Reset, snapshot or restore the SQLite database')
+    parser.add_argument('--snapshot', metavar='PATH', help='Only write a snapshot of the database to PATH')
+    parser.add_argument('--restore', metavar='PATH', help='Replace the database with the snapshot at PATH')
+    args = parser.parse_args()
+
+    if args.snapshot:
+        snapshot(get_db_path(), args.snapshot)
+        print(f"✅ Snapshot saved to: {args.snapshot}")
+    elif args.restore:
+        confirm = input(f"⚠️  This will REPLACE the database with {args.restore}!\nType 'RESTORE' to confirm: ")
+        if confirm == 'RESTORE':
+            restore(args.restore, get_db_path())
+            print("✅ Database restored")
+        else:
+            print("❌ Restore cancelled")
     else:
-        print("❌ Reset cancelled")
+        confirm = input("⚠️  This will DELETE all kids, attendance, and staff data!\nType 'RESET' to confirm: ")
+        if confirm == 'RESET':
+            reset_database()
+        else:
+            print("❌ Reset cancelled")
@@ -1,121 +1,153 @@
 """
 Seed database with initial admin user and sample data
 Run this once to initialize the system
+
+All rows are written with bulk Core inserts in one transaction, so large
+fixtures take seconds:
+    python seed.py                                  # 30 kids, 7 days of attendance
+    python seed.py --kids 50000 --days 28 --skip-barcodes   # ~1M attendance rows
+    python seed.py --barcodes-only                  # render barcodes skipped earlier
 """
 from app import app
-from database import db
-from models import User, Kid, Attendance
-from services.barcode_service import generate_barcode
+from database import db, create_schema
+from models import User, Kid, Attendance, KidAttendanceStats, LessonBitmap, SiteLessonSettings, ChangeLog, attendance_archive
+from services.barcode_service import generate_barcode, barcode_filename
+from services.stats_service import rebuild_attendance_stats
+from services.lesson_bitmap_service import rebuild_lesson_bitmaps
+from services.cache_service import bump_data_version
+from config import Config
+from services import clock
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, time, timedelta
+from werkzeug.security import generate_password_hash
+import argparse
+import os
 import random
 
-def seed_database():
+BATCH_SIZE = 10000
+
+# Sample sites in Puerto Princesa
+SITES = [
+    "Barangay San Pedro",
+    "Barangay Tagburos",
+    "Barangay Bancao-Bancao",
+    "Barangay Manalo",
+    "Barangay Mabuhay"
+]
+
+# Sample Filipino names
+FIRST_NAMES = ["Juan", "Maria", "Jose", "Ana", "Pedro", "Rosa", "Miguel", "Sofia", "Carlos", "Elena",
+               "Diego", "Isabel", "Luis", "Carmen", "Rafael", "Lucia", "Gabriel", "Teresa", "Daniel", "Patricia"]
+LAST_NAMES = ["Santos", "Reyes", "Cruz", "Bautista", "Garcia", "Mendoza", "Lopez", "Gonzales", "Rodriguez", "Flores"]
+
+def bulk_insert(model, rows):
+    """Insert rows with Core executemany batches on the session's transaction (no ORM bookkeeping)"""
+    conn = db.session.connection()
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.execute(model.__table__.insert(), rows[start:start + BATCH_SIZE])
+
+def seed_database(kid_count=30, days=7, render_barcodes=True):
     with app.app_context():
+        print("Creating database schema...")
+        create_schema()
+
         # Clear existing data (optional - comment out if you want to keep existing data)
         print("Clearing existing data...")
-        Attendance.query.delete()
-        Kid.query.delete()
-        User.query.delete()
-        db.session.commit()
-        
-        # Create admin user
-        print("Creating admin user...")
-        admin = User(
-            name="Admin User",
-            email="admin@jtkidz.com",
-            role="admin"
-        )
-        admin.set_password("admin123")
-        db.session.add(admin)
-        
-        # Create staff user
-        print("Creating staff user...")
-        staff = User(
-            name="Staff Volunteer",
-            email="staff@jtkidz.com",
-            role="staff"
-        )
-        staff.set_password("staff123")
-        db.session.add(staff)
-        
-        db.session.commit()
-        
-        # Sample sites in Puerto Princesa
-        sites = [
-            "Barangay San Pedro",
-            "Barangay Tagburos",
-            "Barangay Bancao-Bancao",
-            "Barangay Manalo",
-            "Barangay Mabuhay"
-        ]
-        
-        # Sample Filipino names
-        first_names = ["Juan", "Maria", "Jose", "Ana", "Pedro", "Rosa", "Miguel", "Sofia", "Carlos", "Elena",
-                      "Diego", "Isabel", "Luis", "Carmen", "Rafael", "Lucia", "Gabriel", "Teresa", "Daniel", "Patricia"]
-        last_names = ["Santos", "Reyes", "Cruz", "Bautista", "Garcia", "Mendoza", "Lopez", "Gonzales", "Rodriguez", "Flores"]
-        
-        # Create sample kids
-        print("Creating sample kids...")
-        kids_list = []
-        for i in range(30):
-            full_name = f"{random.choice(first_names)} {random.choice(last_names)}"
-            age = random.randint(5, 17)
-            site = random.choice(sites)
-            barcode = f"JT{(i+1):06d}"
-            
-            kid = Kid(
-                full_name=full_name,
-                age=age,
-                site=site,
-                barcode=barcode,
-                status="active"
-            )
-            db.session.add(kid)
-            kids_list.append(kid)
-            
-        db.session.commit()
-        
-        # Generate barcodes for all kids
-        print("Generating barcodes...")
-        for kid in kids_list:
-            try:
-                generate_barcode(kid.barcode, kid.full_name)
-                print(f"Generated barcode for {kid.full_name} ({kid.barcode})")
-            except Exception as e:
-                print(f"Error generating barcode for {kid.full_name}: {e}")
-        
-        # Create sample attendance for the past 7 days
-        print("Creating sample attendance records...")
-        today = date.today()
-        for days_ago in range(7):
+        for model in (Attendance, attendance_archive, KidAttendanceStats, LessonBitmap, ChangeLog, SiteLessonSettings, Kid, User):
+            db.session.execute(db.delete(model))
+
+        print("Creating admin and staff users...")
+        bulk_insert(User, [
+            {'name': "Admin User", 'email': "admin@jtkidz.com", 'password': generate_password_hash("admin123"), 'role': "admin"},
+            {'name': "Staff Volunteer", 'email': "staff@jtkidz.com", 'password': generate_password_hash("staff123"), 'role': "staff"}
+        ])
+        user_ids = [user_id for user_id, in db.session.query(User.id)]
+
+        print(f"Creating {kid_count} sample kids...")
+        today = clock.today()
+        kid_rows = [{
+            'full_name': f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}",
+            'birthday': today - timedelta(days=random.randint(5 * 365, 17 * 365)),
+            'gender': random.choice(["Male", "Female"]),
+            'site': random.choice(SITES),
+            'barcode': f"JT{(i + 1):06d}",
+            'status': "active"
+        } for i in range(kid_count)]
+        bulk_insert(Kid, kid_rows)
+        kids = db.session.query(Kid.id, Kid.site).all()
+
+        # Create sample attendance for the past days
+        print(f"Creating sample attendance records for the past {days} days...")
+        # Random time between 2 PM and 5 PM
+        scan_times = [time(hour, minute) for hour in range(14, 17) for minute in range(60)]
+        attendance_rows = []
+        for days_ago in range(days):
             attendance_date = today - timedelta(days=days_ago)
-            
+
             # Random 60-80% of kids attend each day
-            attending_kids = random.sample(kids_list, random.randint(18, 24))
-            
-            for kid in attending_kids:
-                # Random time between 2 PM and 5 PM
-                hour = random.randint(14, 16)
-                minute = random.randint(0, 59)
-                scan_time = time(hour, minute)
-                
-                attendance = Attendance(
-                    kid_id=kid.id,
-                    site=kid.site,
-                    scan_date=attendance_date,
-                    scan_time=scan_time,
-                    scanned_by=random.choice([admin.id, staff.id])
-                )
-                db.session.add(attendance)
-        
+            attending_kids = random.sample(kids, int(len(kids) * random.uniform(0.6, 0.8)))
+            times = random.choices(scan_times, k=len(attending_kids))
+            scanners = random.choices(user_ids, k=len(attending_kids))
+
+            attendance_rows.extend({
+                'kid_id': kid_id,
+                'site': site,
+                'scan_date': attendance_date,
+                'scan_time': scan_time,
+                'scanned_by': scanned_by
+            } for (kid_id, site), scan_time, scanned_by in zip(attending_kids, times, scanners))
+        bulk_insert(Attendance, attendance_rows)
+        # Core inserts skip the per-scan stats and bitmap upserts
+        rebuild_attendance_stats(db.session.connection())
+        rebuild_lesson_bitmaps(db.session.connection())
+        # ...and the report cache invalidation, so cached pages of the old data go
+        bump_data_version()
+
         db.session.commit()
-        
+
         print("\n✅ Database seeded successfully!")
         print("\n📋 Login Credentials:")
         print("Admin: admin@jtkidz.com / admin123")
         print("Staff: staff@jtkidz.com / staff123")
-        print(f"\n👥 Created {len(kids_list)} sample kids across {len(sites)} sites")
-        print("🎯 Sample attendance data added for the past 7 days")
+        print(f"\n👥 Created {kid_count} sample kids across {len(SITES)} sites")
+        print(f"🎯 {len(attendance_rows)} sample attendance records added for the past {days} days")
+
+    if render_barcodes:
+        generate_missing_barcodes()
+    else:
+        print("\n⏭️  Skipped barcode images; run `python seed.py --barcodes-only` to render them")
+
+def _render_barcode(kid):
+    barcode_value, full_name = kid
+    try:
+        generate_barcode(barcode_value, full_name)
+        return None
+    except Exception as e:
+        return f"Error generating barcode for {full_name}: {e}"
+
+def generate_missing_barcodes():
+    """Render barcode images for kids that have none, on every CPU core"""
+    existing = set(os.listdir(Config.UPLOAD_FOLDER)) if os.path.isdir(Config.UPLOAD_FOLDER) else set()
+    with app.app_context():
+        kids = [(barcode_value, full_name) for barcode_value, full_name in db.session.query(Kid.barcode, Kid.full_name)
+                if f"{barcode_filename(barcode_value, full_name)}.png" not in existing]
+
+    print(f"Generating {len(kids)} barcodes...")
+    with ProcessPoolExecutor() as pool:
+        for error in pool.map(_render_barcode, kids, chunksize=50):
+            if error:
+                print(error)
+    print("✅ Barcodes generated")
 
 if __name__ == "__main__":
-    seed_database()
+    parser = argparse.ArgumentParser(description='Seed the database with sample users, kids and attendance')
+    parser.add_argument('--kids', type=int, default=30, help='Number of sample kids')
+    parser.add_argument('--days', type=int, default=7, help='Days of sample attendance')
+    parser.add_argument('--skip-barcodes', action='store_true', help='Do not render barcode images')
+    parser.add_argument('--barcodes-only', action='store_true', help='Only render missing barcode images')
+    args = parser.parse_args()
+
+    if args.barcodes_only:
+        generate_missing_barcodes()
+    else:
+        seed_database(args.kids, args.days, not args.skip_barcodes)
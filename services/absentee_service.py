@@ -0,0 +1,120 @@
+"""
+At-risk kids: who stopped coming, who is missing the current lesson, who is fading
+
+Works from the per-kid profile in kid_attendance_stats and the lesson
+progress in SiteLessonSettings instead of re-counting attendance history, so
+the cost does not grow with years of scans. Per site it runs one query over
+the active kids (joined to their stats) and one grouped query over the last
+2 x TREND_WEEKS weeks of scans, served by the (scan_date, site) index.
+
+Lessons are taught one per week: the current lesson began on the site's
+lesson_start_date and each earlier lesson a week before the next.
+"""
+import csv
+import io
+from datetime import timedelta
+
+from sqlalchemy import func
+
+from database import db
+from models import Kid, KidAttendanceStats, SiteLessonSettings
+from services.archive_service import history_model
+
+TREND_WEEKS = 4  # recent window; compared with the TREND_WEEKS before it
+CSV_COLUMNS = ['Name', 'Barcode', 'Age Group', 'Site', 'Last Seen', 'Weeks Absent',
+               'Total Scans', 'Lessons Completed', 'Recent Days', 'Earlier Days', 'Reasons']
+
+
+def _attendance_trend(site, today):
+    """kid_id -> (days attended in the last TREND_WEEKS weeks, days in the TREND_WEEKS before)"""
+    start = today - timedelta(weeks=2 * TREND_WEEKS)
+    middle = today - timedelta(weeks=TREND_WEEKS)
+    source = history_model(start)
+    recent = func.count(func.distinct(db.case((source.scan_date >= middle, source.scan_date))))
+    earlier = func.count(func.distinct(db.case((source.scan_date < middle, source.scan_date))))
+    rows = db.session.query(source.kid_id, recent, earlier).filter(
+        source.scan_date >= start,
+        source.site == site
+    ).group_by(source.kid_id)
+    return {kid_id: (recent_days, earlier_days) for kid_id, recent_days, earlier_days in rows}
+
+
+def find_absentees(today, site=None, missed_lessons=3):
+    """
+    Active kids needing follow-up, worst first within each site
+
+    Returns dicts with the kid, their stats row (None if never scanned),
+    weeks since last seen, the recent/earlier trend and a list of reasons.
+    """
+    if site:
+        sites = [site]
+    else:
+        sites = [s for s, in db.session.query(Kid.site).filter(Kid.status == 'active').distinct().order_by(Kid.site)]
+    settings = {s.site: s for s in SiteLessonSettings.query.filter(SiteLessonSettings.site.in_(sites))}
+
+    absentees = []
+    for site_name in sites:
+        setting = settings.get(site_name)
+        current_lesson = setting.current_lesson if setting else None
+        lesson_start = setting.lesson_start_date if setting and setting.lesson_start_date else today
+        # First day of the oldest of the last `missed_lessons` lessons
+        missed_since = lesson_start - timedelta(weeks=missed_lessons - 1)
+        trend = _attendance_trend(site_name, today)
+
+        kids = db.session.query(Kid, KidAttendanceStats).outerjoin(KidAttendanceStats).filter(
+            Kid.site == site_name,
+            Kid.status == 'active'
+        )
+        site_rows = []
+        for kid, stats in kids:
+            reasons = []
+            last_seen = stats.last_scan_date if stats else None
+            if last_seen is None:
+                reasons.append('Never attended')
+            elif last_seen < missed_since:
+                reasons.append(f'Missed the last {missed_lessons} lessons')
+            if current_lesson and last_seen and not stats.lessons_mask & (1 << (current_lesson - 1)):
+                reasons.append(f'Has never attended Lesson {current_lesson}')
+            recent_days, earlier_days = trend.get(kid.id, (0, 0))
+            if earlier_days >= 2 and recent_days * 2 <= earlier_days and last_seen and last_seen >= missed_since:
+                reasons.append(f'Attendance dropping ({earlier_days} → {recent_days} days)')
+            if reasons:
+                site_rows.append({
+                    'kid': kid,
+                    'stats': stats,
+                    'weeks_absent': (today - last_seen).days // 7 if last_seen else None,
+                    'recent_days': recent_days,
+                    'earlier_days': earlier_days,
+                    'reasons': reasons
+                })
+        # Longest absence first; kids who never came at the end
+        site_rows.sort(key=lambda row: (row['weeks_absent'] is None, -(row['weeks_absent'] or 0), row['kid'].full_name))
+        absentees.extend(site_rows)
+    return absentees
+
+
+def absentees_csv(absentees):
+    """Yield the absentee list as CSV text, one line at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for row in absentees:
+        kid, stats = row['kid'], row['stats']
+        writer.writerow([
+            kid.full_name, kid.barcode, kid.age_group, kid.site,
+            stats.last_scan_date.isoformat() if stats else '',
+            '' if row['weeks_absent'] is None else row['weeks_absent'],
+            stats.total_scans if stats else 0,
+            stats.lessons_completed if stats else 0,
+            row['recent_days'], row['earlier_days'],
+            '; '.join(row['reasons'])
+        ])
+        yield flush()
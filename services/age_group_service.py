@@ -0,0 +1,132 @@
+"""
+Daily refresh of the stored Kid.age_group column
+
+A kid's age group only changes on their birthday, so one UPDATE at local
+midnight (Config.TIMEZONE, via services/clock.py) keeps the column right.
+Nothing runs when the app is created or imported. The refresh runs from:
+- `flask refresh-age-groups`, e.g. as a cron job just after midnight
+- start_age_group_scheduler(), a midnight timer thread that gunicorn.conf.py
+  starts in each worker
+- the first request of a day the worker has not refreshed yet (after
+  downtime or a restart). It never makes that request wait: if another
+  request is already refreshing it goes ahead, and a failure is logged and
+  retried AGE_GROUP_RETRY_SECONDS later instead of failing the request.
+The UPDATE only touches rows whose group changed, so extra runs from other
+workers cost nothing.
+"""
+import threading
+import time
+from datetime import date
+
+import click
+
+from database import db
+from models import AGE_GROUPS, OTHER_AGE_GROUP, Kid
+from services import clock
+from services.cache_service import bump_data_version
+
+
+def birthday_cutoff(today, age):
+    """Latest birthday of someone who is at least `age` years old on `today`"""
+    try:
+        return today.replace(year=today.year - age)
+    except ValueError:
+        # Today is Feb 29 and that year had none: everyone born up to Feb 28 qualifies
+        return date(today.year - age, 2, 28)
+
+
+def age_group_expression(today):
+    """SQL CASE computing the age group from Kid.birthday on `today`"""
+    whens = []
+    for _, label, youngest, oldest in AGE_GROUPS:
+        condition = Kid.birthday <= birthday_cutoff(today, youngest)
+        if oldest is not None:
+            condition = condition & (Kid.birthday > birthday_cutoff(today, oldest + 1))
+        whens.append((condition, label))
+    return db.case(*whens, else_=OTHER_AGE_GROUP)
+
+
+def refresh_age_groups(today=None):
+    """Recompute every kid's age group for `today`; returns the number of rows changed"""
+    today = today or clock.today()
+    new_group = age_group_expression(today)
+    result = db.session.execute(
+        db.update(Kid).where(db.or_(Kid.age_group.is_(None), Kid.age_group != new_group)).values(age_group=new_group),
+        execution_options={'synchronize_session': False}
+    )
+    if result.rowcount:
+        bump_data_version()
+    db.session.commit()
+    return result.rowcount
+
+
+AGE_GROUP_RETRY_SECONDS = 300
+
+
+def _refresh_for_app(app, today, blocking=True):
+    """
+    Refresh once per day per worker; returns without work if already done
+
+    With blocking=False it also returns at once when another thread holds the
+    lock. Errors are logged and the next try is put off AGE_GROUP_RETRY_SECONDS.
+    """
+    state = app.extensions['age_groups']
+    if not state['lock'].acquire(blocking=blocking):
+        return
+    try:
+        if state['date'] == today or clock.timestamp() < state['retry_at']:
+            return
+        try:
+            changed = refresh_age_groups(today)
+        except Exception:
+            db.session.rollback()
+            state['retry_at'] = clock.timestamp() + AGE_GROUP_RETRY_SECONDS
+            app.logger.exception('Age group refresh failed; retrying in %s s', AGE_GROUP_RETRY_SECONDS)
+            return
+        state['date'] = today
+        state['retry_at'] = 0.0
+    finally:
+        state['lock'].release()
+    if changed:
+        app.logger.info('Age groups refreshed: %s kids moved', changed)
+
+
+def _run_scheduler(app):
+    while True:
+        # A second past midnight so clock.today() has rolled over
+        time.sleep(clock.get_clock().seconds_until_midnight() + 1)
+        with app.app_context():
+            try:
+                _refresh_for_app(app, clock.today())
+            finally:
+                db.session.remove()
+
+
+def start_age_group_scheduler(app):
+    """Start the midnight refresh thread in this process (once; call after forking)"""
+    state = app.extensions['age_groups']
+    if not app.config.get('AGE_GROUP_REFRESH_ENABLED', True):
+        return
+    if state['scheduler'] is not None and state['scheduler'].is_alive():
+        return
+    state['scheduler'] = threading.Thread(target=_run_scheduler, args=(app,), name='age-group-refresh', daemon=True)
+    state['scheduler'].start()
+
+
+def init_age_groups(app):
+    """Register `flask refresh-age-groups` and the first-request catch-up"""
+    app.extensions['age_groups'] = {'date': None, 'retry_at': 0.0, 'lock': threading.Lock(), 'scheduler': None}
+
+    @app.cli.command('refresh-age-groups')
+    def refresh_age_groups_command():
+        """Recompute Kid.age_group for today"""
+        click.echo(f"✅ {refresh_age_groups()} kids moved to a new age group")
+
+    if not app.config.get('AGE_GROUP_REFRESH_ENABLED', True):
+        return
+
+    @app.before_request
+    def catch_up_age_groups():
+        today = clock.today()
+        if app.extensions['age_groups']['date'] != today:
+            _refresh_for_app(app, today, blocking=False)
@@ -0,0 +1,114 @@
+"""
+Attendance partitioning: a hot table for the current quarter, cold history beside it
+
+Scans, today's pages, the live feed and the duplicate check only touch the
+attendance table. `flask archive-attendance` moves every closed quarter into
+attendance_archive, so that table (and its indexes) stays one quarter deep.
+On Postgres the archive is natively range-partitioned with one partition per
+quarter; on SQLite it is a plain table with the same columns.
+
+Reports read the attendance_history view (attendance UNION ALL
+attendance_archive, mapped as models.AttendanceHistory) so they cover the
+whole range no matter when archiving last ran. history_model(day) picks the
+hot table for days that can never have been archived.
+"""
+from datetime import date
+
+import click
+
+from database import db, on_create_schema
+from models import Attendance, AttendanceHistory, attendance_archive
+from services import clock
+from services.cache_service import bump_data_version
+
+HISTORY_COLUMNS = 'id, kid_id, site, lesson, scan_date, scan_time, scanned_by, created_at'
+
+
+def quarter_start(day):
+    return date(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+
+
+def next_quarter(day):
+    start = quarter_start(day)
+    return date(start.year + 1, 1, 1) if start.month == 10 else date(start.year, start.month + 3, 1)
+
+
+def history_model(day=None):
+    """
+    Attendance for days in the current quarter (never archived), otherwise
+    AttendanceHistory. Pass None for queries over a date range.
+    """
+    if day is not None and day >= quarter_start(clock.today()):
+        return Attendance
+    return AttendanceHistory
+
+
+def _is_postgres(bind):
+    return bind.dialect.name == 'postgresql'
+
+
+def ensure_history_schema(bind):
+    """Create attendance_archive and the attendance_history view if missing"""
+    attendance_archive.create(bind, checkfirst=True)
+    select = (f'SELECT {HISTORY_COLUMNS} FROM attendance '
+              f'UNION ALL SELECT {HISTORY_COLUMNS} FROM attendance_archive')
+    if _is_postgres(bind):
+        bind.execute(db.text(f'CREATE OR REPLACE VIEW attendance_history AS {select}'))
+    else:
+        bind.execute(db.text(f'CREATE VIEW IF NOT EXISTS attendance_history AS {select}'))
+
+
+def _ensure_partition(bind, start, end):
+    """Postgres: create the archive partition for the quarter starting at `start`"""
+    name = f'attendance_archive_{start.year}q{(start.month - 1) // 3 + 1}'
+    bind.execute(db.text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF attendance_archive "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+def archive_attendance(before):
+    """
+    Move attendance rows dated before `before` (rounded down to a quarter start)
+    into attendance_archive, one quarter per transaction.
+
+    Returns a list of (quarter start, rows moved).
+    """
+    before = quarter_start(before)
+    oldest = db.session.query(db.func.min(Attendance.scan_date)).filter(Attendance.scan_date < before).scalar()
+    moved = []
+    start = quarter_start(oldest) if oldest else before
+    while start < before:
+        end = next_quarter(start)
+        conn = db.session.connection()
+        if _is_postgres(conn):
+            _ensure_partition(conn, start, end)
+        in_quarter = (Attendance.scan_date >= start) & (Attendance.scan_date < end)
+        conn.execute(attendance_archive.insert().from_select(
+            [c.name for c in attendance_archive.columns],
+            db.select(*[Attendance.__table__.c[c.name] for c in attendance_archive.columns]).where(in_quarter)
+        ))
+        count = conn.execute(db.delete(Attendance).where(in_quarter)).rowcount
+        if count:
+            bump_data_version()
+            moved.append((start, count))
+        db.session.commit()
+        start = end
+    return moved
+
+
+def init_archive(app):
+    """Add the history schema to `flask init-db` and register `flask archive-attendance`"""
+    on_create_schema(ensure_history_schema)
+
+    @app.cli.command('archive-attendance')
+    @click.option('--before', help='Archive quarters before this date (YYYY-MM-DD); default: the current quarter')
+    def archive_attendance_command(before):
+        """Move closed quarters from attendance into attendance_archive"""
+        cutoff = date.fromisoformat(before) if before else clock.today()
+        if quarter_start(cutoff) > quarter_start(clock.today()):
+            raise click.BadParameter('the current quarter stays in the attendance table', param_hint='--before')
+        moved = archive_attendance(cutoff)
+        for start, count in moved:
+            click.echo(f"  {start.year} Q{(start.month - 1) // 3 + 1}: {count} scans archived")
+        click.echo(f"✅ {sum(count for _, count in moved)} scans moved to attendance_archive")
@@ -0,0 +1,86 @@
+"""
+Fingerprinted static assets
+
+build_assets.py writes the purged Tailwind stylesheet, vendored libraries and
+our own scripts to static/dist under content-hash names (scanner.3f9c2a1b7e04.js),
+with .gz/.br siblings, and records logical name -> hashed name in
+static/dist/manifest.json. Because a hashed name never changes content, those
+files are served with a one-year immutable Cache-Control.
+
+Until the build has run (or with ASSETS_USE_MANIFEST off) templates fall back
+to the plain static file or the pinned CDN URL.
+"""
+import json
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory, url_for
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+DIST_FOLDER = os.path.join(STATIC_FOLDER, 'dist')
+MANIFEST_PATH = os.path.join(DIST_FOLDER, 'manifest.json')
+
+# Third-party browser libraries: logical name -> pinned upstream URL
+VENDOR_ASSETS = {
+    'html5-qrcode.min.js': 'https://unpkg.com/html5-qrcode@2.3.8/html5-qrcode.min.js',
+}
+
+# Our own static files that get fingerprinted (paths relative to static/)
+LOCAL_ASSETS = ['js/scanner.js']
+
+# Precompressed variants, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(name):
+    """
+    URL of a static asset by logical name ('app.css', 'js/scanner.js', ...)
+
+    Returns the fingerprinted file when built, otherwise the unhashed static
+    file or CDN URL. Returns None for a built-only asset (app.css) that does
+    not exist yet.
+    """
+    manifest = current_app.extensions.get('asset_manifest', {})
+    if name in manifest:
+        return url_for('dist_asset', filename=manifest[name])
+    if name in VENDOR_ASSETS:
+        return VENDOR_ASSETS[name]
+    if name in LOCAL_ASSETS:
+        return url_for('static', filename=name)
+    return None
+
+
+def serve_dist(filename):
+    """Serve a fingerprinted file, preferring a precompressed variant the client accepts"""
+    max_age = current_app.config.get('STATIC_ASSET_MAX_AGE', 365 * 24 * 60 * 60)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    response = None
+    for encoding, suffix in ENCODINGS:
+        if encoding in request.accept_encodings and os.path.isfile(os.path.join(DIST_FOLDER, filename + suffix)):
+            response = send_from_directory(DIST_FOLDER, filename + suffix, mimetype=mimetype, max_age=max_age)
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(DIST_FOLDER, filename, mimetype=mimetype, max_age=max_age)
+
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_assets(app):
+    """Load the asset manifest and register the hashed-file route and asset_url()"""
+    use_manifest = app.config.get('ASSETS_USE_MANIFEST', True)
+    app.extensions['asset_manifest'] = load_manifest() if use_manifest else {}
+    app.add_url_rule(app.static_url_path + '/dist/<path:filename>', endpoint='dist_asset', view_func=serve_dist)
+    app.add_template_global(asset_url)
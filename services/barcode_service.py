@@ -1,8 +1,11 @@
-import barcode
-from barcode.writer import ImageWriter
 import os
 from config import Config
 
+def barcode_filename(barcode_value, kid_name):
+    """Filename (without .png) of a kid's barcode image"""
+    safe_name = ''.join(c if c.isalnum() else '_' for c in kid_name)
+    return f'{barcode_value}_{safe_name}'
+
 def generate_barcode(barcode_value, kid_name):
     """
     Generate Code128 barcode image
@@ -14,6 +17,10 @@ def generate_barcode(barcode_value, kid_name):
     Returns:
         Filename of generated barcode image
     """
+    # python-barcode pulls in PIL; only kid creation and seeding need it
+    import barcode
+    from barcode.writer import ImageWriter
+    
     # Ensure upload folder exists
     os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
     
@@ -24,8 +31,7 @@ def generate_barcode(barcode_value, kid_name):
     barcode_instance = code128(barcode_value, writer=ImageWriter())
     
     # Safe filename
-    safe_name = ''.join(c if c.isalnum() else '_' for c in kid_name)
-    filename = f'{barcode_value}_{safe_name}'
+    filename = barcode_filename(barcode_value, kid_name)
     
     # Full path without extension (barcode library adds .png)
     filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
@@ -43,10 +49,32 @@ def generate_barcode(barcode_value, kid_name):
     
     return f'{filename}.png'
 
+# (folder, folder mtime, {barcode value: filename}); shared by forked workers
+# when gunicorn preloads the app, re-read by whichever process sees a change
+_index = (None, None, {})
+
+def barcode_files():
+    """
+    Barcode value -> image filename in UPLOAD_FOLDER
+
+    Costs one stat of the folder; the listing is only read again after a
+    barcode has been generated or removed (by any worker).
+    """
+    global _index
+    folder = Config.UPLOAD_FOLDER
+    try:
+        mtime = os.stat(folder).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _index[:2] != (folder, mtime):
+        files = {}
+        for file in os.listdir(folder):
+            if file.endswith('.png'):
+                files[file.split('_', 1)[0]] = file
+        _index = (folder, mtime, files)
+    return _index[2]
+
 def get_barcode_path(barcode_value):
     """Get the path to a barcode image"""
-    files = os.listdir(Config.UPLOAD_FOLDER)
-    for file in files:
-        if file.startswith(barcode_value):
-            return os.path.join('img', 'barcodes', file)
-    return None
+    filename = barcode_files().get(barcode_value)
+    return os.path.join('img', 'barcodes', filename) if filename else None
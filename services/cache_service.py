@@ -0,0 +1,181 @@
+"""
+Response cache for report pages
+
+Rendered report pages are kept in a small in-process LRU keyed by route,
+query arguments, viewer and a data version. The data version is a row in
+the data_version table, bumped right after each commit that wrote Kid,
+Attendance or SiteLessonSettings rows. The bump is its own one-statement
+transaction, so concurrent scans never wait on the version row while their
+own transaction is open. Every gunicorn worker reads the same row, so no
+worker serves a cached page after the data it was built from has changed,
+whichever worker made the change. Reading it is one primary-key lookup per
+cached request. With a reports database the key also holds that database's
+version (services/reports_db_service.py), so refreshing the snapshot
+invalidates pages rendered from the previous one.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+
+from flask import current_app, make_response, request, session
+
+from database import db, on_create_schema
+from models import Kid, Attendance, DataVersion, SiteLessonSettings
+from services.reports_db_service import reports_data_version
+
+# Models whose changes invalidate cached report pages
+WATCHED_MODELS = (Kid, Attendance, SiteLessonSettings)
+
+
+
+def get_data_version():
+    """Return the current data version, shared by all workers"""
+    return db.session.query(DataVersion.version).filter(DataVersion.id == 1).scalar() or 0
+
+
+def bump_data_version(connection=None):
+    """
+    Invalidate everything cached against the previous data version
+
+    Runs in the current transaction (of `connection`, or the session's), so it
+    takes effect when the caller commits and is undone by a rollback.
+    """
+    statement = db.update(DataVersion).where(DataVersion.id == 1).values(version=DataVersion.version + 1)
+    (connection or db.session).execute(statement)
+
+
+def ensure_data_version(bind):
+    """Create the data_version row if missing"""
+    if bind.execute(db.select(DataVersion.id).where(DataVersion.id == 1)).first() is None:
+        bind.execute(db.insert(DataVersion).values(id=1, version=0))
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a per-entry expiry time"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        """Store value for ttl seconds, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+report_cache = ResponseCache()
+
+
+def _mark_changes(db_session, flush_context):
+    """Remember that this transaction wrote rows the report pages depend on"""
+    for obj in chain(db_session.new, db_session.dirty, db_session.deleted):
+        if isinstance(obj, WATCHED_MODELS):
+            db_session.info['report_data_changed'] = True
+            return
+
+
+def _after_commit(db_session):
+    if not db_session.info.pop('report_data_changed', False):
+        return
+    # The data is already committed: a page rendered before the bump shows the
+    # new data or is cached under the old version, never stale under the new one
+    try:
+        with db.engine.begin() as conn:
+            bump_data_version(conn)
+    except Exception:
+        current_app.logger.exception('Data version bump failed; cached reports expire by TTL')
+
+
+def _after_rollback(db_session):
+    db_session.info.pop('report_data_changed', None)
+
+
+def init_cache(app):
+    """Configure the report cache and hook data-version tracking into the session"""
+    report_cache.max_entries = app.config.get('REPORT_CACHE_MAX_ENTRIES', 256)
+    on_create_schema(ensure_data_version)
+    if not db.event.contains(db.session, 'after_flush', _mark_changes):
+        db.event.listen(db.session, 'after_flush', _mark_changes)
+        db.event.listen(db.session, 'after_commit', _after_commit)
+        db.event.listen(db.session, 'after_rollback', _after_rollback)
+
+
+def cached_report(is_historical=None):
+    """
+    Cache a report view's rendered HTML and answer conditional GETs
+
+    Args:
+        is_historical: Optional callable taking request.args and returning True
+            when the page only covers dates before today. Historical pages are
+            kept for REPORT_CACHE_TTL_HISTORICAL, everything else for
+            REPORT_CACHE_TTL_TODAY.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            config = current_app.config
+            # Pending flash messages are rendered into the page, so never serve
+            # or store a cached copy while there are any
+            if not config.get('REPORT_CACHE_ENABLED', True) or '_flashes' in session:
+                return f(*args, **kwargs)
+
+            key = (
+                request.endpoint,
+                tuple(sorted(request.args.items(multi=True))),
+                session.get('user_id'),
+                get_data_version(),
+                reports_data_version()
+            )
+
+            entry = report_cache.get(key)
+            if entry is None:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                if is_historical and is_historical(request.args):
+                    ttl = config.get('REPORT_CACHE_TTL_HISTORICAL', 86400)
+                else:
+                    ttl = config.get('REPORT_CACHE_TTL_TODAY', 60)
+
+                entry = (body, response.mimetype, etag)
+                report_cache.set(key, entry, ttl)
+
+            body, mimetype, etag = entry
+            response = make_response(body)
+            response.mimetype = mimetype
+            response.set_etag(etag)
+            # Let the browser keep its copy but revalidate on every reload
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
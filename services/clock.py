@@ -0,0 +1,103 @@
+"""
+The one clock for "now" and "today" in Config.TIMEZONE
+
+Every scan, query and rollup asks this module for the date, so they all
+agree on which day it is in Manila whatever the server's own time zone.
+today() is cached until the next local midnight, so the many calls per
+request cost a float comparison instead of a time zone conversion.
+
+Tests and benchmarks swap in a FakeClock with set_clock() to pin the date or
+to jump ahead a week at a time.
+"""
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+
+
+class Clock:
+    """Wall clock in a time zone (a zoneinfo.ZoneInfo)"""
+
+    def __init__(self, tz):
+        self.tz = tz
+        # (epoch seconds when the cached day ends, the day); one tuple so that
+        # threads always read a day and its end together
+        self._day = (0.0, None)
+
+    def now(self):
+        return datetime.now(self.tz)
+
+    def today(self):
+        current = time.time()
+        next_midnight, day = self._day
+        if current >= next_midnight:
+            day = datetime.fromtimestamp(current, self.tz).date()
+            next_midnight = datetime.combine(day + timedelta(days=1), datetime.min.time(), self.tz).timestamp()
+            self._day = (next_midnight, day)
+        return day
+
+    def timestamp(self):
+        """Epoch seconds, for measuring intervals"""
+        return time.time()
+
+    def seconds_until_midnight(self):
+        now = self.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), self.tz)
+        return (midnight - now).total_seconds()
+
+
+class FakeClock(Clock):
+    """A clock that stands still until moved with advance() or set()"""
+
+    def __init__(self, start):
+        """start: a timezone-aware datetime"""
+        super().__init__(start.tzinfo)
+        self._now = start
+
+    def now(self):
+        return self._now
+
+    def today(self):
+        return self._now.date()
+
+    def timestamp(self):
+        return self._now.timestamp()
+
+    def advance(self, **delta):
+        """Move forward by timedelta(**delta), e.g. advance(weeks=1)"""
+        self._now += timedelta(**delta)
+
+    def set(self, moment):
+        self._now = moment
+
+
+_clock = Clock(Config.TIMEZONE)
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """Install clock for the whole process; returns the previous one"""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def now():
+    return _clock.now()
+
+
+def today():
+    return _clock.today()
+
+
+def timestamp():
+    return _clock.timestamp()
+
+
+def init_clock(app):
+    """Use the app's TIMEZONE (a FakeClock installed earlier is kept)"""
+    if type(_clock) is Clock and _clock.tz != app.config['TIMEZONE']:
+        set_clock(Clock(app.config['TIMEZONE']))
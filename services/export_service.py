@@ -1,10 +1,10 @@
-import pandas as pd
-from models import Kid, Attendance, User
-from database import db
+# pandas is imported inside the export functions: it is the slowest import in
+# the app and only exports need it, so worker boot does not pay for it
+from models import Kid, AGE_GROUPS, OTHER_AGE_GROUP
+from services.report_query_service import LESSON_ATTENDANCE, MONTHLY_ATTENDANCE, SITE_ATTENDANCE
 from datetime import datetime
 import os
 import tempfile
-from sqlalchemy import extract
 
 def export_to_excel(report_type, site='', start_date='', end_date='', month='', year='', lesson=''):
     """
@@ -29,49 +29,28 @@ def export_to_excel(report_type, site='', start_date='', end_date='', month='',
     else:
         return export_site_report(site, start_date, end_date)
 
-def get_age_group(age):
-    """Return age group category"""
-    if 3 <= age <= 8:
-        return 'Kids (3-8)'
-    elif 9 <= age <= 11:
-        return 'Risers (9-11)'
-    elif 12 <= age <= 13:
-        return 'Teens (12-13)'
-    elif age >= 14:
-        return 'Youth (14+)'
-    else:
-        return 'Other'
-
 def export_site_report(site, start_date, end_date):
     """Export site/date filtered attendance report"""
-    query = db.session.query(
-        Kid,
-        Attendance.scan_date,
-        Attendance.scan_time,
-        User.name.label('scanned_by')
-    ).join(Attendance, Kid.id == Attendance.kid_id).join(User, Attendance.scanned_by == User.id)
-    
-    if site:
-        query = query.filter(Kid.site == site)
-    if start_date:
-        query = query.filter(Attendance.scan_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
-    if end_date:
-        query = query.filter(Attendance.scan_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
-    
-    results = query.order_by(Attendance.scan_date.desc(), Attendance.scan_time.desc()).all()
+    import pandas as pd
+    
+    rows = SITE_ATTENDANCE.stream({
+        'site': site,
+        'start': datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None,
+        'end': datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    })
     
     # Convert to DataFrame with age groups
     data = []
-    for kid, scan_date, scan_time, scanned_by in results:
+    for row in rows:
         data.append({
-            'Name': kid.full_name,
-            'Age': kid.age,
-            'Age Group': get_age_group(kid.age),
-            'Site': kid.site,
-            'Barcode': kid.barcode,
-            'Date': scan_date.strftime('%Y-%m-%d'),
-            'Time': scan_time.strftime('%I:%M %p'),
-            'Scanned By': scanned_by
+            'Name': row['full_name'],
+            'Age': row['age'],
+            'Age Group': row['age_group'],
+            'Site': row['site'],
+            'Barcode': row['barcode'],
+            'Date': row['scan_date'].strftime('%Y-%m-%d'),
+            'Time': row['scan_time'].strftime('%I:%M %p'),
+            'Scanned By': row['scanned_by']
         })
     
     df = pd.DataFrame(data)
@@ -97,33 +76,22 @@ def export_site_report(site, start_date, end_date):
 
 def export_monthly_report(site, month, year):
     """Export monthly attendance summary per child with age groups"""
-    query = db.session.query(
-        Kid,
-        db.func.count(Attendance.id).label('attendance_count')
-    ).outerjoin(Attendance,
-        (Kid.id == Attendance.kid_id) &
-        (extract('month', Attendance.scan_date) == int(month)) &
-        (extract('year', Attendance.scan_date) == int(year))
-    )
+    import pandas as pd
     
-    if site:
-        query = query.filter(Kid.site == site)
-    
-    query = query.filter(Kid.status == 'active')
-    results = query.group_by(Kid.id).order_by(Kid.site, Kid.full_name).all()
+    rows = MONTHLY_ATTENDANCE.stream({'site': site, 'month': int(month), 'year': int(year)})
     
     # Convert to DataFrame with age groups
     data = []
     month_name = datetime(int(year), int(month), 1).strftime('%B %Y')
     
-    for kid, attendance_count in results:
+    for row in rows:
         data.append({
-            'Name': kid.full_name,
-            'Age': kid.age,
-            'Age Group': get_age_group(kid.age),
-            'Site': kid.site,
-            'Barcode': kid.barcode,
-            f'Attendance Count ({month_name})': attendance_count
+            'Name': row['full_name'],
+            'Age': row['age'],
+            'Age Group': row['age_group'],
+            'Site': row['site'],
+            'Barcode': row['barcode'],
+            f'Attendance Count ({month_name})': row['attendance_count']
         })
     
     df = pd.DataFrame(data)
@@ -142,7 +110,7 @@ def export_monthly_report(site, month, year):
         
         # Separate sheets by age group
         if not df.empty:
-            for age_group in ['Kids (3-8)', 'Risers (9-11)', 'Teens (12-14)', 'Other']:
+            for age_group in [label for _, label, _, _ in AGE_GROUPS] + [OTHER_AGE_GROUP]:
                 group_df = df[df['Age Group'] == age_group]
                 if not group_df.empty:
                     group_df.to_excel(writer, sheet_name=age_group, index=False)
@@ -158,34 +126,26 @@ def export_monthly_report(site, month, year):
 
 def export_lesson_report(site, lesson):
     """Export lesson-based attendance report"""
-    query = db.session.query(
-        Kid,
-        Attendance.lesson,
-        Attendance.scan_date,
-        Attendance.scan_time,
-        User.name.label('scanned_by')
-    ).join(Attendance, Kid.id == Attendance.kid_id).join(User, Attendance.scanned_by == User.id)
-    
-    if site:
-        query = query.filter(Kid.site == site)
-    if lesson:
-        query = query.filter(Attendance.lesson == int(lesson))
+    import pandas as pd
     
-    results = query.order_by(Attendance.lesson, Kid.site, Kid.full_name).all()
+    rows = LESSON_ATTENDANCE.stream(
+        {'site': site, 'lesson': int(lesson) if lesson else None},
+        order_by=lambda source: [source.lesson, Kid.site, Kid.full_name]
+    )
     
     # Convert to DataFrame
     data = []
-    for kid, lesson_num, scan_date, scan_time, scanned_by in results:
+    for row in rows:
         data.append({
-            'Lesson': f'Lesson {lesson_num}',
-            'Name': kid.full_name,
-            'Age': kid.age,
-            'Age Group': get_age_group(kid.age),
-            'Site': kid.site,
-            'Barcode': kid.barcode,
-            'Date': scan_date.strftime('%Y-%m-%d'),
-            'Time': scan_time.strftime('%I:%M %p'),
-            'Scanned By': scanned_by
+            'Lesson': f'Lesson {row["lesson"]}',
+            'Name': row['full_name'],
+            'Age': row['age'],
+            'Age Group': row['age_group'],
+            'Site': row['site'],
+            'Barcode': row['barcode'],
+            'Date': row['scan_date'].strftime('%Y-%m-%d'),
+            'Time': row['scan_time'].strftime('%I:%M %p'),
+            'Scanned By': row['scanned_by']
         })
     
     df = pd.DataFrame(data)
@@ -0,0 +1,101 @@
+from flask import current_app, send_from_directory, url_for
+from io import BytesIO
+import hashlib
+import os
+import re
+from config import Config
+
+# Rendition name -> longest edge in pixels (2x the size it is shown at)
+RENDITIONS = {
+    'thumb': 96,   # kids list avatar
+    'card': 320,   # kid form preview
+    'full': 1024
+}
+
+# Pictures saved by save_profile_picture: '<content hash>.<ext>'
+HASHED_NAME = re.compile(r'^[0-9a-f]{16}\.(webp|jpg)$')
+
+def _output_format():
+    from PIL import features
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+def save_profile_picture(stream):
+    """
+    Decode an uploaded picture once and write its resized renditions
+
+    The image is rotated per its EXIF orientation and saved without any
+    metadata (GPS, camera, timestamps). Files are named after a hash of the
+    upload, so re-uploading the same photo reuses the same files.
+
+    Args:
+        stream: File-like object with the uploaded image
+
+    Returns:
+        Value for Kid.profile_pic, e.g. '3f9c2a1b7e04d5a6.webp'
+
+    Raises:
+        ValueError: The upload is not a readable image
+    """
+    # Pillow is imported on first upload, not at worker boot
+    from PIL import Image, ImageOps
+    
+    data = stream.read()
+    fmt, ext = _output_format()
+    key = hashlib.sha256(data).hexdigest()[:16]
+
+    try:
+        image = Image.open(BytesIO(data))
+        # JPEG can decode at a reduced scale, far cheaper for phone photos
+        image.draft('RGB', (RENDITIONS['full'], RENDITIONS['full']))
+        # Pillow decodes lazily; decode here so a truncated or corrupt file fails inside this try
+        image.load()
+        image = ImageOps.exif_transpose(image)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f'Not a valid image: {e}')
+
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha and fmt == 'WEBP' else 'RGB')
+
+    os.makedirs(Config.PROFILE_PIC_FOLDER, exist_ok=True)
+    for size_name, edge in RENDITIONS.items():
+        rendition = image.copy()
+        rendition.thumbnail((edge, edge), Image.LANCZOS)
+        rendition.save(os.path.join(Config.PROFILE_PIC_FOLDER, f'{key}_{size_name}.{ext}'),
+                       fmt, quality=80, method=4 if fmt == 'WEBP' else 0, optimize=True)
+
+    return f'{key}.{ext}'
+
+def delete_profile_picture(profile_pic):
+    """Remove a picture's files (all renditions, or a legacy original)"""
+    if HASHED_NAME.match(profile_pic):
+        key, ext = profile_pic.rsplit('.', 1)
+        filenames = [f'{key}_{size_name}.{ext}' for size_name in RENDITIONS]
+    else:
+        filenames = [profile_pic]
+    for filename in filenames:
+        path = os.path.join(Config.PROFILE_PIC_FOLDER, filename)
+        if os.path.exists(path):
+            os.remove(path)
+
+def profile_pic_url(profile_pic, size='thumb'):
+    """URL of a picture rendition; legacy pictures are served as uploaded"""
+    if HASHED_NAME.match(profile_pic):
+        key, ext = profile_pic.rsplit('.', 1)
+        return url_for('profile_image', filename=f'{key}_{size}.{ext}')
+    return url_for('profile_image', filename=profile_pic)
+
+def serve_profile_image(filename):
+    """Serve profile pictures; hashed renditions never change so cache them for a year"""
+    if re.match(r'^[0-9a-f]{16}_', filename):
+        response = send_from_directory(Config.PROFILE_PIC_FOLDER, filename,
+                                       max_age=current_app.config.get('STATIC_ASSET_MAX_AGE', 365 * 24 * 60 * 60))
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+    return send_from_directory(Config.PROFILE_PIC_FOLDER, filename)
+
+def init_images(app):
+    """Register the profile picture route and the profile_pic_url() template global"""
+    app.add_url_rule(app.static_url_path + '/img/profiles/<path:filename>',
+                     endpoint='profile_image', view_func=serve_profile_image)
+    app.add_template_global(profile_pic_url)
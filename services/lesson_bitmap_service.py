@@ -0,0 +1,148 @@
+"""
+Lesson completion bitmaps (lesson_bitmaps)
+
+For every (site, lesson) the kids who attended it form a bitset over kid
+ids. It is stored as 63-bit words, one row each, so every flush that inserts
+Attendance rows sets its bits with a single upsert (bits = bits | new) in the
+same transaction, and concurrent scans never lose a bit.
+
+Reports load a site's words with one primary-key range query into Python
+ints (LessonBitmaps); completion counts and set questions such as "attended
+all 6" or "came to lessons 1-3 but not 4" are then a few bitwise operations.
+Rows written with Core are picked up by `flask rebuild-lesson-bitmaps`, which
+recomputes the table from attendance_history.
+"""
+from collections import defaultdict
+from functools import lru_cache
+
+import click
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import db
+from models import Attendance, AttendanceHistory, LessonBitmap
+
+UPSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+WORD_BITS = 63
+BATCH_SIZE = 10000
+LESSONS = range(1, 7)
+
+
+def bitset(kid_ids):
+    """Bitset with the bit of every kid id set"""
+    bits = 0
+    for kid_id in kid_ids:
+        bits |= 1 << kid_id
+    return bits
+
+
+def kid_ids(bits):
+    """Kid ids in a bitset, ascending"""
+    ids = []
+    while bits:
+        lowest = bits & -bits
+        ids.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return ids
+
+
+class LessonBitmaps:
+    """Kids who attended each lesson, as int bitsets keyed by lesson number"""
+
+    def __init__(self, lessons=None):
+        self.lessons = defaultdict(int, lessons or {})
+
+    def kids(self, lesson):
+        return self.lessons[lesson]
+
+    def count(self, lesson):
+        return self.lessons[lesson].bit_count()
+
+    def any_lesson(self):
+        bits = 0
+        for lesson_bits in self.lessons.values():
+            bits |= lesson_bits
+        return bits
+
+    def attended(self, lessons=(), missed=()):
+        """Kids who attended every lesson in `lessons` and none in `missed`"""
+        bits = self.any_lesson()
+        for lesson in lessons:
+            bits &= self.lessons[lesson]
+        for lesson in missed:
+            bits &= ~self.lessons[lesson]
+        return bits
+
+    def __or__(self, other):
+        return LessonBitmaps({lesson: self.lessons[lesson] | other.lessons[lesson]
+                              for lesson in set(self.lessons) | set(other.lessons)})
+
+
+def load_lesson_bitmaps(site=None):
+    """site -> LessonBitmaps for one site, or for every site with scans"""
+    query = db.session.query(LessonBitmap.site, LessonBitmap.lesson, LessonBitmap.word, LessonBitmap.bits)
+    if site:
+        query = query.filter(LessonBitmap.site == site)
+    sites = defaultdict(LessonBitmaps)
+    for site_name, lesson, word, bits in query:
+        sites[site_name].lessons[lesson] |= bits << (word * WORD_BITS)
+    return sites
+
+
+@lru_cache(maxsize=None)
+def _bitmap_upsert(dialect_name):
+    """OR a word into lesson_bitmaps, built once per dialect; executed with site, lesson, word and bits"""
+    table = LessonBitmap.__table__
+    stmt = UPSERTS[dialect_name](table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.site, table.c.lesson, table.c.word],
+        set_={'bits': table.c.bits.op('|')(stmt.excluded.bits)}
+    )
+
+
+def _word_rows(scans):
+    """(site, lesson, kid_id) triples -> {(site, lesson, word): bits}"""
+    words = defaultdict(int)
+    for site, lesson, kid_id in scans:
+        words[(site, lesson, kid_id // WORD_BITS)] |= 1 << (kid_id % WORD_BITS)
+    return words
+
+
+def _track_new_scans(db_session, flush_context):
+    scans = [(obj.site, obj.lesson, obj.kid_id) for obj in db_session.new if isinstance(obj, Attendance)]
+    if not scans:
+        return
+    conn = db_session.connection()
+    conn.execute(_bitmap_upsert(conn.dialect.name), [
+        {'site': site, 'lesson': lesson, 'word': word, 'bits': bits}
+        for (site, lesson, word), bits in _word_rows(scans).items()
+    ])
+
+
+def rebuild_lesson_bitmaps(conn):
+    """Recompute lesson_bitmaps from attendance_history on conn; returns the number of words"""
+    table = LessonBitmap.__table__
+    history = AttendanceHistory.__table__
+    scans = conn.execution_options(yield_per=BATCH_SIZE).execute(
+        db.select(history.c.site, history.c.lesson, history.c.kid_id).distinct()
+    )
+    words = _word_rows(scans)
+
+    conn.execute(db.delete(table))
+    rows = [{'site': site, 'lesson': lesson, 'word': word, 'bits': bits}
+            for (site, lesson, word), bits in words.items()]
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.execute(table.insert(), rows[start:start + BATCH_SIZE])
+    return len(rows)
+
+
+def init_lesson_bitmaps(app):
+    """Keep lesson_bitmaps current and register `flask rebuild-lesson-bitmaps`"""
+    if not db.event.contains(db.session, 'after_flush', _track_new_scans):
+        db.event.listen(db.session, 'after_flush', _track_new_scans)
+
+    @app.cli.command('rebuild-lesson-bitmaps')
+    def rebuild_lesson_bitmaps_command():
+        """Recompute the per-site lesson completion bitmaps from attendance history"""
+        words = rebuild_lesson_bitmaps(db.session.connection())
+        db.session.commit()
+        click.echo(f"✅ Lesson bitmaps rebuilt ({words} words)")
@@ -0,0 +1,165 @@
+"""
+Request profiling and query-count instrumentation
+
+With METRICS_ENABLED on, every request records its latency, the number of
+SQL statements it ran and the time spent in them, per endpoint. A request
+that runs the same statement shape more than METRICS_N_PLUS_ONE_THRESHOLD
+times (a query inside a loop) is counted and logged as an N+1 pattern.
+
+Totals are exposed at /metrics in the Prometheus text format and, with
+METRICS_SERVER_TIMING on, per request in a Server-Timing header the browser
+dev tools display. Counters live in the worker process, so each gunicorn
+worker reports its own. With METRICS_ENABLED off no hooks are installed.
+"""
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import Response, abort, current_app, g, has_request_context, request, session
+from sqlalchemy import event
+
+from database import db
+
+# Request latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Expanded IN lists differ only in their number of placeholders
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)|\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)+\s*\)')
+
+
+def statement_shape(statement):
+    return _IN_LIST.sub('(?)', statement)
+
+
+class MetricsRegistry:
+    """Per-endpoint request and query totals for this worker"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.requests = Counter()                    # (endpoint, method, status) -> count
+        self.latency_buckets = defaultdict(lambda: [0] * len(self.buckets))
+        self.latency_sum = Counter()                 # (endpoint, method) -> seconds
+        self.latency_count = Counter()
+        self.queries = Counter()                     # endpoint -> statements
+        self.sql_seconds = Counter()                 # endpoint -> seconds
+        self.n_plus_one = Counter()                  # endpoint -> requests flagged
+
+    def observe(self, endpoint, method, status, duration, queries, sql_seconds, n_plus_one):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            key = (endpoint, method)
+            counts = self.latency_buckets[key]
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    counts[i] += 1
+            self.latency_sum[key] += duration
+            self.latency_count[key] += 1
+            self.queries[endpoint] += queries
+            self.sql_seconds[endpoint] += sql_seconds
+            if n_plus_one:
+                self.n_plus_one[endpoint] += 1
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += ['# HELP jtkidz_requests_total Requests handled.',
+                      '# TYPE jtkidz_requests_total counter']
+            for (endpoint, method, status), value in sorted(self.requests.items()):
+                lines.append(f'jtkidz_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {value}')
+
+            lines += ['# HELP jtkidz_request_duration_seconds Request latency.',
+                      '# TYPE jtkidz_request_duration_seconds histogram']
+            for (endpoint, method), counts in sorted(self.latency_buckets.items()):
+                labels = f'endpoint="{endpoint}",method="{method}"'
+                for bound, value in zip(self.buckets, counts):
+                    lines.append(f'jtkidz_request_duration_seconds_bucket{{{labels},le="{bound}"}} {value}')
+                lines.append(f'jtkidz_request_duration_seconds_bucket{{{labels},le="+Inf"}} {self.latency_count[(endpoint, method)]}')
+                lines.append(f'jtkidz_request_duration_seconds_sum{{{labels}}} {self.latency_sum[(endpoint, method)]:.6f}')
+                lines.append(f'jtkidz_request_duration_seconds_count{{{labels}}} {self.latency_count[(endpoint, method)]}')
+
+            for name, help_text, values, fmt in (
+                ('jtkidz_sql_queries_total', 'SQL statements executed.', self.queries, '{}'),
+                ('jtkidz_sql_seconds_total', 'Time spent executing SQL.', self.sql_seconds, '{:.6f}'),
+                ('jtkidz_n_plus_one_requests_total', 'Requests that repeated one statement shape too often.',
+                 self.n_plus_one, '{}'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {fmt.format(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_sql_seconds = 0.0
+    g.metrics_shapes = Counter()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_start' in g:
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if has_request_context() and 'metrics_start' in g:
+        g.metrics_queries += 1
+        g.metrics_sql_seconds += elapsed
+        g.metrics_shapes[statement_shape(statement)] += 1
+
+
+def _after_request(response):
+    if 'metrics_start' not in g:
+        return response
+    duration = time.perf_counter() - g.metrics_start
+    endpoint = request.endpoint or 'unmatched'
+
+    threshold = current_app.config.get('METRICS_N_PLUS_ONE_THRESHOLD', 10)
+    repeated = [(shape, count) for shape, count in g.metrics_shapes.items() if count > threshold]
+    for shape, count in repeated:
+        current_app.logger.warning('N+1 in %s: %dx %s', endpoint, count, ' '.join(shape.split())[:200])
+
+    current_app.extensions['metrics'].observe(endpoint, request.method, response.status_code,
+                                              duration, g.metrics_queries, g.metrics_sql_seconds, bool(repeated))
+
+    if current_app.config.get('METRICS_SERVER_TIMING'):
+        response.headers.add('Server-Timing', f'app;dur={duration * 1000:.1f}')
+        response.headers.add('Server-Timing',
+                             f'db;dur={g.metrics_sql_seconds * 1000:.1f};desc="{g.metrics_queries} queries"')
+    return response
+
+
+def metrics():
+    """Prometheus scrape endpoint: bearer METRICS_TOKEN, or an admin session"""
+    token = current_app.config.get('METRICS_TOKEN')
+    authorized = session.get('user_role') == 'admin'
+    if token and request.headers.get('Authorization') == f'Bearer {token}':
+        authorized = True
+    if not authorized:
+        abort(403)
+    return Response(current_app.extensions['metrics'].render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app):
+    """Install the profiling hooks and /metrics when METRICS_ENABLED is on"""
+    if not app.config.get('METRICS_ENABLED'):
+        return None
+
+    registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', endpoint='metrics', view_func=metrics)
+    with app.app_context():
+        # Every bind, so report queries on the reports database are counted too
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    return registry
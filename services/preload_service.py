@@ -0,0 +1,38 @@
+"""
+Shared warm-up for gunicorn's preload_app mode
+
+With preload_app on (gunicorn.conf.py), the master imports the app once and
+forks every worker from it. warm_app() runs in the master before the first
+fork and builds what each worker would otherwise build on its first
+requests: configured mappers, compiled Jinja templates and the barcode image
+index. Forked workers share those pages copy-on-write, so a new worker
+starts serving at once and holds only what it changes afterwards.
+
+Connection pools must not cross a fork: two processes talking over one
+socket corrupt each other's results. reset_after_fork() runs in every new
+worker and drops the pools it inherited without closing the parent's
+sockets, so each worker opens its own connections.
+"""
+from sqlalchemy.orm import configure_mappers
+
+from database import db
+from services.barcode_service import barcode_files
+
+
+def warm_app(app):
+    """Build the read-only state every worker needs, once, before forking"""
+    configure_mappers()
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    barcode_files()
+    with app.app_context():
+        # Nothing above should have connected; make sure no pooled connection is inherited
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def reset_after_fork(app):
+    """Forget the connection pools inherited from the master (call in the child)"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
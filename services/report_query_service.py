@@ -0,0 +1,181 @@
+"""
+Attendance reports declared once, shared by the report pages and exports
+
+A ReportQuery is a column projection (the select and its joins) plus the
+filters the report accepts. From one declaration it gives:
+
+    page()       one page of rows for the HTML view, with the total count
+    stream()     every row, fetched from the cursor in batches, for exports
+    aggregate()  summary numbers computed in SQL over the same filtered rows
+
+Rows are plain dicts of the projected columns (plus the kid's age when the
+birthday is projected), so no Kid, Attendance or User entities are loaded.
+Filter values are parsed by the caller (dates as date, lessons as int); a
+filter whose value is empty is skipped.
+"""
+from datetime import date
+
+from sqlalchemy import func
+
+from database import db
+from models import Kid, User, calculate_age
+from services.archive_service import history_model
+
+PER_PAGE = 100
+STREAM_BATCH = 1000
+
+
+class Page:
+    """One page of report rows"""
+
+    def __init__(self, rows, total, number, per_page):
+        self.rows = rows
+        self.total = total
+        self.number = number
+        self.per_page = per_page
+
+    @property
+    def pages(self):
+        return max((self.total + self.per_page - 1) // self.per_page, 1)
+
+    @property
+    def has_prev(self):
+        return self.number > 1
+
+    @property
+    def has_next(self):
+        return self.number < self.pages
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def _as_dict(row):
+    values = row._asdict()
+    if 'birthday' in values:
+        values['age'] = calculate_age(values['birthday'])
+    return values
+
+
+class ReportQuery:
+    """
+    One report: columns, joins, filters and order over attendance
+
+    Args:
+        select: callable(source, params) returning the projected Select;
+            source is Attendance or AttendanceHistory (see history_model)
+        filters: {param name: callable(source, value) -> WHERE clause}
+        order_by: callable(source) returning the default ORDER BY columns
+        first_day: callable(params) returning the earliest scan date the
+            report can include, or None; picks the attendance source
+    """
+
+    def __init__(self, select, filters, order_by, first_day=None):
+        self._select = select
+        self.filters = filters
+        self._order_by = order_by
+        self._first_day = first_day
+
+    def statement(self, params, ordered=True, order_by=None):
+        source = history_model(self._first_day(params) if self._first_day else None)
+        stmt = self._select(source, params)
+        for name, condition in self.filters.items():
+            value = params.get(name)
+            if value not in (None, ''):
+                stmt = stmt.where(condition(source, value))
+        if ordered:
+            stmt = stmt.order_by(*(order_by(source) if order_by else self._order_by(source)))
+        return stmt
+
+    def page(self, params, number=1, per_page=PER_PAGE):
+        """Rows of page `number` (1-based; clamped to the last page) and the total row count"""
+        total = self.aggregate(params, total=lambda rows: func.count())['total']
+        pages = max((total + per_page - 1) // per_page, 1)
+        number = min(max(number, 1), pages)
+        rows = db.session.execute(self.statement(params).limit(per_page).offset((number - 1) * per_page))
+        return Page([_as_dict(row) for row in rows], total, number, per_page)
+
+    def stream(self, params, order_by=None):
+        """Yield every row; the cursor is read STREAM_BATCH rows at a time"""
+        result = db.session.execute(self.statement(params, order_by=order_by),
+                                    execution_options={'yield_per': STREAM_BATCH})
+        for row in result:
+            yield _as_dict(row)
+
+    def aggregate(self, params, **measures):
+        """
+        Evaluate aggregate measures over the filtered rows in one query
+
+        Each measure is callable(rows) -> SQL aggregate, where rows is the
+        report as a subquery: aggregate(params, kids=lambda rows: func.count(rows.c.kid_id.distinct()))
+        """
+        rows = self.statement(params, ordered=False).subquery()
+        result = db.session.execute(
+            db.select(*[measure(rows.c).label(name) for name, measure in measures.items()]).select_from(rows)
+        )
+        return result.one()._asdict()
+
+
+def month_range(year, month):
+    """(first day, first day of the next month) for filtering a month on scan_date"""
+    first = date(year, month, 1)
+    return first, date(year + month // 12, month % 12 + 1, 1)
+
+
+def _kid_columns():
+    return [Kid.full_name, Kid.birthday, Kid.age_group, Kid.gender, Kid.site, Kid.barcode]
+
+
+def _scan_select(source, params):
+    return db.select(
+        *_kid_columns(),
+        source.kid_id, source.lesson, source.scan_date, source.scan_time,
+        User.name.label('scanned_by')
+    ).select_from(source).join(Kid, Kid.id == source.kid_id).outerjoin(User, User.id == source.scanned_by)
+
+
+# Scans filtered by the kid's site and a date range (reports.site_report, site export)
+SITE_ATTENDANCE = ReportQuery(
+    select=_scan_select,
+    filters={
+        'site': lambda source, site: Kid.site == site,
+        'start': lambda source, start: source.scan_date >= start,
+        'end': lambda source, end: source.scan_date <= end,
+    },
+    order_by=lambda source: [source.scan_date.desc(), source.scan_time.desc()],
+    first_day=lambda params: params.get('start')
+)
+
+# Scans of one lesson at the site they were made (reports.lesson_detail, lesson export)
+LESSON_ATTENDANCE = ReportQuery(
+    select=_scan_select,
+    filters={
+        'site': lambda source, site: source.site == site,
+        'lesson': lambda source, lesson: source.lesson == lesson,
+    },
+    order_by=lambda source: [source.scan_date, source.scan_time]
+)
+
+
+def _monthly_select(source, params):
+    first, after = month_range(params['year'], params['month'])
+    return db.select(
+        *_kid_columns(),
+        func.count(source.id).label('attendance_count')
+    ).select_from(Kid).outerjoin(source, (Kid.id == source.kid_id) &
+                                 (source.scan_date >= first) & (source.scan_date < after)
+    ).where(Kid.status == 'active').group_by(Kid.id)
+
+
+# Active kids with their scan count for one month (reports.monthly_report, monthly export)
+MONTHLY_ATTENDANCE = ReportQuery(
+    select=_monthly_select,
+    filters={
+        'site': lambda source, site: Kid.site == site,
+    },
+    order_by=lambda source: [Kid.site, Kid.full_name],
+    first_day=lambda params: month_range(params['year'], params['month'])[0]
+)
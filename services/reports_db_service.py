@@ -0,0 +1,90 @@
+"""
+Reports database: snapshot refresh and the freshness banner
+
+With REPORTS_DATABASE_URI set, report and export views
+(database.uses_reports_database) read from that database instead of the
+primary, so a long export on a Sunday morning does not hold connections or
+locks that scans need. For SQLite the reports database is a snapshot file
+refreshed by `flask snapshot-reports-db` (run it from cron); for Postgres it
+is a streaming read replica. Report pages say how current the data is.
+"""
+import os
+from datetime import datetime
+
+import click
+from flask import current_app, has_request_context, request
+
+from database import REPORTS_BIND, db, is_sqlite, snapshot_sqlite, sqlite_file
+from services import clock
+
+# Current when the replica has replayed everything it received (both NULL on a primary)
+REPLICA_AS_OF = db.text(
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN now() ELSE pg_last_xact_replay_timestamp() END'
+)
+
+
+def reports_data_as_of():
+    """When the reports database last matched the primary; None without a reports database"""
+    engine = db.engines.get(REPORTS_BIND)
+    if engine is None:
+        return None
+    tz = current_app.config['TIMEZONE']
+    if engine.dialect.name == 'sqlite':
+        path = sqlite_file(engine.url)
+        if not os.path.exists(path):
+            return None
+        return datetime.fromtimestamp(os.path.getmtime(path), tz)
+    with engine.connect() as conn:
+        as_of = conn.execute(REPLICA_AS_OF).scalar()
+    return as_of.astimezone(tz) if as_of else clock.now()
+
+
+def reports_data_version():
+    """
+    Changes whenever the reports database gets new data; None without one
+
+    The snapshot file's mtime for SQLite, the replayed WAL position for a
+    Postgres replica. Report caches include it in their keys, because their
+    pages come from this database, not the primary.
+    """
+    engine = db.engines.get(REPORTS_BIND)
+    if engine is None:
+        return None
+    if engine.dialect.name == 'sqlite':
+        path = sqlite_file(engine.url)
+        return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    with engine.connect() as conn:
+        return str(conn.execute(db.text('SELECT pg_last_wal_replay_lsn()')).scalar())
+
+
+def refresh_snapshot(app):
+    """Copy the primary SQLite database over the reports snapshot, atomically"""
+    target = sqlite_file(app.config['REPORTS_DATABASE_URI'])
+    partial = target + '.tmp'
+    if os.path.exists(partial):
+        os.remove(partial)
+    snapshot_sqlite(sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']), partial)
+    # Readers open a new connection per query and see the old file or the new one, never half of each
+    os.replace(partial, target)
+    return target
+
+
+def init_reports_db(app):
+    """Register `flask snapshot-reports-db` and the report freshness banner"""
+
+    @app.cli.command('snapshot-reports-db')
+    def snapshot_reports_db_command():
+        """Refresh the SQLite reports database from the primary"""
+        uri = app.config.get('REPORTS_DATABASE_URI')
+        if not uri or not is_sqlite(uri) or not is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+            raise click.ClickException('snapshot-reports-db needs SQLite for both DATABASE_URL and REPORTS_DATABASE_URL')
+        click.echo(f"✅ Reports snapshot written to {refresh_snapshot(app)}")
+
+    @app.context_processor
+    def inject_reports_freshness():
+        if not has_request_context() or request.blueprint != 'reports' or REPORTS_BIND not in db.engines:
+            return {}
+        as_of = reports_data_as_of()
+        stale = as_of is None or (clock.now() - as_of).total_seconds() > app.config['REPORTS_STALE_AFTER']
+        return {'reports_as_of': as_of, 'reports_stale': stale}
@@ -0,0 +1,125 @@
+"""
+Live scan events for dashboards and today-views
+
+Each committed scan is fanned out to Server-Sent Events subscribers through a
+broker stored in app.extensions['scan_broker']:
+
+- 'memory': in-process fan-out. Only subscribers connected to the worker
+  that recorded the scan see it, so use it with a single worker.
+- 'database': every worker polls the attendance table for ids above its
+  high-water mark and fans new rows out locally. Works across any number of
+  gunicorn workers with no extra infrastructure.
+"""
+import queue
+import threading
+import time
+
+from flask import current_app
+
+from database import db
+from models import Attendance, Kid, User
+
+
+def serialize_scan(attendance, kid, user):
+    """Compact JSON-ready representation of one attendance row"""
+    return {
+        'id': attendance.id,
+        'time': attendance.scan_time.strftime('%I:%M %p'),
+        'lesson': attendance.lesson,
+        'kid_id': kid.id,
+        'kid_name': kid.full_name,
+        'kid_age': kid.age,
+        'age_group': kid.age_group,
+        'site': kid.site,
+        'barcode': kid.barcode,
+        'scanned_by': user.name
+    }
+
+
+class ScanBroker:
+    """In-process pub/sub fan-out of committed scans"""
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """Register a new subscriber and return its event queue"""
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        self._fan_out(event)
+
+    def _fan_out(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Slow consumer; it catches up from Last-Event-ID on reconnect
+                pass
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+class DatabaseBroker(ScanBroker):
+    """Broker that discovers new scans by polling the attendance table"""
+
+    def __init__(self, app, interval=1.0, max_queue=100):
+        super().__init__(max_queue)
+        self.app = app
+        self.interval = interval
+        self._poller = None
+
+    def publish(self, event):
+        # The poller in every worker (this one included) picks the row up
+        pass
+
+    def subscribe(self):
+        subscriber = super().subscribe()
+        with self._lock:
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll, name='scan-events-poller', daemon=True)
+                self._poller.start()
+        return subscriber
+
+    def _poll(self):
+        with self.app.app_context():
+            last_id = db.session.query(db.func.max(Attendance.id)).scalar() or 0
+            db.session.remove()
+            while True:
+                time.sleep(self.interval)
+                if not self.subscriber_count:
+                    continue
+                try:
+                    rows = db.session.query(Attendance, Kid, User).join(Kid).join(
+                        User, Attendance.scanned_by == User.id
+                    ).filter(Attendance.id > last_id).order_by(Attendance.id).all()
+                    for attendance, kid, user in rows:
+                        self._fan_out(serialize_scan(attendance, kid, user))
+                        last_id = attendance.id
+                except Exception:
+                    current_app.logger.exception('Scan events poll failed')
+                finally:
+                    db.session.remove()
+
+
+def init_scan_events(app):
+    """Create the scan broker selected by SCAN_EVENTS_BROKER"""
+    if app.config.get('SCAN_EVENTS_BROKER', 'memory') == 'database':
+        broker = DatabaseBroker(app, interval=app.config.get('SCAN_EVENTS_POLL_INTERVAL', 1.0))
+    else:
+        broker = ScanBroker()
+    app.extensions['scan_broker'] = broker
+    return broker
@@ -0,0 +1,62 @@
+"""
+Pre-built statements for the scan hot path
+
+Recording a scan and polling today's counters run the same few statements
+thousands of times a day. Each one is built once here, at import, with
+bindparam() placeholders and executed with a parameter dict: no Query object
+is constructed and no cache key computed per request, and SQLAlchemy
+compiles each statement once per engine and reuses it from the compiled
+cache. Only the bound values change between calls.
+"""
+from sqlalchemy import bindparam, func, select
+
+from database import db
+from models import Attendance, Kid, User
+
+KID_BY_BARCODE = select(Kid).where(Kid.barcode == bindparam('barcode'))
+
+# Time of an earlier scan of the kid for the lesson on the day, if any
+EXISTING_SCAN_TIME = select(Attendance.scan_time).where(
+    Attendance.kid_id == bindparam('kid_id'),
+    Attendance.lesson == bindparam('lesson'),
+    Attendance.scan_date == bindparam('scan_date')
+).limit(1)
+
+TODAY_COUNTS = select(
+    Attendance.site, Attendance.lesson, Attendance.scanned_by, func.count(Attendance.id)
+).where(Attendance.scan_date == bindparam('day')).group_by(
+    Attendance.site, Attendance.lesson, Attendance.scanned_by
+)
+
+HIGH_WATER_MARKS = select(Attendance.site, func.max(Attendance.id)).where(
+    Attendance.scan_date == bindparam('day')
+).group_by(Attendance.site)
+
+HIGH_WATER_MARKS_FOR_SITES = HIGH_WATER_MARKS.where(Attendance.site.in_(bindparam('sites', expanding=True)))
+
+
+def find_kid(barcode):
+    return db.session.execute(KID_BY_BARCODE, {'barcode': barcode}).scalar_one_or_none()
+
+
+def get_user(user_id):
+    """The user from the session's identity map, or one primary-key SELECT"""
+    return db.session.get(User, user_id)
+
+
+def existing_scan_time(kid_id, lesson, scan_date):
+    return db.session.execute(EXISTING_SCAN_TIME, {
+        'kid_id': kid_id, 'lesson': lesson, 'scan_date': scan_date
+    }).scalar()
+
+
+def today_counts(day):
+    """(site, lesson, scanned_by, count) rows for the day"""
+    return [tuple(row) for row in db.session.execute(TODAY_COUNTS, {'day': day})]
+
+
+def high_water_marks(day, sites=None):
+    """(site, highest attendance id) for the day, for all sites or only `sites`"""
+    if sites is None:
+        return db.session.execute(HIGH_WATER_MARKS, {'day': day}).all()
+    return db.session.execute(HIGH_WATER_MARKS_FOR_SITES, {'day': day, 'sites': list(sites)}).all()
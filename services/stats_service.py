@@ -0,0 +1,113 @@
+"""
+Per-kid attendance profile (kid_attendance_stats)
+
+Every flush that inserts Attendance rows folds them into the kid's stats row
+with a single upsert in the same transaction, so concurrent scans of one kid
+never lose an update and the kids list can show engagement without touching
+attendance. Rows written with Core (seed, benchmarks) or imported from
+elsewhere are picked up by `flask rebuild-attendance-stats`, which recomputes
+the table from attendance_history in one pass.
+"""
+from functools import lru_cache
+
+import click
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import db
+from models import Attendance, AttendanceHistory, KidAttendanceStats, week_number
+
+UPSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+BATCH_SIZE = 10000
+
+
+@lru_cache(maxsize=None)
+def _scan_upsert(dialect_name):
+    """The upsert for one scan, built once per dialect; values come from _scan_params"""
+    stats = KidAttendanceStats.__table__
+    stmt = UPSERTS[dialect_name](stats)
+    new = stmt.excluded
+    # SET expressions all see the row as it was before this scan
+    return stmt.on_conflict_do_update(index_elements=[stats.c.kid_id], set_={
+        'total_scans': stats.c.total_scans + 1,
+        'lessons_mask': stats.c.lessons_mask.op('|')(new.lessons_mask),
+        'first_scan_date': db.case((new.first_scan_date < stats.c.first_scan_date, new.first_scan_date),
+                                   else_=stats.c.first_scan_date),
+        'last_scan_date': db.case((new.last_scan_date > stats.c.last_scan_date, new.last_scan_date),
+                                  else_=stats.c.last_scan_date),
+        # Same week: unchanged; the next week extends the streak; a later week starts over.
+        # A late offline scan for an earlier week leaves it for the next rebuild.
+        'streak_weeks': db.case((new.last_scan_week == stats.c.last_scan_week + 1, stats.c.streak_weeks + 1),
+                                (new.last_scan_week > stats.c.last_scan_week + 1, 1),
+                                else_=stats.c.streak_weeks),
+        'last_scan_week': db.case((new.last_scan_week > stats.c.last_scan_week, new.last_scan_week),
+                                  else_=stats.c.last_scan_week)
+    })
+
+
+def _scan_params(scan):
+    return {
+        'kid_id': scan.kid_id, 'total_scans': 1, 'lessons_mask': 1 << (scan.lesson - 1),
+        'first_scan_date': scan.scan_date, 'last_scan_date': scan.scan_date,
+        'last_scan_week': week_number(scan.scan_date), 'streak_weeks': 1
+    }
+
+
+def _track_new_scans(db_session, flush_context):
+    scans = [obj for obj in db_session.new if isinstance(obj, Attendance)]
+    if not scans:
+        return
+    conn = db_session.connection()
+    stmt = _scan_upsert(conn.dialect.name)
+    # One statement per scan, in order: two scans of a kid in one flush each fold in
+    for scan in scans:
+        conn.execute(stmt, _scan_params(scan))
+
+
+def rebuild_attendance_stats(conn):
+    """Recompute kid_attendance_stats from attendance_history on conn; returns the number of kids"""
+    stats = KidAttendanceStats.__table__
+    history = AttendanceHistory.__table__
+    rows = conn.execution_options(yield_per=BATCH_SIZE).execute(
+        db.select(history.c.kid_id, history.c.lesson, history.c.scan_date).order_by(history.c.kid_id, history.c.scan_date)
+    )
+
+    conn.execute(db.delete(stats))
+    batch, current, total = [], None, 0
+    for kid_id, lesson, scan_date in rows:
+        week = week_number(scan_date)
+        if current is None or current['kid_id'] != kid_id:
+            if current:
+                batch.append(current)
+            current = {'kid_id': kid_id, 'total_scans': 0, 'lessons_mask': 0, 'first_scan_date': scan_date,
+                       'last_scan_date': scan_date, 'last_scan_week': week, 'streak_weeks': 1}
+        elif week == current['last_scan_week'] + 1:
+            current['streak_weeks'] += 1
+        elif week > current['last_scan_week'] + 1:
+            current['streak_weeks'] = 1
+        current['total_scans'] += 1
+        current['lessons_mask'] |= 1 << (lesson - 1)
+        current['last_scan_date'] = scan_date
+        current['last_scan_week'] = week
+        if len(batch) >= BATCH_SIZE:
+            conn.execute(stats.insert(), batch)
+            total += len(batch)
+            batch = []
+    if current:
+        batch.append(current)
+    if batch:
+        conn.execute(stats.insert(), batch)
+        total += len(batch)
+    return total
+
+
+def init_stats(app):
+    """Keep kid_attendance_stats current and register `flask rebuild-attendance-stats`"""
+    if not db.event.contains(db.session, 'after_flush', _track_new_scans):
+        db.event.listen(db.session, 'after_flush', _track_new_scans)
+
+    @app.cli.command('rebuild-attendance-stats')
+    def rebuild_attendance_stats_command():
+        """Recompute every kid's attendance profile from attendance history"""
+        kids = rebuild_attendance_stats(db.session.connection())
+        db.session.commit()
+        click.echo(f"✅ Attendance stats rebuilt for {kids} kids")
@@ -0,0 +1,133 @@
+"""
+Roster delta sync
+
+Every flush that inserts, updates or deletes a Kid appends rows to the
+change_log table in the same transaction. Clients keep the highest seq they
+have seen and ask for changes after it, so a phone or cache stays current by
+downloading only the kids that changed.
+
+Changes to a user's role or assigned sites are logged too: they change which
+kids belong in that user's roster, so the user's next sync is a full one.
+"""
+from datetime import datetime
+
+from database import db
+from models import ChangeLog, Kid, User, calculate_age
+
+
+def roster_entry(full_name, birthday, status, site, today):
+    """Compact roster row: [name, age, status, site]"""
+    return [full_name, calculate_age(birthday, today), status, site]
+
+
+def _change(kid, site, op, now):
+    return {'table_name': 'kids', 'row_id': kid.id, 'row_key': kid.barcode, 'site': site, 'op': op, 'changed_at': now}
+
+
+def _access_changed(user):
+    state = db.inspect(user)
+    return state.attrs.role.history.has_changes() or state.attrs.assigned_sites.history.has_changes()
+
+
+def _log_changes(db_session, flush_context):
+    now = datetime.utcnow()
+    rows = []
+
+    for obj in db_session.new:
+        if isinstance(obj, Kid):
+            rows.append(_change(obj, obj.site, 'insert', now))
+
+    for obj in db_session.dirty:
+        if isinstance(obj, Kid) and db_session.is_modified(obj):
+            rows.append(_change(obj, obj.site, 'update', now))
+            # A kid moved to another site disappears from the old site's roster
+            for old_site in db.inspect(obj).attrs.site.history.deleted:
+                if old_site and old_site != obj.site:
+                    rows.append(_change(obj, old_site, 'remove', now))
+        elif isinstance(obj, User) and _access_changed(obj):
+            rows.append({'table_name': 'users', 'row_id': obj.id, 'row_key': None, 'site': None, 'op': 'update',
+                         'changed_at': now})
+
+    for obj in db_session.deleted:
+        if isinstance(obj, Kid):
+            rows.append(_change(obj, obj.site, 'delete', now))
+
+    if rows:
+        # Core insert on the flush's connection: no autoflush, same transaction
+        db_session.connection().execute(ChangeLog.__table__.insert(), rows)
+
+
+def init_sync(app):
+    """Start recording kid and site-assignment changes in the change log"""
+    if not db.event.contains(db.session, 'after_flush', _log_changes):
+        db.event.listen(db.session, 'after_flush', _log_changes)
+
+
+def latest_seq():
+    return db.session.query(db.func.max(ChangeLog.seq)).scalar() or 0
+
+
+def sites_changed_since(user_id, since, seq):
+    """True if the user's role or assigned sites changed after seq `since`"""
+    return db.session.query(ChangeLog.seq).filter(
+        ChangeLog.table_name == 'users',
+        ChangeLog.row_id == user_id,
+        ChangeLog.seq > since,
+        ChangeLog.seq <= seq
+    ).first() is not None
+
+
+def get_roster_changes(since, sites, today, user_id=None):
+    """
+    Roster rows changed after seq `since` for the given sites (None = all sites)
+
+    sites are those of user `user_id`; when that user's sites changed after
+    `since` the delta would miss kids from a newly assigned site, so the
+    answer is a full snapshot instead.
+
+    Returns a dict with the new cursor ('seq'), whether this is a full snapshot
+    ('full'), changed or new kids keyed by barcode ('upserts', inactive kids
+    included so phones can explain why a scan is refused) and barcodes that
+    left the caller's sites ('removed').
+    """
+    seq = latest_seq()
+    if sites is not None and not sites:
+        return {'seq': seq, 'full': True, 'upserts': {}, 'removed': []}
+
+    columns = (Kid.id, Kid.barcode, Kid.full_name, Kid.birthday, Kid.status, Kid.site)
+
+    # Fresh clients, clients holding a cursor from another database and users
+    # whose sites changed get everything
+    if since <= 0 or since > seq or (user_id is not None and sites_changed_since(user_id, since, seq)):
+        query = db.session.query(*columns)
+        if sites is not None:
+            query = query.filter(Kid.site.in_(sites))
+        upserts = {
+            barcode: roster_entry(full_name, birthday, status, site, today)
+            for _, barcode, full_name, birthday, status, site in query.all()
+        }
+        return {'seq': seq, 'full': True, 'upserts': upserts, 'removed': []}
+
+    changed = db.session.query(ChangeLog.row_id, ChangeLog.row_key).filter(
+        ChangeLog.table_name == 'kids',
+        ChangeLog.seq > since,
+        ChangeLog.seq <= seq
+    )
+    if sites is not None:
+        changed = changed.filter(ChangeLog.site.in_(sites))
+    changed_keys = dict(changed.distinct().all())
+
+    upserts, removed = {}, []
+    if changed_keys:
+        for kid_id, barcode, full_name, birthday, status, site in db.session.query(*columns).filter(
+                Kid.id.in_(changed_keys)).all():
+            del changed_keys[kid_id]
+            if sites is None or site in sites:
+                upserts[barcode] = roster_entry(full_name, birthday, status, site, today)
+            else:
+                removed.append(barcode)
+
+    # Whatever is left was deleted
+    removed.extend(barcode for barcode in changed_keys.values() if barcode)
+
+    return {'seq': seq, 'full': False, 'upserts': upserts, 'removed': removed}
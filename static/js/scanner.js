@@ -1,6 +1,201 @@
 let html5QrCode;
 let todayCount = 0;
 
+// Scan pipeline settings
+const RECENT_TTL_MS = 5000;      // ignore the same barcode for this long after it was seen
+const RECENT_MAX_ENTRIES = 50;   // size cap for the recent-barcode LRU
+
+// Barcode -> last time it was decoded (Map keeps insertion order, used as an LRU)
+const recentBarcodes = new Map();
+// Barcodes with a request to /attendance/record still pending
+const inFlight = new Set();
+// Everything kept in localStorage belongs to the logged-in user, so a phone
+// shared by several volunteers never mixes their rosters or queued scans
+const STORAGE_PREFIX = `jtkidz-${SCANNER_USER}-`;
+
+// "BARCODE|lesson" pairs already recorded today on this phone
+const rosterKey = `${STORAGE_PREFIX}scanned-${new Date().toLocaleDateString('en-CA')}`;
+const scannedToday = loadScannedToday();
+
+function loadScannedToday() {
+    // Drop other users' rosters and every scanned set but this user's for today.
+    // Other users' queued scans stay until they log in on this phone again.
+    Object.keys(localStorage)
+        .filter(key => key.startsWith('jtkidz-') &&
+                       ((key.endsWith('-roster') && !key.startsWith(STORAGE_PREFIX)) ||
+                        (key.includes('-scanned-') && key !== rosterKey)))
+        .forEach(key => localStorage.removeItem(key));
+    try {
+        return new Set(JSON.parse(localStorage.getItem(rosterKey) || '[]'));
+    } catch (error) {
+        return new Set();
+    }
+}
+
+function markScanned(barcode, lesson) {
+    scannedToday.add(`${barcode}|${lesson}`);
+    localStorage.setItem(rosterKey, JSON.stringify(Array.from(scannedToday)));
+}
+
+// Offline roster: barcode -> [name, age, status, site] for the user's sites
+const ROSTER_STORAGE_KEY = `${STORAGE_PREFIX}roster`;
+const ROSTER_SYNC_MS = 5 * 60 * 1000;
+let roster = loadStoredJSON(ROSTER_STORAGE_KEY, null);
+if (roster && roster.user !== SCANNER_USER) {
+    roster = null;  // Synced for someone else (or before rosters recorded their user)
+}
+
+// Scans made while offline, uploaded in order once the network is back
+const QUEUE_STORAGE_KEY = `${STORAGE_PREFIX}pending-scans`;
+const QUEUE_FLUSH_MS = 30 * 1000;
+let pendingScans = loadStoredJSON(QUEUE_STORAGE_KEY, []);
+// Queued scans the server refused, kept until the user dismisses them
+const REJECTED_STORAGE_KEY = `${STORAGE_PREFIX}rejected-scans`;
+let rejectedScans = loadStoredJSON(REJECTED_STORAGE_KEY, []);
+
+// Scans queued before storage was kept per user have no known owner: list
+// them for rescanning instead of uploading them under this login
+['jtkidz-pending-scans', 'jtkidz-rejected-scans'].forEach(key => {
+    loadStoredJSON(key, []).forEach(scan => rejectedScans.push({
+        barcode: scan.barcode,
+        lesson: scan.lesson,
+        message: scan.message || 'Saved before an app update, please scan again'
+    }));
+    localStorage.removeItem(key);
+});
+
+function loadStoredJSON(key, fallback) {
+    try {
+        const value = localStorage.getItem(key);
+        return value ? JSON.parse(value) : fallback;
+    } catch (error) {
+        return fallback;
+    }
+}
+
+// Pull only the kids changed since the last sync. A new day, or a roster
+// synced for another user, starts from a full roster.
+async function syncRoster() {
+    const today = new Date().toLocaleDateString('en-CA');
+    const current = roster && roster.date === today;
+    const since = current ? roster.seq : 0;
+    try {
+        const response = await fetch(`${SCANNER_URLS.roster}?since=${since}&user=${SCANNER_USER}`);
+        if (!response.ok) return;
+        const changes = await response.json();
+        if (changes.full || !current) {
+            roster = { seq: 0, date: today, kids: {} };
+        }
+        Object.assign(roster.kids, changes.upserts);
+        changes.removed.forEach(barcode => delete roster.kids[barcode]);
+        roster.seq = changes.seq;
+        roster.date = changes.date;
+        roster.user = changes.user;
+        localStorage.setItem(ROSTER_STORAGE_KEY, JSON.stringify(roster));
+    } catch (error) {
+        // Offline: keep using the stored roster
+    }
+}
+
+function lookupKid(barcode) {
+    return roster ? roster.kids[barcode] || null : null;
+}
+
+function savePendingScans() {
+    localStorage.setItem(QUEUE_STORAGE_KEY, JSON.stringify(pendingScans));
+    const badge = document.getElementById('pending-count');
+    if (badge) {
+        badge.textContent = pendingScans.length;
+        badge.parentElement.classList.toggle('hidden', pendingScans.length === 0);
+    }
+}
+
+function queueOfflineScan(barcode, lesson, kid) {
+    pendingScans.push({ barcode, lesson, scanned_at: Date.now() });
+    savePendingScans();
+    markScanned(barcode, lesson);
+    todayCount++;
+    document.getElementById('today-count').textContent = todayCount;
+    showMessage(`
+        <div class="text-center">
+            <p class="text-2xl font-bold mb-2">📥 ${escapeHtml(kid[0])}</p>
+            <p class="text-lg">Lesson ${lesson} | Age: ${escapeHtml(kid[1])} | Site: ${escapeHtml(kid[3])}</p>
+            <p class="text-sm mt-2">Saved offline - will upload when back online</p>
+        </div>
+    `, 'warning');
+}
+
+function saveRejectedScans() {
+    localStorage.setItem(REJECTED_STORAGE_KEY, JSON.stringify(rejectedScans));
+    const panel = document.getElementById('rejected-scans');
+    const list = document.getElementById('rejected-list');
+    if (!panel || !list) return;
+    list.replaceChildren(...rejectedScans.map(scan => {
+        const item = document.createElement('li');
+        item.textContent = `${scan.barcode} (Lesson ${scan.lesson}): ${scan.message}`;
+        return item;
+    }));
+    panel.classList.toggle('hidden', rejectedScans.length === 0);
+}
+
+function clearRejectedScans() {
+    rejectedScans = [];
+    saveRejectedScans();
+}
+
+// The record endpoint answers in JSON; anything else (the login page after a
+// redirect, a proxy error page) means the request never reached it
+function isJsonResponse(response) {
+    const type = response.headers.get('Content-Type') || '';
+    return !response.redirected && type.includes('application/json');
+}
+
+// Upload queued scans oldest first; stop at the first network failure
+async function flushPendingScans() {
+    while (pendingScans.length && navigator.onLine) {
+        const scan = pendingScans[0];
+        let response;
+        try {
+            response = await fetch(SCANNER_URLS.record, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(scan)
+            });
+        } catch (error) {
+            return;
+        }
+        // Throttled or server trouble: keep the scan and retry later
+        if (response.status === 429 || response.status >= 500) {
+            return;
+        }
+        // Session expired: keep the scan until the user logs in again
+        if (!isJsonResponse(response)) {
+            showMessage(`${pendingScans.length} saved scans are waiting. Log in again to upload them.`, 'warning');
+            return;
+        }
+        const data = await response.json();
+        if (!(response.ok && data.success) && !data.already_scanned) {
+            rejectedScans.push({ barcode: scan.barcode, lesson: scan.lesson, message: data.message || `Error ${response.status}` });
+            saveRejectedScans();
+        }
+        pendingScans.shift();
+        savePendingScans();
+    }
+    loadTodayCount();
+}
+
+// True if the barcode was decoded within RECENT_TTL_MS; records it either way
+function seenRecently(barcode) {
+    const now = Date.now();
+    const last = recentBarcodes.get(barcode);
+    recentBarcodes.delete(barcode);
+    recentBarcodes.set(barcode, now);
+    while (recentBarcodes.size > RECENT_MAX_ENTRIES) {
+        recentBarcodes.delete(recentBarcodes.keys().next().value);
+    }
+    return last !== undefined && now - last < RECENT_TTL_MS;
+}
+
 // Update realtime clock
 function updateClock() {
     const now = new Date();
@@ -35,7 +230,7 @@ function showMessage(message, type) {
         type === 'warning' ? 'bg-yellow-100 text-yellow-800' :
         'bg-blue-100 text-blue-800'
     }`;
-    statusDiv.innerHTML = message;
+    statusDiv.innerHTML = message;  // callers escape server and scanned values with escapeHtml()
     statusDiv.classList.remove('hidden');
     
     setTimeout(() => {
@@ -43,39 +238,104 @@ function showMessage(message, type) {
     }, 5000);
 }
 
+// Escape text for use inside showMessage() markup
+function escapeHtml(value) {
+    const div = document.createElement('div');
+    div.textContent = value;
+    return div.innerHTML;
+}
+
+// Camera callback: drop repeated frames of the same card before they reach the network
+function handleDecoded(decodedText) {
+    const barcode = decodedText.trim().toUpperCase();
+    if (!barcode || seenRecently(barcode)) {
+        return;
+    }
+    submitBarcode(barcode);
+}
+
 // Submit barcode to server
 async function submitBarcode(barcode) {
+    barcode = barcode.trim().toUpperCase();
     // Get selected lesson
     const selectedLesson = parseInt(document.getElementById('lesson-selector').value);
     
+    if (inFlight.has(barcode)) {
+        return;
+    }
+    if (scannedToday.has(`${barcode}|${selectedLesson}`)) {
+        showMessage(`<p class="text-lg font-bold">${escapeHtml(barcode)} already scanned for Lesson ${selectedLesson} today</p>`, 'warning');
+        return;
+    }
+    
+    // Validate against the offline roster before touching the network. A kid
+    // missing from it may have been added since the last sync, so only the
+    // server can refuse them while online.
+    const kid = lookupKid(barcode);
+    if (roster && !kid && !navigator.onLine) {
+        showMessage(`<p class="text-lg font-bold">${escapeHtml(barcode)} is not a kid from your sites.</p>`, 'error');
+        return;
+    }
+    if (kid && kid[2] !== 'active') {
+        showMessage(`<p class="text-lg font-bold">${escapeHtml(kid[0])} is inactive.</p>`, 'error');
+        return;
+    }
+    if (kid && !navigator.onLine) {
+        queueOfflineScan(barcode, selectedLesson, kid);
+        return;
+    }
+    if (kid) {
+        showMessage(`<p class="text-lg font-bold">⏳ ${escapeHtml(kid[0])} - Lesson ${selectedLesson}</p>`, 'info');
+    }
+    
+    inFlight.add(barcode);
     try {
-        const response = await fetch('/attendance/record', {
+        const response = await fetch(SCANNER_URLS.record, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({ 
-                barcode: barcode.trim().toUpperCase(),
+                barcode: barcode,
                 lesson: selectedLesson
             })
         });
         
+        if (!isJsonResponse(response)) {
+            if (kid) {
+                queueOfflineScan(barcode, selectedLesson, kid);
+            }
+            showMessage('Your session has expired. Please log in again.', 'error');
+            return;
+        }
         const data = await response.json();
         
+        if (data.already_scanned) {
+            markScanned(barcode, selectedLesson);
+        }
+        
         if (response.ok && data.success) {
+            markScanned(barcode, selectedLesson);
+            if (!kid) {
+                // New on the server: fetch it so offline scans know this kid too
+                syncRoster();
+            }
+            
             const now = new Date();
             const timeStr = now.toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit', second: '2-digit' });
             
             showMessage(`
                 <div class="text-center">
-                    <p class="text-2xl font-bold mb-2">✅ ${data.kid_name}</p>
-                    <p class="text-lg">Lesson ${data.lesson} | Age: ${data.kid_age} | Site: ${data.site}</p>
+                    <p class="text-2xl font-bold mb-2">✅ ${escapeHtml(data.kid_name)}</p>
+                    <p class="text-lg">Lesson ${escapeHtml(data.lesson)} | Age: ${escapeHtml(data.kid_age)} | Site: ${escapeHtml(data.site)}</p>
                     <p class="text-xl font-bold mt-2">Time: ${timeStr}</p>
                 </div>
             `, 'success');
             
+            // Show the new scan immediately, then sync with scans from other phones
             todayCount++;
             document.getElementById('today-count').textContent = todayCount;
+            loadTodayCount();
             
             // Play success sound (optional)
             if (window.AudioContext) {
@@ -88,11 +348,17 @@ async function submitBarcode(barcode) {
                 oscillator.stop(audioContext.currentTime + 0.1);
             }
         } else {
-            showMessage(`<p class="text-lg font-bold">${data.message}</p>`, 'error');
+            showMessage(`<p class="text-lg font-bold">${escapeHtml(data.message)}</p>`, 'error');
         }
     } catch (error) {
-        showMessage('Network error. Please check connection.', 'error');
+        if (kid) {
+            queueOfflineScan(barcode, selectedLesson, kid);
+        } else {
+            showMessage('Network error. Please check connection.', 'error');
+        }
         console.error('Error:', error);
+    } finally {
+        inFlight.delete(barcode);
     }
 }
 
@@ -112,8 +378,8 @@ function startScanner() {
         { facingMode: "environment" },
         config,
         (decodedText, decodedResult) => {
-            // Barcode scanned successfully
-            submitBarcode(decodedText);
+            // Barcode decoded (fires for every frame the card is in view)
+            handleDecoded(decodedText);
         },
         (errorMessage) => {
             // Scanning error (ignore most)
@@ -155,20 +421,38 @@ document.getElementById('manual-form').addEventListener('submit', (e) => {
     }
 });
 
-// Load today's count on page load
-window.addEventListener('DOMContentLoaded', async () => {
+// Load today's count from the compact stats endpoint
+async function loadTodayCount() {
     try {
-        const response = await fetch('/attendance/today');
+        const response = await fetch(SCANNER_URLS.stats);
         if (response.ok) {
-            const text = await response.text();
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(text, 'text/html');
-            const rows = doc.querySelectorAll('tbody tr');
-            // Only count rows that don't have colspan (actual data rows)
-            todayCount = Array.from(rows).filter(row => !row.querySelector('td[colspan]')).length;
+            const stats = await response.json();
+            todayCount = stats.total;
             document.getElementById('today-count').textContent = todayCount;
         }
     } catch (error) {
         console.error('Error loading count:', error);
     }
+}
+
+window.addEventListener('DOMContentLoaded', () => {
+    savePendingScans();
+    saveRejectedScans();
+    loadTodayCount();
+    syncRoster();
+    flushPendingScans();
 });
+
+window.addEventListener('online', () => {
+    syncRoster();
+    flushPendingScans();
+});
+setInterval(syncRoster, ROSTER_SYNC_MS);
+setInterval(flushPendingScans, QUEUE_FLUSH_MS);
+
+// Installable, offline-capable scan page
+if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.register(SCANNER_URLS.serviceWorker).catch((error) => {
+        console.error('Service worker registration failed:', error);
+    });
+}
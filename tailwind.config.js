@@ -0,0 +1,12 @@
+/** Tailwind build for build_assets.py: only classes found in these files are kept */
+module.exports = {
+  content: [
+    './templates/**/*.html',
+    './static/js/**/*.js',
+    './blueprints/**/*.py',
+  ],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+}
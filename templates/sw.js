@@ -0,0 +1,65 @@
+// Service worker for the scanner PWA (scope /attendance/)
+// Rendered by attendance.service_worker so the cache name changes with the assets
+const CACHE_NAME = 'jtkidz-scan-{{ version }}';
+const SCAN_PAGE = '{{ scan_url }}';
+const PRECACHE_URLS = {{ precache_urls|tojson }};
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(CACHE_NAME).then((cache) => cache.addAll(PRECACHE_URLS).then(() =>
+            // The page itself needs the login session; only keep a real copy
+            fetch(SCAN_PAGE).then((response) => {
+                if (response.ok && !response.redirected) {
+                    return cache.put(SCAN_PAGE, response);
+                }
+            }).catch(() => {})
+        ))
+    );
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys().then((names) => Promise.all(
+            names.filter((name) => name.startsWith('jtkidz-scan-') && name !== CACHE_NAME)
+                 .map((name) => caches.delete(name))
+        )).then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+
+    // Scan page: fresh when online, cached shell when offline
+    if (request.mode === 'navigate' && url.pathname === SCAN_PAGE) {
+        event.respondWith(
+            fetch(request).then((response) => {
+                if (response.ok && !response.redirected) {
+                    const copy = response.clone();
+                    caches.open(CACHE_NAME).then((cache) => cache.put(SCAN_PAGE, copy));
+                }
+                return response;
+            }).catch(() => caches.match(SCAN_PAGE))
+        );
+        return;
+    }
+
+    // Static assets: cache first
+    if (url.pathname.startsWith('/static/')) {
+        event.respondWith(
+            caches.match(request).then((cached) => cached || fetch(request).then((response) => {
+                if (response.ok) {
+                    const copy = response.clone();
+                    caches.open(CACHE_NAME).then((cache) => cache.put(request, copy));
+                }
+                return response;
+            }))
+        );
+    }
+    // Everything else (roster, stats, record) goes to the network; the
+    // scanner keeps its own roster and offline queue in localStorage
+});
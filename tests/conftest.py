@@ -0,0 +1,97 @@
+"""
+Shared fixtures: an app on a throwaway SQLite database with a small roster
+
+The clock is pinned to 2026-03-20 in Manila, so ages, the current quarter
+and the attendance/attendance_history split are the same on every run.
+"""
+from datetime import date, datetime, time
+
+import pytest
+
+from app import create_app
+from config import Config
+from database import create_schema, db
+from models import Attendance, Kid, User, attendance_archive
+from services import clock
+
+TODAY = datetime(2026, 3, 20, 10, 0, tzinfo=Config.TIMEZONE)
+
+# (full name, birthday, gender, site, status)
+KIDS = [
+    ('Alma Cruz', date(2016, 4, 2), 'Female', 'A', 'active'),
+    ('Bea Santos', date(2019, 7, 15), 'Female', 'A', 'active'),
+    ('Carl Reyes', date(2013, 3, 20), 'Male', 'B', 'active'),
+    ('Dina Lopez', date(2017, 1, 1), 'Female', 'A', 'inactive'),
+    ('Eli Ramos', date(2010, 11, 30), 'Male', 'B', 'active'),  # Moved from site A
+    ('Faye Dela Cruz', date(2020, 2, 29), 'Female', 'A', 'active'),
+]
+
+# (kid, site scanned at, lesson, date, time, scanned by user)
+SCANS = [
+    (1, 'A', 1, date(2026, 1, 11), time(9, 0), 1),
+    (2, 'A', 1, date(2026, 1, 11), time(9, 5), 2),
+    (5, 'A', 1, date(2026, 1, 11), time(9, 10), 3),
+    (1, 'A', 2, date(2026, 2, 8), time(9, 0), 2),
+    (4, 'A', 2, date(2026, 2, 8), time(9, 2), 1),
+    (3, 'B', 1, date(2026, 2, 8), time(10, 0), 3),
+    (5, 'B', 2, date(2026, 3, 1), time(9, 0), 1),
+    (2, 'A', 2, date(2026, 3, 1), time(9, 30), 3),
+    (1, 'A', 3, date(2026, 3, 15), time(9, 0), 1),
+    (3, 'B', 2, date(2026, 3, 15), time(10, 0), 2),
+]
+
+# Last quarter's scans, already moved to attendance_archive
+ARCHIVED_SCANS = [
+    (1, 'A', 6, date(2025, 12, 7), time(9, 0), 1),
+    (5, 'A', 6, date(2025, 12, 7), time(9, 5), 2),
+]
+
+# User 3 is deleted after scanning; their scans keep the dangling id
+DELETED_USER_ID = 3
+
+
+class TestConfig(Config):
+    TESTING = True
+    AGE_GROUP_REFRESH_ENABLED = False
+    METRICS_ENABLED = False
+    SCAN_EVENTS_BROKER = 'memory'
+    REPORTS_DATABASE_URI = None
+
+
+@pytest.fixture
+def app(tmp_path):
+    previous = clock.set_clock(clock.FakeClock(TODAY))
+
+    class Settings(TestConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+
+    app = create_app(Settings)
+    with app.app_context():
+        create_schema()
+        _seed()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    clock.set_clock(previous)
+
+
+def _seed():
+    for user_id, name in enumerate(('Ana', 'Ben', 'Cy'), start=1):
+        user = User(id=user_id, name=name, email=f'{name.lower()}@example.com', role='staff')
+        user.set_password('secret')
+        db.session.add(user)
+    for kid_id, (full_name, birthday, gender, site, status) in enumerate(KIDS, start=1):
+        db.session.add(Kid(id=kid_id, full_name=full_name, birthday=birthday, gender=gender, site=site,
+                           status=status, barcode=f'JT{kid_id:06d}'))
+    db.session.flush()
+    for kid_id, site, lesson, scan_date, scan_time, user_id in SCANS:
+        db.session.add(Attendance(kid_id=kid_id, site=site, lesson=lesson, scan_date=scan_date,
+                                  scan_time=scan_time, scanned_by=user_id))
+    db.session.execute(attendance_archive.insert(), [
+        {'id': 1000 + n, 'kid_id': kid_id, 'site': site, 'lesson': lesson, 'scan_date': scan_date,
+         'scan_time': scan_time, 'scanned_by': user_id, 'created_at': datetime(2025, 12, 7)}
+        for n, (kid_id, site, lesson, scan_date, scan_time, user_id) in enumerate(ARCHIVED_SCANS)
+    ])
+    db.session.execute(db.delete(User).where(User.id == DELETED_USER_ID))
+    db.session.commit()
@@ -0,0 +1,199 @@
+"""
+The report query declarations against the queries they replaced
+
+The legacy_* functions are the site, monthly and lesson queries as they
+were written in blueprints/reports.py and services/export_service.py before
+services/report_query_service.py. Pages, streams and aggregates must give the
+same rows, with two deliberate differences pinned down at the end:
+- scans are outer-joined to users, so the exports keep scans by deleted users
+- the lesson export filters on the site of the scan, not the kid's current site
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import extract, func
+
+from conftest import DELETED_USER_ID
+from database import db
+from models import AttendanceHistory, Kid, User
+from services.archive_service import history_model
+from services.report_query_service import LESSON_ATTENDANCE, MONTHLY_ATTENDANCE, SITE_ATTENDANCE
+
+
+def legacy_site_page(site, start, end):
+    source = history_model(start)
+    query = db.session.query(source, Kid).join(Kid)
+    if site:
+        query = query.filter(Kid.site == site)
+    if start:
+        query = query.filter(source.scan_date >= start)
+    if end:
+        query = query.filter(source.scan_date <= end)
+    return query.order_by(source.scan_date.desc(), source.scan_time.desc()).all()
+
+
+def legacy_site_export(site, start, end):
+    query = db.session.query(
+        Kid,
+        AttendanceHistory.scan_date,
+        AttendanceHistory.scan_time,
+        User.name.label('scanned_by')
+    ).join(AttendanceHistory, Kid.id == AttendanceHistory.kid_id).join(User, AttendanceHistory.scanned_by == User.id)
+    if site:
+        query = query.filter(Kid.site == site)
+    if start:
+        query = query.filter(AttendanceHistory.scan_date >= start)
+    if end:
+        query = query.filter(AttendanceHistory.scan_date <= end)
+    return query.order_by(AttendanceHistory.scan_date.desc(), AttendanceHistory.scan_time.desc()).all()
+
+
+def legacy_monthly(site, month, year):
+    query = db.session.query(
+        Kid,
+        func.count(AttendanceHistory.id).label('attendance_count')
+    ).outerjoin(AttendanceHistory,
+        (Kid.id == AttendanceHistory.kid_id) &
+        (extract('month', AttendanceHistory.scan_date) == month) &
+        (extract('year', AttendanceHistory.scan_date) == year)
+    )
+    if site:
+        query = query.filter(Kid.site == site)
+    query = query.filter(Kid.status == 'active')
+    return query.group_by(Kid.id).order_by(Kid.site, Kid.full_name).all()
+
+
+def legacy_lesson_page(site, lesson):
+    return db.session.query(AttendanceHistory, Kid).join(Kid).filter(
+        AttendanceHistory.site == site,
+        AttendanceHistory.lesson == lesson
+    ).order_by(AttendanceHistory.scan_date, AttendanceHistory.scan_time).all()
+
+
+def legacy_lesson_export(site, lesson):
+    query = db.session.query(
+        Kid,
+        AttendanceHistory.lesson,
+        AttendanceHistory.scan_date,
+        AttendanceHistory.scan_time,
+        User.name.label('scanned_by')
+    ).join(AttendanceHistory, Kid.id == AttendanceHistory.kid_id).join(User, AttendanceHistory.scanned_by == User.id)
+    if site:
+        query = query.filter(Kid.site == site)
+    if lesson:
+        query = query.filter(AttendanceHistory.lesson == lesson)
+    return query.order_by(AttendanceHistory.lesson, Kid.site, Kid.full_name).all()
+
+
+def kid_fields(kid):
+    return (kid.full_name, kid.age, kid.age_group, kid.site, kid.barcode)
+
+
+def row_kid_fields(row):
+    return (row['full_name'], row['age'], row['age_group'], row['site'], row['barcode'])
+
+
+def all_pages(query, params, per_page):
+    """Every row of query, read page by page"""
+    first = query.page(params, 1, per_page)
+    rows = list(first)
+    for number in range(2, first.pages + 1):
+        rows.extend(query.page(params, number, per_page))
+    return first, rows
+
+
+SITE_PARAMS = [
+    {'site': 'A', 'start': None, 'end': None},
+    {'site': 'B', 'start': date(2026, 2, 1), 'end': date(2026, 3, 31)},
+    {'site': '', 'start': date(2025, 12, 1), 'end': date(2026, 1, 31)},
+    {'site': 'A', 'start': date(2026, 1, 1), 'end': None},
+]
+
+
+@pytest.mark.parametrize('params', SITE_PARAMS)
+def test_site_page_and_aggregate_match_legacy(app, params):
+    legacy = [kid_fields(kid) + (scan.kid_id, scan.lesson, scan.scan_date, scan.scan_time)
+              for scan, kid in legacy_site_page(params['site'], params['start'], params['end'])]
+
+    first, rows = all_pages(SITE_ATTENDANCE, params, per_page=2)
+    assert first.total == len(legacy)
+    assert [row_kid_fields(row) + (row['kid_id'], row['lesson'], row['scan_date'], row['scan_time'])
+            for row in rows] == legacy
+
+    counts = SITE_ATTENDANCE.aggregate(params,
+                                       total_attendance=lambda rows: func.count(),
+                                       unique_kids=lambda rows: func.count(rows.kid_id.distinct()))
+    assert counts == {'total_attendance': len(legacy), 'unique_kids': len({row[5] for row in legacy})}
+
+
+@pytest.mark.parametrize('params', SITE_PARAMS)
+def test_site_stream_matches_legacy_export(app, params):
+    legacy = [kid_fields(kid) + (scan_date, scan_time, scanned_by)
+              for kid, scan_date, scan_time, scanned_by in legacy_site_export(params['site'], params['start'], params['end'])]
+
+    rows = list(SITE_ATTENDANCE.stream(params))
+    # Scans by users that still exist are unchanged, in the same order
+    assert [row_kid_fields(row) + (row['scan_date'], row['scan_time'], row['scanned_by'])
+            for row in rows if row['scanned_by'] is not None] == legacy
+
+
+@pytest.mark.parametrize('site, month, year', [('', 1, 2026), ('A', 2, 2026), ('B', 3, 2026), ('', 12, 2025), ('A', 6, 2026)])
+def test_monthly_page_stream_and_aggregate_match_legacy(app, site, month, year):
+    legacy = [kid_fields(kid) + (attendance_count,) for kid, attendance_count in legacy_monthly(site, month, year)]
+    params = {'site': site, 'month': month, 'year': year}
+
+    first, rows = all_pages(MONTHLY_ATTENDANCE, params, per_page=2)
+    assert first.total == len(legacy)
+    assert [row_kid_fields(row) + (row['attendance_count'],) for row in rows] == legacy
+
+    assert [row_kid_fields(row) + (row['attendance_count'],) for row in MONTHLY_ATTENDANCE.stream(params)] == legacy
+
+    totals = MONTHLY_ATTENDANCE.aggregate(params,
+                                          kids=lambda rows: func.count(),
+                                          scans=lambda rows: func.coalesce(func.sum(rows.attendance_count), 0))
+    assert totals == {'kids': len(legacy), 'scans': sum(row[-1] for row in legacy)}
+
+
+@pytest.mark.parametrize('site, lesson', [('A', 1), ('A', 2), ('B', 2), ('A', 6), ('B', 6)])
+def test_lesson_page_and_aggregate_match_legacy(app, site, lesson):
+    legacy = [kid_fields(kid) + (scan.scan_date, scan.scan_time) for scan, kid in legacy_lesson_page(site, lesson)]
+    params = {'site': site, 'lesson': lesson}
+
+    first, rows = all_pages(LESSON_ATTENDANCE, params, per_page=1)
+    assert first.total == len(legacy)
+    assert [row_kid_fields(row) + (row['scan_date'], row['scan_time']) for row in rows] == legacy
+
+    counts = LESSON_ATTENDANCE.aggregate(params, total_scans=lambda rows: func.count())
+    assert counts == {'total_scans': len(legacy)}
+
+
+def lesson_export_rows(site, lesson):
+    rows = LESSON_ATTENDANCE.stream({'site': site, 'lesson': lesson},
+                                    order_by=lambda source: [source.lesson, Kid.site, Kid.full_name])
+    return [(row['barcode'], row['lesson'], row['scanned_by']) for row in rows]
+
+
+def test_site_export_keeps_scans_by_deleted_users(app):
+    """Deliberate change: the inner join to users dropped these scans"""
+    params = {'site': 'A', 'start': None, 'end': None}
+    orphans = [(row['barcode'], row['scan_date']) for row in SITE_ATTENDANCE.stream(params) if row['scanned_by'] is None]
+
+    assert orphans == [('JT000002', date(2026, 3, 1))]
+    assert db.session.get(User, DELETED_USER_ID) is None
+    assert len(list(SITE_ATTENDANCE.stream(params))) == len(legacy_site_export('A', None, None)) + 1
+
+
+def test_lesson_export_filters_on_scan_site(app):
+    """Deliberate change: the old export filtered on the kid's current site"""
+    # Eli (JT000005) was scanned at site A for lessons 1 and 6, then moved to site B
+    assert lesson_export_rows('A', 1) == [('JT000001', 1, 'Ana'), ('JT000002', 1, 'Ben'), ('JT000005', 1, None)]
+    assert [(kid.barcode, lesson, scanned_by) for kid, lesson, _, _, scanned_by in legacy_lesson_export('A', 1)] == [
+        ('JT000001', 1, 'Ana'), ('JT000002', 1, 'Ben')]
+
+    assert lesson_export_rows('A', 6) == [('JT000001', 6, 'Ana'), ('JT000005', 6, 'Ben')]
+    assert lesson_export_rows('B', 6) == []
+    assert [kid.barcode for kid, *_ in legacy_lesson_export('B', 6)] == ['JT000005']
+
+    # The export now agrees with the lesson detail page
+    assert sorted(barcode for barcode, _, _ in lesson_export_rows('A', 6)) == sorted(
+        kid.barcode for _, kid in legacy_lesson_page('A', 6))
@@ -1,16 +1,16 @@
 """
-WSGI configuration for PythonAnywhere deployment
+WSGI entry point for gunicorn (gunicorn.conf.py) and PythonAnywhere
 """
 import sys
 import os
 
-# Add your project directory to the sys.path
-project_home = '/home/yourusername/JTKIDZ'  # Update with your PythonAnywhere username
+# Make the project importable whatever directory the server starts in
+project_home = os.path.dirname(os.path.abspath(__file__))
 if project_home not in sys.path:
     sys.path = [project_home] + sys.path
 
 # Set environment to production
-os.environ['FLASK_ENV'] = 'production'
+os.environ.setdefault('FLASK_ENV', 'production')
 
-# Import the Flask app
+# Import the Flask app (built by app.create_app())
 from app import app as application